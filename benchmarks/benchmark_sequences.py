@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Benchmark the overhead of running sequences against the in-process FakeSAL.
+
+Results are written as JSON so runs of different versions can be compared with ``--compare``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from lsst.ts.sequence import (CommandLatency, DDSPool, EventStream, FakeSAL, RunTimeModel, get_registry,
+                              __version__)
+
+__all__ = ["main"]
+
+
+def create_fake_sal(command_latency):
+    """Create a FakeSAL where every command takes ``command_latency`` seconds to complete.
+    """
+    latency = CommandLatency(ack=command_latency / 3., in_progress=command_latency / 3.,
+                             complete=command_latency / 3.)
+    events = {'calibrationElectrometer': {'intensity': EventStream(period=0.01, intensity=1.e4),
+                                          'integrationTime': EventStream(period=0.01, intTime=1.)},
+              'atMonochromator': {'selectedGrating': EventStream(period=0.01, gratingType=1)}}
+    return FakeSAL(default_latency=latency, events=events)
+
+
+def create_sequence(name, fake_sal, run_time_model, **config):
+    sequence = get_registry().resolve(name)(pool=DDSPool(salpylib=fake_sal), run_time_model=run_time_model)
+    sequence.configure(**config)
+    return sequence
+
+
+def bench_startup(run_time_model, repeat):
+    """Time to create and configure a sequence, excluding the first import of its module."""
+    fake_sal = create_fake_sal(0.)
+    results = {}
+    for name in get_registry().names():
+        get_registry().resolve(name)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            create_sequence(name, fake_sal, run_time_model)
+        results[name] = (time.perf_counter() - start) / repeat
+    return results
+
+
+def bench_command_overhead(run_time_model, n_images):
+    """Per-command overhead of ATTakeImage, with commands that take no time on the fake components."""
+    sequence = create_sequence('ATTakeImage', create_fake_sal(0.), run_time_model, numImages=n_images)
+    start = time.perf_counter()
+    sequence.execute()
+    elapsed = time.perf_counter() - start
+    return {'n_commands': n_images,
+            'overhead_per_command': elapsed / n_images,
+            'commands_per_second': n_images / elapsed}
+
+
+def bench_sequences(run_time_model, command_latency):
+    """End to end run time of each sequence, with commands taking ``command_latency`` seconds."""
+    configs = {'ATTakeImage': dict(numImages=10, batch_size=1),
+               'ATTakeImage_batched': dict(numImages=10, batch_size=5, max_outstanding=2),
+               'WavelengthCalibrationSequence': dict(capture=False),
+               'ATRaiseException': dict()}
+    results = {}
+    for label, config in configs.items():
+        sequence = create_sequence(label.split('_')[0], create_fake_sal(command_latency), run_time_model,
+                                   **config)
+        start = time.perf_counter()
+        try:
+            sequence.execute()
+            status = 'done'
+        except Exception as e:
+            status = 'failed: {}'.format(e)
+        results[label] = {'elapsed': time.perf_counter() - start, 'status': status}
+    return results
+
+
+def compare(results, reference_filename):
+    """Log the ratio of each timing with respect to a previous result file."""
+    logger = logging.getLogger("benchmark")
+    with open(reference_filename) as reference_file:
+        reference = json.load(reference_file)
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if key not in previous:
+                continue
+            if isinstance(value, dict):
+                walk(value, previous[key], path + [key])
+            elif isinstance(value, float) and previous[key]:
+                logger.info('%-60s %10.6f %10.6f (x%.2f)', '.'.join(path + [key]), previous[key], value,
+                            value / previous[key])
+
+    logger.info('Comparing with %s (version %s)', reference_filename, reference.get('version'))
+    walk(results['benchmarks'], reference['benchmarks'], [])
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-o", "--output", default=None,
+                        help="Result file, by default benchmarks/results/<version>.json.")
+    parser.add_argument("--compare", default=None, help="Previous result file to compare with.")
+    parser.add_argument("--repeat", default=100, type=int, help="Repetitions for the startup benchmark.")
+    parser.add_argument("--n-images", default=500, type=int,
+                        help="Images for the command overhead benchmark.")
+    parser.add_argument("--command-latency", default=0.05, type=float,
+                        help="Simulated time, in seconds, taken by each command in the end to end benchmark.")
+    return parser
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logger = logging.getLogger("benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Keep the benchmark from learning into, or reading from, the user run time model.
+        run_time_model = RunTimeModel(os.path.join(tmp_dir, 'run_time.json'))
+        results = {'version': __version__,
+                   'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   'benchmarks': {'startup': bench_startup(run_time_model, args.repeat),
+                                  'command_overhead': bench_command_overhead(run_time_model, args.n_images),
+                                  'sequences': bench_sequences(run_time_model, args.command_latency)}}
+
+    logger.info(json.dumps(results, indent=2))
+
+    output = args.output
+    if output is None:
+        output = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                              '{}.json'.format(__version__))
+    if not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    logger.info('Results written to %s', output)
+
+    if args.compare is not None:
+        compare(results, args.compare)
+
+    return 0
+
+
+if __name__ == '__main__':
+    parser = create_parser()
+    main(parser.parse_args())
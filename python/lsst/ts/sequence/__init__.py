@@ -21,5 +21,32 @@
 
 from .version import *  # Generated by sconsUtils
 from .setup import *
+from .tracing import *
+from .metrics import *
+from .history import *
+from .deadline import *
+from .component import *
+from .preflight import *
+from .event_cache import *
+from .dds_pool import *
+from .run_time_model import *
+from .config import *
+from .scheduler import *
+from .checkpoint import *
 from .base_sequence import *
-from .atcs import *
+from .registry import *
+from .request_queue import *
+from .runner import *
+from .daemon import *
+from .daemon_client import *
+from .fake_sal import *
+from .simulation import *
+
+
+def __getattr__(name):
+    """Import the sequences on first access, e.g. ``lsst.ts.sequence.ATTakeImage``, so importing the
+    package does not import the sequence modules and their dependencies.
+    """
+    if not name.startswith('_') and name in get_registry():
+        return get_registry().resolve(name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
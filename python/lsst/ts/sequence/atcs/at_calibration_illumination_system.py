@@ -1,35 +1,77 @@
+import asyncio
+import collections
+import datetime
 import os
 import time
-from salpytools import salpylib
-from astropy.io import fits
 import numpy as np
 
 from lsst.ts.sequence import BaseSequence
+from lsst.ts.sequence.component import get_executor
+from lsst.ts.sequence.data_capture import DataCapture, build_header, record_dtype
+from lsst.ts.sequence.deadline import DeadlineExceeded
+from lsst.ts.sequence.flux_estimator import StreamingFluxEstimator
 
-__all__ = ['WavelengthCalibrationSequence']
+__all__ = ['WavelengthCalibrationSequence', 'plan_exposure_times']
+
+# Columns of the electrometer samples and of the measurement at each point.
+ELECTROMETER_DTYPE = [('time', 'f8'), ('point', 'i8'), ('intensity', 'f8'), ('integration_time', 'f8'),
+                      ('flux', 'f8')]
+POINTS_DTYPE = [('point', 'i8'), ('wavelength', 'f8'), ('exptime', 'f8'), ('flux', 'f8'), ('flux_std', 'f8'),
+                ('start', 'f8'), ('end', 'f8')]
+
+
+def plan_exposure_times(intensity, flux, max_exptime):
+    """Compute the exposure times needed to reach a given intensity.
+
+    Parameters
+    ----------
+    intensity: float
+        Target intensity.
+    flux: float or numpy.ndarray
+        Flux at each point. Points with no flux are exposed for ``max_exptime``.
+    max_exptime: float
+        Maximum exposure time in seconds.
+
+    Returns
+    -------
+    exptime: numpy.ndarray
+        Exposure time for each point, in seconds.
+    """
+    flux = np.atleast_1d(np.asarray(flux, dtype=float))
+    exptime = np.full(flux.shape, float(max_exptime))
+    positive = flux > 0.
+    exptime[positive] = np.minimum(intensity / flux[positive], max_exptime)
+    return exptime
 
 
 class WavelengthCalibrationSequence(BaseSequence):
     '''
 
     '''
-    def __init__(self):
+    config_schema = {'intensity': (int, float),
+                     'max_exptime': (int, float),
+                     'gratingType': int,
+                     'fontExitSlitWidth': (int, float),
+                     'fontEntranceSlitWidth': (int, float),
+                     'wavelength': (int, float, list),
+                     'flux_model': (list, type(None)),
+                     'move_time': (int, float),
+                     'move_timeout': (int, float),
+                     'stability_rtol': (int, float),
+                     'stability_samples': int,
+                     'stability_timeout': (int, float),
+                     'flux_window': int,
+                     'capture': bool,
+                     'data_dir': str,
+                     'spectrum_topic': (str, type(None))}
+
+    default_grating = 1  # Grating the monochromator is usually left on
+
+    def __init__(self, **kwargs):
         super().__init__(component_list=[('calibrationElectrometer', 1),
                                          ('atMonochromator', None),
                                          ('sedSpectrometer', None)],
-                         sub_sequences=[])
-
-        # Subscribing to events from the components
-        # Super class creates a sender for each of the components but does not subscribe to events as this will be
-        # heavily dependent on how the sequence is written.
-        # In principle, this could be done at the super class level but not all sequences may need this,
-        # so I'll do it here for now
-        self.ce_events = salpylib.DDSSubscriberContainer(self.component_list[0][0],
-                                                         device_id=self.component_list[0][1])
-        self.atm_event = salpylib.DDSSubscriberContainer(self.component_list[1][0],
-                                                         device_id=self.component_list[1][1])
-        self.sed_events = salpylib.DDSSubscriberContainer(self.component_list[2][0],
-                                                          device_id=self.component_list[2][1])
+                         sub_sequences=[], **kwargs)
 
         # Set the parameters required to configure the script
 
@@ -38,23 +80,96 @@ class WavelengthCalibrationSequence(BaseSequence):
         self.config['gratingType'] = 1  # Grating type
         self.config['fontExitSlitWidth'] = 4.0  # size of exit slit
         self.config['fontEntranceSlitWidth'] = 2.0  # size of entrance slit
-        self.config['wavelength'] = 550  # wavelength in nm
+        self.config['wavelength'] = 550  # wavelength in nm, or list of wavelengths to scan
+        self.config['flux_model'] = None  # relative flux at each scanned wavelength (flat if None)
+        self.config['move_time'] = 5.  # time to move the monochromator between scan points in seconds
+        self.config['move_timeout'] = 60.  # timeout for the monochromator to move in seconds
+        self.config['stability_rtol'] = 0.01  # Relative flux noise and drift accepted as stable
+        self.config['stability_samples'] = 3  # Minimum number of flux samples to decide on stability
+        self.config['stability_timeout'] = 5.  # Max time to wait for the source to stabilize in seconds
+        self.config['flux_window'] = 32  # Number of electrometer samples used to estimate the flux
+        self.config['capture'] = True  # Record the electrometer samples and the measurements
+        self.config['data_dir'] = '~/.sequence/data'  # Where the data products are written
+        self.config['spectrum_topic'] = None  # sedSpectrometer event with the spectra to record, if any
+
+        self.flux_estimator = None  # flux measured by the electrometer, while executing
+        self._integration_time = None
+        self.capture = None  # data capture, while executing
+        self.products = []  # data products written by the last execution
+        self._point = 0  # index of the point being measured
+        self.exposure_times = None  # exposure time at each point of the last scan
 
         # In principle the (O, T, AT)CS should be able to interrogate the class about the components it will use,
         # which are available on self.component_list. Then, the CS would be responsible for enabling them, so when
         # self.execute() is called all the required components are up and running and ready to go.
+        # Until then, enable_preflight checks that they are (and can bring them up) before every run.
+
+    @property
+    def ce_events(self):
+        """Events from calibrationElectrometer."""
+        return self.get_events('calibrationElectrometer')
+
+    @property
+    def ce_cache(self):
+        """Cached events from calibrationElectrometer."""
+        return self.get_event_cache('calibrationElectrometer')
+
+    @property
+    def atm_event(self):
+        """Events from atMonochromator."""
+        return self.get_events('atMonochromator')
+
+    @property
+    def sed_events(self):
+        """Events from sedSpectrometer."""
+        return self.get_events('sedSpectrometer')
+
+    @property
+    def sed_cache(self):
+        """Cached events from sedSpectrometer."""
+        return self.get_event_cache('sedSpectrometer')
 
     def configure(self, **kwargs):
         # Get the parameters from an event and configure script
         self.log.debug('Configuring...')
-        self.config['intensity'] = 15000.  # Default intensity
-        self.config['max_exptime'] = 120.  # Max exptime in seconds
-        self.config['gratingType'] = 1  # Grating type
-        self.config['fontExitSlitWidth'] = 4.0  # size of exit slit
-        self.config['fontEntranceSlitWidth'] = 2.0  # size of entrance slit
-        self.config['wavelength'] = 550  # wavelength in nm
+        self.config['intensity'] = kwargs.pop('intensity', 15000.)  # Default intensity
+        self.config['max_exptime'] = kwargs.pop('max_exptime', 120.)  # Max exptime in seconds
+        self.config['gratingType'] = kwargs.pop('gratingType', 1)  # Grating type
+        self.config['fontExitSlitWidth'] = kwargs.pop('fontExitSlitWidth', 4.0)  # size of exit slit
+        self.config['fontEntranceSlitWidth'] = kwargs.pop('fontEntranceSlitWidth', 2.0)  # entrance slit size
+        self.config['wavelength'] = kwargs.pop('wavelength', 550)  # wavelength in nm, or list to scan
+        self.config['flux_model'] = kwargs.pop('flux_model', None)  # relative flux at each scanned wavelength
+        self.config['move_time'] = kwargs.pop('move_time', 5.)  # time to move the monochromator
+        self.config['move_timeout'] = kwargs.pop('move_timeout', 60.)  # timeout to move the monochromator
+        self.config['stability_rtol'] = kwargs.pop('stability_rtol', 0.01)
+        self.config['stability_samples'] = kwargs.pop('stability_samples', 3)
+        self.config['stability_timeout'] = kwargs.pop('stability_timeout', 5.)
+        self.config['flux_window'] = kwargs.pop('flux_window', 32)
+        self.config['capture'] = kwargs.pop('capture', True)
+        self.config['data_dir'] = kwargs.pop('data_dir', '~/.sequence/data')
+        self.config['spectrum_topic'] = kwargs.pop('spectrum_topic', None)
+
+    @property
+    def is_scan(self):
+        """True if the sequence is configured to scan a list of wavelengths."""
+        return np.ndim(self.config['wavelength']) > 0
+
+    def flux_shape(self):
+        """Relative flux expected at each scanned wavelength.
 
-    def run_time(self):
+        Returns
+        -------
+        flux_shape: numpy.ndarray
+        """
+        n_points = np.size(self.config['wavelength'])
+        if self.config['flux_model'] is None:
+            return np.ones(n_points)
+        flux_shape = np.asarray(self.config['flux_model'], dtype=float)
+        if flux_shape.shape != (n_points, ):
+            raise ValueError('flux_model must have one value per wavelength.')
+        return flux_shape
+
+    def nominal_run_time(self):
         """
         Extimate run time from set of parameters.
 
@@ -63,64 +178,254 @@ class WavelengthCalibrationSequence(BaseSequence):
         """
         total_sleep_time = 3  # seconds spent sleeping...
 
-        current_grating = self.atm_event.selectedGrating.gratingType
+        # The estimate must not need the monochromator, so assume it is on its usual grating; the run time
+        # model corrects the estimate of each configuration from the measured runs.
         grating_time = 0.
-        if current_grating != self.config['gratingType']:
-            current_grating += 30.  # add 30 seconds to switch grating
-        exptime = self.config['max_exptime']  # will assume max_exptime for simplicity
+        if self.config['gratingType'] != self.default_grating:
+            grating_time += 30.  # add 30 seconds to switch grating
+        if not self.is_scan:
+            exptime = self.config['max_exptime']  # will assume max_exptime for simplicity
+
+            return total_sleep_time+grating_time+exptime
+
+        # The flux is only known once the scan starts, so assume max_exptime at every point.
+        n_points = np.size(self.config['wavelength'])
+        exptime = self.config['max_exptime'] * n_points
 
-        return total_sleep_time+grating_time+exptime
+        return (total_sleep_time+self.config['move_time'])*n_points + grating_time + exptime
 
-    def execute(self):
+    async def execute_async(self):
 
+        # Estimate the flux from every electrometer sample while executing
+        self.flux_estimator = StreamingFluxEstimator(self.config['flux_window'])
+        self._integration_time = self.ce_cache.integrationTime
+        self._point = 0
+        if self.config['capture'] and not self.dry_run:
+            # Record the data in the background while executing
+            prefix = '{}-{}'.format(self.name, datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+            self.capture = DataCapture(self.config['data_dir'], prefix, header=build_header(self.config),
+                                       dtypes={'electrometer': ELECTROMETER_DTYPE, 'points': POINTS_DTYPE})
+            self.capture.start()
+            if self.config['spectrum_topic'] is not None:
+                self.sed_cache.topic(self.config['spectrum_topic']).add_callback(self._add_spectrum)
+        self.ce_cache.intensity.add_callback(self._add_flux_sample)
+        try:
+            if self.is_scan:
+                await self.scan_async()
+            else:
+                await self.single_wavelength_async()
+        except BaseException:
+            await self._stop_recording(failed=True)
+            raise
+        await self._stop_recording(failed=False)
+
+    async def _stop_recording(self, failed):
+        # When the sequence failed, failing to write the data is only logged so the sequence error is raised.
+        self.ce_cache.intensity.remove_callback(self._add_flux_sample)
+        if self.capture is None:
+            return
+        if self.config['spectrum_topic'] is not None:
+            self.sed_cache.topic(self.config['spectrum_topic']).remove_callback(self._add_spectrum)
+        capture, self.capture = self.capture, None
+        loop = asyncio.get_running_loop()
+        try:
+            self.products = await loop.run_in_executor(get_executor(), capture.close)
+        except Exception:
+            if not failed:
+                raise
+            self.log.exception('Failed to write the data of the failed run.')
+            return
+        self.log.info('Data written to %s', ', '.join(self.products))
+
+    def _add_flux_sample(self, intensity):
+        integration_time = self._integration_time.latest
+        if integration_time is not None and integration_time.intTime > 0.:
+            stamp = getattr(intensity, 'private_sndStamp', time.time())
+            flux = intensity.intensity / integration_time.intTime
+            self.flux_estimator.add(flux, stamp)
+            if self.capture is not None:
+                self.capture.record('electrometer', time=stamp, point=self._point,
+                                    intensity=intensity.intensity, integration_time=integration_time.intTime,
+                                    flux=flux)
+
+    def _add_spectrum(self, spectrum):
+        record = collections.OrderedDict(point=self._point)
+        record.update(spectrum._asdict())
+        # The fields of the spectra depend on the topic, so their columns are declared from the first one.
+        if 'spectra' not in self.capture.dtypes:
+            self.capture.dtypes['spectra'] = record_dtype(record)
+        self.capture.record('spectra', **record)
+
+    def _record_point(self, wavelength, exptime, start):
+        # Summary of a measurement, with the flux over the last electrometer samples
+        if self.capture is not None:
+            flux, std = self.flux_estimator.mean, self.flux_estimator.std
+            self.capture.record('points', point=self._point, wavelength=float(wavelength),
+                                exptime=float(exptime), flux=np.nan if flux is None else flux,
+                                flux_std=np.nan if std is None else std, start=start, end=time.time())
+
+    async def single_wavelength_async(self):
+        """Take a spectrum at the configured wavelength.
+        """
         # Set up monochromator. This command is commented now so it won't stress the system with tests
         self.log.debug('Setting up Monochromator...')
-        # cmd_id = self.sender.atMonochromator.send_Command('updateMonochromatorSetup',
-        #                                                   gratingType=self.gratingType,
-        #                                                   fontExitSlitWidth=self.fontExitSlitWidth,
-        #                                                   fontEntranceSlitWidth=self.fontEntranceSlitWidth,
-        #                                                   wavelength=self.wavelength,
-        #                                                   wait_command=True)
-
-        # sleep for 1 second after setting monochromator so the measurement stabilizes
-        self.log.debug('Wait for source stabilization...')
-        time.sleep(1.)
-        # Get a measure of the current intensity from events
-        if self.ce_events.intensity.intensity == 0.:
+        # await self.move_monochromator_async(self.config['wavelength'])
+
+        flux = await self.measure_flux_async(self.deadline)
+        if flux is None:
             # FIXME: For testing purposes I won't raise this exception. We should also consider how to inform the
             # OCS of this. We would probably need to add an error event or something like that.
             # raise IOError("Lamp intensity is zero! It is either switched off or integration time is too short.")
-            exptime = self.config['max_exptime']
-        else:
-            flux = self.ce_events.intensity.intensity / self.ce_events.integrationTime.intTime
-            exptime = self.intensity / flux
-            if exptime > self.max_exptime:
-                # Will probably want to send a warning event here
-                exptime = self.max_exptime
+            self.log.warning('No flux measured, exposing for %.1f s.', self.config['max_exptime'])
+        # Will probably want to send a warning event if exptime is clipped to max_exptime
+        exptime = self.flux_estimator.exposure_time(self.config['intensity'], self.config['max_exptime'])
         self.log.debug('Exposure time is %.2f s', exptime)
 
+        start = time.time()
+        cmd_id2, cmd_id3 = await self.take_spectrum_async(exptime, self.deadline)
+
+        # wait for sedSpectrometer and calibrationElectrometer to finish
+        await asyncio.gather(self.sedSpectrometer.wait_completion_async(cmd_id3, timeout=exptime+30.,
+                                                                        deadline=self.deadline, check=True),
+                             self.calibrationElectrometer.wait_completion_async(cmd_id2, timeout=exptime+30.,
+                                                                                deadline=self.deadline,
+                                                                                check=True))
+        self._record_point(self.config['wavelength'], exptime, start)
+
+        self.log.debug('Sequence complete...')
+
+    async def scan_async(self):
+        """Measure the throughput at each wavelength of the scan.
+
+        Exposure times for all the remaining points are recomputed at once every time a new flux measurement
+        scales the flux model, and the monochromator moves to the next wavelength while the current spectrum
+        is read out. Each point gets a share of the remaining time budget of the run in proportion to its
+        estimated time.
+        """
+        wavelengths = np.atleast_1d(np.asarray(self.config['wavelength'], dtype=float))
+        flux_shape = self.flux_shape()
+        self.exposure_times = np.full(len(wavelengths), float(self.config['max_exptime']))
+
+        # When resuming, skip the points measured by the previous run.
+        first_point = self.resume_step
+        self.log.debug('Scanning %i wavelengths...', len(wavelengths) - first_point)
+        await self.move_monochromator_async(wavelengths[first_point], self.deadline)
+
+        for i in range(first_point, len(wavelengths)):
+            wavelength = wavelengths[i]
+            self._point = i
+            deadline = self._point_deadline(i)
+            flux = await self.measure_flux_async(deadline)
+            if flux is not None and flux_shape[i] > 0.:
+                self.exposure_times[i:] = plan_exposure_times(self.config['intensity'],
+                                                              flux / flux_shape[i] * flux_shape[i:],
+                                                              self.config['max_exptime'])
+            exptime = self.exposure_times[i]
+            self.log.debug('Point %i of %i: wavelength %.1f nm, exposure time %.2f s', i+1, len(wavelengths),
+                           wavelength, exptime)
+
+            start = time.time()
+            cmd_id2, cmd_id3 = await self.take_spectrum_async(exptime, deadline)
+
+            # The electrometer finishes 1 second after the spectrum integration ends; from then on the
+            # monochromator can move while the spectrum is read out.
+            await self.calibrationElectrometer.wait_completion_async(cmd_id2, timeout=exptime+30.,
+                                                                     deadline=deadline, check=True)
+            self._record_point(wavelength, exptime, start)
+            waits = [self.sedSpectrometer.wait_completion_async(cmd_id3, timeout=exptime+30.,
+                                                                deadline=deadline, check=True)]
+            if i+1 < len(wavelengths):
+                waits.append(self.move_monochromator_async(wavelengths[i+1], deadline))
+            await asyncio.gather(*waits)
+            self.save_checkpoint(i+1, [cmd_id2, cmd_id3])
+
+        self.log.debug('Scan complete...')
+
+    def _point_deadline(self, i):
+        # Share of the remaining budget for point i, from the time estimated for each remaining point.
+        if self.deadline is None:
+            return None
+        point_times = 3. + self.config['move_time'] + self.exposure_times[i:]
+        return self.deadline.share(point_times[0], point_times.sum())
+
+    async def move_monochromator_async(self, wavelength, deadline=None):
+        """Set up the monochromator for a wavelength.
+
+        Parameters
+        ----------
+        wavelength: float
+            Wavelength in nm.
+        deadline: Deadline, optional
+            Deadline of the move.
+        """
+        self.log.debug('Moving Monochromator to %.1f nm...', wavelength)
+        await self.atMonochromator.run_command_async(
+            'updateMonochromatorSetup', timeout=self.config['move_timeout'], deadline=deadline, check=True,
+            gratingType=self.config['gratingType'], fontExitSlitWidth=self.config['fontExitSlitWidth'],
+            fontEntranceSlitWidth=self.config['fontEntranceSlitWidth'], wavelength=float(wavelength))
+
+    async def measure_flux_async(self, deadline=None):
+        """Wait for the source to stabilize and measure its flux with the electrometer.
+
+        The flux estimate starts over, and the source is stable once the noise and drift of the flux over
+        the estimator window are within ``stability_rtol``.
+
+        Parameters
+        ----------
+        deadline: Deadline, optional
+            Deadline of the measurement.
+
+        Returns
+        -------
+        flux: float
+            Mean flux, or None if the electrometer reads no intensity.
+        """
+        # Wait for the intensity measured by the electrometer to stabilize after setting the monochromator
+        self.log.debug('Wait for source stabilization...')
+        self.flux_estimator.reset()
+        try:
+            await self.ce_cache.intensity.wait_for_async(
+                lambda last: self.flux_estimator.is_stable(self.config['stability_rtol'],
+                                                           self.config['stability_samples']),
+                timeout=self.config['stability_timeout'], fresh=True, deadline=deadline)
+        except DeadlineExceeded:
+            raise
+        except TimeoutError:
+            self.log.warning('Source did not stabilize in %.1f s.', self.config['stability_timeout'])
+        flux = self.flux_estimator.mean
+        if flux is None or flux <= 0.:
+            return None
+        self.log.debug('Flux is %g +/- %g, drifting %g per second.', flux, self.flux_estimator.std or 0.,
+                       self.flux_estimator.drift or 0.)
+        return flux
+
+    async def take_spectrum_async(self, exptime, deadline=None):
+        """Start an electrometer scan and a spectrum, and wait for the spectrum integration to start.
+
+        Parameters
+        ----------
+        exptime: float
+            Integration time of the spectrum in seconds.
+        deadline: Deadline, optional
+            Deadline of the measurement.
+
+        Returns
+        -------
+        cmd_ids: tuple
+            The electrometer and spectrometer command ids.
+        """
         # Now take a spectrum and measure intensity at the same time
-        # Will not wait for this command, so we can capture a spectrum simultaneously
         # We can improve this control sequence here but for now lets keep it simple, I'll just add 2 extra seconds
         # so the electrometer read starts 1 second before the sed spectrum and finishes 1 second after.
+        exptime = float(exptime)
         self.log.debug('Starting calibrationElectrometer scan...')
-        cmd_id2 = self.calibrationElectrometer.send_Command('startScanDt',
-                                                            time=exptime + 2.,
-                                                            wait_command=False)
+        cmd_id2 = await self.calibrationElectrometer.send_command_async('startScanDt', time=exptime + 2.)
         # wait for calibrationElectrometer to start
-        self.calibrationElectrometer.waitForInProgress(cmdid=cmd_id2[0], timeout=exptime+30.)
+        await self.calibrationElectrometer.wait_in_progress_async(cmd_id2, timeout=exptime+30.,
+                                                                  deadline=deadline)
 
-        # Take a spectrum with SED Spectrograph. Wait for the read to complete.
+        # Take a spectrum with SED Spectrograph.
         self.log.debug('Starting sedSpectrometer exposure...')
-        cmd_id3 = self.sedSpectrometer.send_Command('captureSpectImage', imageType='test',
-                                                    integrationTime=exptime, lamp='lamp',
-                                                    wait_command=False)
-
-        # wait for sedSpectrometer to finish
-        self.sedSpectrometer.waitForCompletion(cmdid=cmd_id3[0], timeout=exptime+30.)
-
-        # wait for calibration Electrometer to finish
-        self.calibrationElectrometer.waitForCompletion(cmdid=cmd_id2[0], timeout=exptime+30.)
-
-        self.log.debug('Sequence complete...')
-
+        cmd_id3 = await self.sedSpectrometer.send_command_async('captureSpectImage', imageType='test',
+                                                                integrationTime=exptime, lamp='lamp')
+        return cmd_id2, cmd_id3
@@ -1,11 +1,8 @@
 import os
 import time
-from salpytools import salpylib
-from astropy.io import fits
-import numpy as np
 import datetime
 
-from lsst.ts.sequence import BaseSequence
+from lsst.ts.sequence import BaseSequence, Command
 
 __all__ = ['ATTakeImage']
 
@@ -18,23 +15,20 @@ class ATTakeImage(BaseSequence):
     """
     Implementation of the take image sequence with the AT Camera.
     """
-    def __init__(self):
+    config_schema = {'numImages': int,
+                     'expTime': (int, float),
+                     'shutter': bool,
+                     'science': bool,
+                     'read_out_time': (int, float),
+                     'shutter_time': (int, float),
+                     'batch_size': int,
+                     'max_outstanding': int}
+
+    def __init__(self, **kwargs):
         super().__init__(component_list=[('atcamera', None),
                                          ('atHeaderService', None),
                                          ('atArchiver', None)],
-                         sub_sequences=[])
-
-        # Subscribing to events from the components
-        # Super class creates a sender for each of the components but does not subscribe to events as this will be
-        # heavily dependent on how the sequence is written.
-        # In principle, this could be done at the super class level but not all sequences may need this,
-        # so I'll do it here for now
-        self.atcam_events = salpylib.DDSSubscriberContainer(self.component_list[0][0],
-                                                            device_id=self.component_list[0][1])
-        self.athdr_events = salpylib.DDSSubscriberContainer(self.component_list[1][0],
-                                                            device_id=self.component_list[1][1])
-        self.atarc_events = salpylib.DDSSubscriberContainer(self.component_list[2][0],
-                                                            device_id=self.component_list[2][1])
+                         sub_sequences=[], **kwargs)
 
         # Set the parameters required to configure the script
         self.image_counter = 0
@@ -44,9 +38,27 @@ class ATTakeImage(BaseSequence):
         self.config['shutter'] = False  # Should the shutter be opened (True) or kept closed?
         self.config['science'] = False  # Is this a science image? True or False
         self.config['read_out_time'] = 2.  # Readout time in seconds
+        self.config['shutter_time'] = 2.  # Time to open and close the shutter in seconds
+        self.config['batch_size'] = 1  # Number of images requested on each takeImages command
+        self.config['max_outstanding'] = 1  # Number of takeImages commands allowed in flight at once
 
         self.image_root_name = time_stamped()
 
+    @property
+    def atcam_events(self):
+        """Events from atcamera."""
+        return self.get_events('atcamera')
+
+    @property
+    def athdr_events(self):
+        """Events from atHeaderService."""
+        return self.get_events('atHeaderService')
+
+    @property
+    def atarc_events(self):
+        """Events from atArchiver."""
+        return self.get_events('atArchiver')
+
     def configure(self, **kwargs):
         # Get the parameters from an event and configure script
         self.log.debug('Configuring...')
@@ -56,8 +68,10 @@ class ATTakeImage(BaseSequence):
         self.config['science'] = kwargs.pop('science', False)
         self.config['read_out_time'] = kwargs.pop('read_out_time', 2.)
         self.config['shutter_time'] = kwargs.pop('shutter_time', 2.)
+        self.config['batch_size'] = kwargs.pop('batch_size', 1)
+        self.config['max_outstanding'] = kwargs.pop('max_outstanding', 1)
 
-    def run_time(self):
+    def nominal_run_time(self):
         """
         Extimate run time from set of parameters.
 
@@ -65,35 +79,77 @@ class ATTakeImage(BaseSequence):
         run_time: float : seconds
         """
 
+        return self.image_time() * float(self.config['numImages'])
+
+    def image_time(self):
+        """Estimate the time it takes to acquire a single image.
+
+        Returns
+        -------
+        image_time: float : seconds
+        """
         return (self.config['expTime'] +
                 self.config['read_out_time'] +
-                (self.config['shutter_time'] if self.config['shutter'] else 0.)) * float(self.config['numImages'])
+                (self.config['shutter_time'] if self.config['shutter'] else 0.))
 
-    def execute(self):
+    async def execute_async(self):
 
         self.log.debug('Starting take image sequence...')
 
-        for n_image in self.config['numImages']:
-            self.log.debug('Taking image %i of %i...', n_image, self.config['numImages'])
-
-            cmd_id = self.atcamera.send_Command('takeImages', numImages=1,
-                                                expTime=self.config['expTime'],
-                                                shutter=self.config['shutter'],
-                                                imageSequenceName=self.image_name,
-                                                science=self.config['science'],
-                                                wait_command=True)
-
-            # Checks that the command was executed, interrupt if it failed
-            ack = self.atcamera.cmd_responses[cmd_id[0]]['ack'][-1]  # Get the last ack
-            if ack[0] != 303 and ack[1] != 0:
-                raise IOError('Sequence could not be executed. Received (%i, %i, %s) ack response.' % (ack[0],
-                                                                                                       ack[1],
-                                                                                                       ack[2]))
-            else:
-                self.log.debug('Image %i of %i complete.', n_image, self.config['numImages'])
+        num_images = int(self.config['numImages'])
+        batch_size = max(1, int(self.config['batch_size']))
+        max_outstanding = max(1, int(self.config['max_outstanding']))
+
+        # When resuming, continue the image names of the previous run after the images it completed.
+        images_done = self.resume_step
+        if images_done > 0:
+            self.image_root_name = self.resume_state.state['image_root_name']
+            self.image_counter = self.resume_state.state['image_counter']
+            self.log.info('Skipping %i images taken by the previous run.', images_done)
+
+        # Images are requested in batches of batch_size frames per takeImages command, with up to
+        # max_outstanding commands in flight so the camera does not idle waiting for each round trip.
+        # The pipeline builds commands ahead of their completion, so the image name counter is ahead of
+        # the images done; each command takes one image name.
+        first_counter = self.image_counter
+        commands = self._take_images_commands(images_done, num_images, batch_size)
+        async for batch in self.atcamera.pipeline(commands, window=max_outstanding, deadline=self.deadline):
+            # The images of a batch are taken by a single command, so they are reported together when it
+            # completes.
+            for _ in range(batch.command.kwargs['numImages']):
+                images_done += 1
+                self.log.debug('Image %i of %i complete.', images_done, num_images)
+
+            # Batches complete in order, so all the images up to this one are done.
+            self.save_checkpoint(images_done, [batch.cmd_id], image_root_name=self.image_root_name,
+                                 image_counter=first_counter + batch.index + 1)
 
         self.log.debug('Take image sequence complete...')
 
+    def _take_images_commands(self, images_done, num_images, batch_size):
+        """Build the takeImages commands of the images left to take.
+
+        Parameters
+        ----------
+        images_done: int
+            Number of images already taken.
+        num_images: int
+            Total number of images in the sequence.
+        batch_size: int
+            Number of images requested by each command.
+
+        Yields
+        ------
+        command: Command
+        """
+        for first_image in range(images_done, num_images, batch_size):
+            n_batch = min(batch_size, num_images - first_image)
+            self.log.debug('Taking images %i to %i of %i...', first_image+1, first_image+n_batch, num_images)
+            yield Command('takeImages', self.image_time() * n_batch + 30.,
+                          dict(numImages=n_batch, expTime=self.config['expTime'],
+                               shutter=self.config['shutter'], imageSequenceName=self.image_name,
+                               science=self.config['science']))
+
     @property
     def image_name(self):
         """
@@ -104,4 +160,4 @@ class ATTakeImage(BaseSequence):
         image_name: str: Self generated image name.
         """
         self.image_counter += 1
-        return self.image_root_name.format(self.image_counter)
+        return self.image_root_name.format(index=self.image_counter)
@@ -1,5 +1,3 @@
-import time
-
 from lsst.ts.sequence import BaseSequence
 
 __all__ = ['ATRaiseException']
@@ -8,9 +6,16 @@ class ATRaiseException(BaseSequence):
     """
     Test script that just raises an exception.
     """
-    def __init__(self):
+    config_schema = {}
+
+    def __init__(self, **kwargs):
         super().__init__(component_list=[],
-                         sub_sequences=[])
+                         sub_sequences=[], **kwargs)
+
+    def configure(self, **kwargs):
+        """Nothing to configure.
+        """
+        pass
 
     def execute(self):
         """Wait one second and raises an exception.
@@ -19,6 +24,6 @@ class ATRaiseException(BaseSequence):
         -------
 
         """
-        time.sleep(1.)
+        self.sleep(1.)
 
         raise IOError("This is a test exception.")
@@ -1,32 +1,166 @@
+import asyncio
+import collections
+import itertools
 import logging
-from salpytools import salpylib
 import json
+import time
+
+from .checkpoint import Checkpoint, default_checkpoint_path
+from .config import ConfigSweep
+from .dds_pool import get_pool
+from .deadline import Deadline
+from .metrics import get_metrics
+from .preflight import PreflightError, check_components, format_preflight
+from .run_time_model import get_run_time_model
+from .scheduler import SequenceScheduler
+from .simulation import DryRun
+from .tracing import get_tracer
 
 __all__ = ['BaseSequence']
 
 
 class BaseSequence:
 
-    def __init__(self, component_list, sub_sequences=None):
+    # Type, or tuple of types, accepted for each configuration parameter. Configuration files are checked
+    # against it (see validate_config); None accepts any parameter.
+    config_schema = None
+
+    # Time budget of a run, relative to its estimated run time, and extra time in seconds (see time_budget).
+    deadline_margin = 0.2
+    deadline_slack = 10.
+
+    def __init__(self, component_list, sub_sequences=None, pool=None, run_time_model=None):
         self._name = type(self).__name__
+        self.name = self._name  # Name of this instance when used as a sub-sequence.
         self.log = logging.getLogger(self._name)
 
-        self.sender = salpylib.DDSSend('ocs')  # to send request to the OCS.
+        # Senders and subscribers are taken lazily from a shared pool, so creating a sequence does not touch
+        # DDS until a component is actually used.
+        self.pool = pool if pool is not None else get_pool()
+
+        # Measured run times, used to refine the nominal run time estimate.
+        self.run_time_model = run_time_model if run_time_model is not None else get_run_time_model()
 
         self.config = {}
 
+        # Journal of the completed steps, used to resume the sequence after a failure (see
+        # enable_checkpoint and resume).
+        self.checkpoint = None
+        self.resume_state = None
+
+        # Sweep, as given by ConfigSweep.to_dict, and index of the configuration being run when running each
+        # configuration of a sweep, so the checkpoints journal the whole sweep.
+        self.sweep_point = None
+
+        # True when running against simulated components (see DryRun), e.g. to skip recording data.
+        self.dry_run = False
+
+        # Options of the check that the components are ready before running (see enable_preflight).
+        self.preflight_options = None
+
+        # Time budget and cancellation of the run in progress, passed to the command waits (see abort).
+        self.deadline = None
+
         self.component_list = component_list
 
-        # TODO: Placeholder for when a sequence uses a list of sub-sequences to perform part of its actions.
+        # Sub-sequences perform part of the sequence actions. They are run by a SequenceScheduler, in parallel
+        # unless they depend on each other (see add_sub_sequence) or share a component.
         self.sub_sequences = []
+        self.sub_sequence_dependencies = {}
         if sub_sequences is not None:
-            self.sub_sequences = sub_sequences
+            for sub_sequence in sub_sequences:
+                self.add_sub_sequence(sub_sequence)
+
+    def __getattr__(self, item):
+        # Resolve component senders (e.g. self.atcamera) on first use.
+        for component in self.__dict__.get('component_list', ()):
+            if component[0] == item:
+                return self.pool.get_remote(component[0], component[1])
+        raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, item))
+
+    def add_sub_sequence(self, sequence, depends_on=(), name=None):
+        """Add a sub-sequence.
+
+        Parameters
+        ----------
+        sequence: BaseSequence
+            The sub-sequence.
+        depends_on: iterable of str
+            Names of the sub-sequences that must complete before this one starts.
+        name: str, optional
+            Name of the sub-sequence, by default the name of its class. Names must be unique within a
+            sequence.
+        """
+        if name is not None:
+            sequence.name = name
+        if sequence.name in self.sub_sequence_dependencies:
+            raise ValueError('{} already has a sub-sequence named {}.'.format(self._name, sequence.name))
+        self.sub_sequences.append(sequence)
+        self.sub_sequence_dependencies[sequence.name] = list(depends_on)
+
+    async def execute_sub_sequences(self, fail_fast=True):
+        """Run all the sub-sequences, respecting their dependencies and components.
+
+        Parameters
+        ----------
+        fail_fast: bool
+            Cancel the remaining sub-sequences as soon as one fails.
+
+        Returns
+        -------
+        results: list of SequenceResult
+        """
+        scheduler = SequenceScheduler(fail_fast=fail_fast, deadline=self.deadline)
+        for sequence in self.sub_sequences:
+            scheduler.add(sequence, self.sub_sequence_dependencies[sequence.name])
+
+        results = await scheduler.run()
+        for result in results:
+            if result.status == 'failed':
+                raise result.error
+        return results
+
+    @property
+    def sender(self):
+        """Sender used to send requests to the OCS."""
+        return self.pool.get_remote('ocs')
 
-        # Dynamically create a sender for each of the components...
-        for component in component_list:
-            self.log.debug('Subscribing to %s sender...', component[0])
-            setattr(self, component[0], salpylib.DDSSend(component[0], component[1]))
-            getattr(getattr(self, component[0]), 'start')()
+    def _component_key(self, component):
+        for name, device_id in self.component_list:
+            if name == component:
+                return name, device_id
+        raise KeyError('{} is not a component of {}.'.format(component, self._name))
+
+    def get_events(self, component):
+        """Return the shared event subscriber container for one of the sequence components.
+
+        Parameters
+        ----------
+        component: str
+            Name of the component, as given in `component_list`.
+
+        Returns
+        -------
+        subscriber: salpylib.DDSSubscriberContainer
+        """
+        return self.pool.get_subscriber(*self._component_key(component))
+
+    def get_event_cache(self, component):
+        """Return the shared event cache for one of the sequence components.
+
+        The cache keeps the latest samples of each topic and lets the sequence wait on conditions instead of
+        sleeping for a fixed time.
+
+        Parameters
+        ----------
+        component: str
+            Name of the component, as given in `component_list`.
+
+        Returns
+        -------
+        event_cache: EventCache
+        """
+        return self.pool.get_event_cache(*self._component_key(component))
 
     def configure(self, **kwargs):
         """Get set of parameters from event and configure sequence.
@@ -41,43 +175,527 @@ class BaseSequence:
         """
         raise NotImplementedError()
 
-    def run_time(self):
+    def nominal_run_time(self):
         """Estimate run time from set of parameters.
 
+        Sequences should override this method with their own estimate. It is used as the prior of `run_time`
+        for configurations that were never measured.
+
         Returns
         -------
-
+        run_time: float : seconds, negative if unknown.
         """
         return -1
 
+    def run_time(self):
+        """Estimate run time from set of parameters and previously measured run times.
+
+        Returns
+        -------
+        run_time: float : seconds, negative if unknown.
+        """
+        return self.run_time_model.estimate(self._name, self.config, self.nominal_run_time())
+
+    def critical_path_run_time(self):
+        """Estimate the run time of the sub-sequences from the longest chain of them that cannot overlap.
+
+        Sub-sequences run in parallel unless they depend on each other or share a component, so this is the
+        longest of the chains of dependent sub-sequences and of the total run time of the sub-sequences of
+        each component.
+
+        Returns
+        -------
+        run_time: float : seconds, negative if unknown, i.e. without sub-sequences or if the run time of
+            one of them is unknown.
+        """
+        run_times = {}
+        for sequence in self.sub_sequences:
+            run_time = (sequence.critical_path_run_time() if len(sequence.sub_sequences) > 0
+                        else sequence.run_time())
+            if run_time is None or run_time <= 0.:
+                return -1
+            run_times[sequence.name] = run_time
+        if len(run_times) == 0:
+            return -1
+
+        ends = {}
+
+        def end_of(name, chain=()):
+            if name not in ends:
+                dependencies = [dependency for dependency in self.sub_sequence_dependencies[name]
+                                if dependency in run_times]
+                if name in chain:
+                    raise ValueError('Sequence dependencies have a cycle involving {}.'.format(name))
+                ends[name] = run_times[name] + max([end_of(dependency, chain + (name, ))
+                                                    for dependency in dependencies], default=0.)
+            return ends[name]
+
+        try:
+            longest = max(end_of(name) for name in run_times)
+        except ValueError:
+            return -1
+        per_component = collections.defaultdict(float)
+        for sequence in self.sub_sequences:
+            for component in sequence.components():
+                per_component[component] += run_times[sequence.name]
+        return max(longest, max(per_component.values(), default=0.))
+
+    def time_budget(self, run_time=None):
+        """Return the time a run of the sequence is allowed to take.
+
+        Parameters
+        ----------
+        run_time: float, optional
+            Estimated run time in seconds, by default `run_time`, or `critical_path_run_time` for a sequence
+            made of sub-sequences.
+
+        Returns
+        -------
+        budget: float
+            The estimated run time plus ``deadline_margin`` of it and ``deadline_slack`` seconds, or None
+            (no time limit) if the run time is unknown.
+        """
+        if run_time is None:
+            run_time = self.critical_path_run_time() if len(self.sub_sequences) > 0 else self.run_time()
+        if run_time is None or run_time <= 0.:
+            return None
+        return run_time * (1. + self.deadline_margin) + self.deadline_slack
+
+    def sleep(self, seconds):
+        """Wait, on the simulated clock when dry running, and stop early if the run is aborted.
+
+        Sequences should use this instead of `time.sleep` in `execute`, and `asyncio.sleep` in
+        `execute_async`.
+
+        Parameters
+        ----------
+        seconds: float
+        """
+        if self.deadline is not None:
+            self.deadline.sleep(seconds)
+        else:
+            self.pool.clock.sleep(seconds)
+
+    def abort(self, reason='aborted'):
+        """Abort the run in progress.
+
+        Cancels the deadline of the run, so its sub-sequences and command waits stop within
+        ``CHECK_INTERVAL`` seconds with `SequenceAborted`, and sends ``abort`` to every component of the
+        sequence with commands that did not complete. May be called from another thread.
+
+        Parameters
+        ----------
+        reason: str
+
+        Returns
+        -------
+        components: list of str
+            Components sent ``abort``.
+        """
+        self.log.warning('Aborting: %s', reason)
+        if self.deadline is not None:
+            self.deadline.cancel(reason)
+        aborted = []
+        for component, device_id in self.components():
+            if not self.pool.has_remote(component, device_id):
+                continue
+            try:
+                if self.pool.get_remote(component, device_id).abort() is not None:
+                    aborted.append(component)
+            except Exception:
+                self.log.exception('Failed to abort %s.', component)
+        return aborted
+
+    def components(self):
+        """Return the components used by the sequence and its sub-sequences.
+
+        Returns
+        -------
+        components: list of tuple
+            The (component, device_id) of each component, once.
+        """
+        components = list(self.component_list)
+        for sub_sequence in self.sub_sequences:
+            components += [component for component in sub_sequence.components()
+                           if component not in components]
+        return components
+
+    def enable_preflight(self, timeout=2., bring_up=False, command_timeout=30., settings=None,
+                         require_state=False):
+        """Check that the components are ready every time the sequence runs.
+
+        Parameters are those of `preflight_async`.
+        """
+        self.preflight_options = {'timeout': timeout, 'bring_up': bring_up,
+                                  'command_timeout': command_timeout, 'settings': settings,
+                                  'require_state': require_state}
+
+    async def preflight_async(self, timeout=2., bring_up=False, command_timeout=30., settings=None,
+                              require_state=False):
+        """Check that all the components of the sequence are ENABLED, all at the same time.
+
+        A component reporting another state is found in about ``timeout`` seconds instead of when a
+        command times out. SAL only publishes the summary state when it changes, so a component that does
+        not report it within ``timeout`` has an unknown state, and is only not ready with ``require_state``.
+
+        Parameters
+        ----------
+        timeout: float
+            Time to wait for the summary state of each component, in seconds.
+        bring_up: bool
+            Send ``start`` and ``enable`` to the components in STANDBY or DISABLED.
+        command_timeout: float
+            Timeout of the commands bringing the components up, in seconds.
+        settings: str, optional
+            ``settingsToApply`` of the ``start`` commands.
+        require_state: bool
+            Fail if the summary state of a component is unknown.
+
+        Returns
+        -------
+        report: list of ComponentStatus
+
+        Raises
+        ------
+        PreflightError
+            If a component is not ready, with the status of every component in its ``report``.
+        """
+        try:
+            report = await check_components(self.pool, self.components(), timeout, bring_up, command_timeout,
+                                            settings, require_state)
+        except PreflightError as e:
+            self.log.error('Preflight failed:\n%s', format_preflight(e.report))
+            raise
+        self.log.debug('Preflight:\n%s', format_preflight(report))
+        return report
+
+    def preflight(self, **kwargs):
+        """Blocking version of `preflight_async`."""
+        return asyncio.run(self.preflight_async(**kwargs))
+
+    def enable_checkpoint(self, filename=None):
+        """Journal the progress of the sequence when it runs.
+
+        Parameters
+        ----------
+        filename: str, optional
+            Path of the journal, by default `default_checkpoint_path`.
+        """
+        if filename is None:
+            filename = default_checkpoint_path(self._name)
+        self.checkpoint = Checkpoint(filename)
+
+    def resume(self, filename=None):
+        """Configure the sequence to continue from the last completed step of a previous run.
+
+        When the run was a sweep, it continues with the configuration it stopped at, or with the next one if
+        that configuration completed.
+
+        Parameters
+        ----------
+        filename: str, optional
+            Path of the journal, by default `default_checkpoint_path`.
+
+        Returns
+        -------
+        state: CheckpointState
+            Progress of the run to continue.
+
+        Raises
+        ------
+        IOError
+            If there is no unfinished run of this sequence to resume.
+        """
+        self.enable_checkpoint(filename)
+        state = self.checkpoint.load()
+        if state is None or state.script != self._name:
+            raise IOError('No run of {} to resume in {}.'.format(self._name, self.checkpoint.filename))
+        n_points = len(ConfigSweep(**state.sweep)) if state.sweep is not None else 1
+        if state.done and state.point + 1 >= n_points:
+            raise IOError('The last run of {} completed, nothing to resume.'.format(self._name))
+
+        if state.done:
+            point = state.point + 1
+            config = next(itertools.islice(ConfigSweep(**state.sweep), point, None))
+            state = state._replace(config=config, step=0, state={}, cmd_ids=[], done=False, point=point)
+            self.resume_state = None
+        else:
+            self.resume_state = state
+        self.configure(**state.config)
+        if state.sweep is not None:
+            self.log.info('Resuming configuration %i of %i after step %i.', state.point + 1, n_points,
+                          state.step)
+        else:
+            self.log.info('Resuming after step %i.', state.step)
+        return state
+
+    @property
+    def resume_step(self):
+        """Number of steps completed by the run being resumed, 0 if not resuming."""
+        return self.resume_state.step if self.resume_state is not None else 0
+
+    def save_checkpoint(self, step, cmd_ids=(), **state):
+        """Record a completed step, if checkpoints are enabled.
+
+        Parameters
+        ----------
+        step: int
+            Number of steps completed.
+        cmd_ids: list of int
+            Commands completed in this step.
+        state
+            Values needed to resume after this step, e.g. image counters.
+        """
+        if self.checkpoint is not None:
+            self.checkpoint.step(step, cmd_ids, state)
+
+    def _start_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        if self.resume_state is not None:
+            self.checkpoint.resume()
+        elif self.sweep_point is not None:
+            self.checkpoint.start(self._name, self.config, *self.sweep_point)
+        else:
+            self.checkpoint.start(self._name, self.config)
+
+    def _finish_checkpoint(self):
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+        self.resume_state = None
+
+    def run(self, deadline=None):
+        """Execute the sequence and record its run time.
+
+        Parameters
+        ----------
+        deadline: Deadline, optional
+            Deadline of the run, by default one with the `time_budget` of the sequence.
+
+        Returns
+        -------
+
+        """
+        if self.preflight_options is not None:
+            self.preflight(**self.preflight_options)
+        self._start_checkpoint()
+        estimate = self._estimate_run_time()
+        self.deadline = self._make_deadline(deadline)
+        start = time.time()
+        try:
+            with get_tracer().span(self.name, 'sequence'):
+                result = self.execute()
+        except KeyboardInterrupt:
+            # Stop the commands still running, so the components are released right away.
+            self.abort('interrupted')
+            raise
+        except Exception:
+            get_metrics().record_sequence(self._name, False)
+            raise
+        finally:
+            self.deadline = None
+        self._finish_run(time.time() - start, estimate)
+        return result
+
+    async def run_async(self, deadline=None):
+        """Execute the sequence on the event loop and record its run time.
+
+        Parameters
+        ----------
+        deadline: Deadline, optional
+            Deadline of the run, by default one with the `time_budget` of the sequence.
+
+        Returns
+        -------
+
+        """
+        if self.preflight_options is not None:
+            await self.preflight_async(**self.preflight_options)
+        self._start_checkpoint()
+        estimate = self._estimate_run_time()
+        self.deadline = self._make_deadline(deadline)
+        start = time.time()
+        try:
+            with get_tracer().span(self.name, 'sequence'):
+                result = await self.execute_async()
+        except asyncio.CancelledError:
+            self.abort('cancelled')
+            raise
+        except Exception:
+            get_metrics().record_sequence(self._name, False)
+            raise
+        finally:
+            self.deadline = None
+        self._finish_run(time.time() - start, estimate)
+        return result
+
+    def _estimate_run_time(self):
+        # A resumed run only performs part of the sequence, so it is not compared with the estimate.
+        if self.resume_state is not None:
+            return None
+        try:
+            return self.run_time()
+        except Exception:
+            self.log.exception('Could not estimate run time.')
+            return None
+
+    def _make_deadline(self, deadline):
+        if deadline is not None:
+            return deadline
+        try:
+            budget = self.time_budget()
+        except Exception:
+            self.log.exception('Could not estimate time budget, running without a time limit.')
+            budget = None
+        return Deadline(budget, self.pool.clock)
+
+    def _finish_run(self, duration, estimate):
+        get_metrics().record_sequence(self._name, True, duration, estimate)
+        if self.resume_state is None:  # A resumed run only measures part of the sequence.
+            self.record_run_time(duration)
+        self._finish_checkpoint()
+
+    def record_run_time(self, duration):
+        """Add a measured run time to the run time model.
+
+        Parameters
+        ----------
+        duration: float
+            Measured run time in seconds.
+        """
+        self.log.debug('Run time was %.2f s', duration)
+        try:
+            self.run_time_model.update(self._name, self.config, duration, self.nominal_run_time())
+            self.run_time_model.save()
+        except Exception:
+            self.log.exception('Could not update run time model.')
+
     def execute(self):
         """Executes script to completion.
 
+        Sequences may override this method directly or implement `execute_async` instead, in which case
+        this method runs it to completion on a new event loop, so it can be called from any thread.
+
         Returns
         -------
 
         """
-        raise NotImplementedError()
+        if type(self).execute_async is BaseSequence.execute_async and len(self.sub_sequences) == 0:
+            raise NotImplementedError()
 
-    def request(self):
-        """Send request to the OCS to run this script.
+        return asyncio.run(self.execute_async())
+
+    async def execute_async(self):
+        """Executes script to completion on the event loop.
+
+        Sequences that drive several components at the same time should override this method and use the
+        awaitable helpers of the component senders (e.g. ``send_command_async``, ``wait_completion_async``)
+        together with `asyncio.gather`. By default, the blocking `execute` is run in a worker thread or, if
+        the sequence does not implement it, the sub-sequences are run.
 
         Returns
         -------
 
         """
+        if type(self).execute is BaseSequence.execute:
+            if len(self.sub_sequences) == 0:
+                raise NotImplementedError()
+            return await self.execute_sub_sequences()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.execute)
+
+    def simulate(self, dry_run=None):
+        """Dry run the sequence with its current configuration against simulated components.
+
+        Parameters
+        ----------
+        dry_run: DryRun, optional
+            Simulation to use, by default one with the `default_components`.
+
+        Returns
+        -------
+        result: DryRunResult
+        """
+        dry_run = dry_run if dry_run is not None else DryRun()
+        return dry_run.run(type(self), self.config)
+
+    def request_payload(self, simulate=False):
+        """Build the request sent to the OCS to run this script.
+
+        Parameters
+        ----------
+        simulate: bool
+            Take the run time from a dry run of the sequence (see `simulate`) instead of `run_time`.
+
+        Returns
+        -------
+        payload: str
+            JSON encoded request.
+        timeout: float
+            Timeout, in seconds, to wait for the OCS to process the request.
+        """
+        run_time = self.run_time()
+        if simulate:
+            result = self.simulate()
+            if result.error is None:
+                run_time = result.duration
+            else:
+                self.log.warning('Dry run failed, using estimated run time: %r', result.error)
         payload = {"script": self._name,
                    "components": self.component_list,
-                   "sub_sequences": self.sub_sequences,
+                   "sub_sequences": [{"name": sequence.name,
+                                      "script": sequence._name,
+                                      "depends_on": self.sub_sequence_dependencies[sequence.name]}
+                                     for sequence in self.sub_sequences],
                    "config": self.config,
-                   "run_time": self.run_time()}
+                   "run_time": run_time}
+
+        return json.dumps(payload), self.time_budget(run_time) if run_time > 0. else 30
+
+    def request(self, simulate=False):
+        """Send request to the OCS to run this script.
+
+        Parameters
+        ----------
+        simulate: bool
+            Derive the timeout from a dry run of the sequence (see `request_payload`).
+
+        Returns
+        -------
+
+        """
+        payload, timeout = self.request_payload(simulate)
 
         self.log.info('Requesting %s', self._name)
-        self.log.debug('payload: %s', json.dumps(payload))
+        self.log.debug('payload: %s', payload)
 
-        run_time = self.run_time()
-        cmd_id = self.sender.send_Command('target', json_parameters=json.dumps(payload),
-                                          wait_command=True, timeout=run_time+10 if run_time > 0. else 30)
-        self.log.info('Got: %s', self.sender.cmd_responses[cmd_id[0]]['ack'][-1])
+        cmd_id = self.sender.send_Command('target', json_parameters=payload,
+                                          wait_command=True, timeout=timeout)
+        self.log.info('Got: %s', self.sender.last_ack(cmd_id[0]))
 
         return True
+
+    async def request_async(self, simulate=False):
+        """Send request to the OCS to run this script, without blocking the event loop.
+
+        Parameters
+        ----------
+        simulate: bool
+            Derive the timeout from a dry run of the sequence (see `request_payload`).
+
+        Returns
+        -------
+        ack: tuple
+            The last ack received from the OCS.
+        """
+        payload, timeout = self.request_payload(simulate)
+
+        self.log.info('Requesting %s', self._name)
+        self.log.debug('payload: %s', payload)
+
+        cmd_id = await self.sender.send_command_async('target', json_parameters=payload)
+        ack = await self.sender.wait_completion_async(cmd_id, timeout=timeout)
+        self.log.info('Got: %s', ack)
+
+        return ack
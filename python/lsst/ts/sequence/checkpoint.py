@@ -0,0 +1,129 @@
+import collections
+import json
+import logging
+import os
+import time
+
+__all__ = ['Checkpoint', 'CheckpointState', 'default_checkpoint_path']
+
+CheckpointState = collections.namedtuple('CheckpointState', ['script', 'config', 'step', 'state', 'cmd_ids',
+                                                             'done', 'sweep', 'point'])
+
+
+def default_checkpoint_path(script):
+    """Return the default path of the checkpoint journal of a sequence.
+
+    Parameters
+    ----------
+    script: str
+        Name of the sequence.
+
+    Returns
+    -------
+    path: str
+    """
+    return os.path.expanduser(os.path.join('~/.sequence/checkpoints', script + '.jsonl'))
+
+
+class Checkpoint:
+    """Journal of the progress of a sequence, used to resume it after a failure.
+
+    The journal is a JSON-lines file with one record when the sequence starts (with its configuration),
+    one record per completed step and one when the sequence finishes. When the sequence runs each
+    configuration of a sweep, the records of every configuration follow each other in the same journal,
+    and each start record holds the sweep and the index of the configuration. Each record is flushed to
+    disk as it is written, so the journal survives the process.
+
+    Parameters
+    ----------
+    filename: str
+        Path of the journal.
+    """
+
+    def __init__(self, filename):
+        self.log = logging.getLogger(type(self).__name__)
+        self.filename = filename
+
+    def _write(self, record, mode='a'):
+        record['time'] = time.time()
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.filename, mode) as journal:
+            journal.write(json.dumps(record) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def start(self, script, config, sweep=None, point=0):
+        """Record that the sequence starts.
+
+        Parameters
+        ----------
+        script: str
+            Name of the sequence.
+        config: dict
+            Configuration of the sequence.
+        sweep: dict, optional
+            Sweep the configuration is taken from (see `ConfigSweep.to_dict`).
+        point: int
+            Index of the configuration in the sweep. The journal is started anew for the first one and
+            continued for the others.
+        """
+        self._write({'event': 'start', 'script': script, 'config': config, 'sweep': sweep, 'point': point},
+                    mode='w' if point == 0 else 'a')
+
+    def resume(self):
+        """Record that the sequence is resumed.
+        """
+        self._write({'event': 'resume'})
+
+    def step(self, step, cmd_ids=(), state=None):
+        """Record a completed step.
+
+        Parameters
+        ----------
+        step: int
+            Number of steps completed.
+        cmd_ids: list of int
+            Commands completed in this step.
+        state: dict, optional
+            State needed to resume after this step.
+        """
+        self._write({'event': 'step', 'step': step, 'cmd_ids': list(cmd_ids),
+                     'state': state if state is not None else {}})
+
+    def finish(self):
+        """Record that the sequence completed.
+        """
+        self._write({'event': 'done'})
+
+    def load(self):
+        """Read the journal.
+
+        Returns
+        -------
+        state: CheckpointState
+            Progress of the sequence with the last configuration started, or None if there is no journal.
+            A truncated last record is ignored.
+        """
+        if not os.path.exists(self.filename):
+            return None
+
+        script, config, step, state, cmd_ids, done, sweep, point = None, {}, 0, {}, [], False, None, 0
+        with open(self.filename) as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self.log.warning('Ignoring invalid record in %s.', self.filename)
+                    continue
+                if record['event'] == 'start':
+                    script, config = record['script'], record['config']
+                    sweep, point = record.get('sweep'), record.get('point', 0)
+                    step, state, cmd_ids, done = 0, {}, [], False
+                elif record['event'] == 'step':
+                    step, state = record['step'], record['state']
+                    cmd_ids.extend(record['cmd_ids'])
+                elif record['event'] == 'done':
+                    done = True
+        return CheckpointState(script, config, step, state, cmd_ids, done, sweep, point)
@@ -0,0 +1,515 @@
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import threading
+
+from .deadline import CHECK_INTERVAL
+from .history import CommandHistory
+from .metrics import get_metrics
+from .tracing import get_tracer
+
+__all__ = ['Command', 'CommandFailed', 'Completion', 'RemoteComponent', 'check_ack']
+
+# Ack codes of commands not completed yet: acknowledged, in progress and stalled.
+INTERMEDIATE_ACKS = (300, 301, 302)
+SAL__CMD_COMPLETE = 303
+
+# Command sent by `RemoteComponent.pipeline`, with its timeout in seconds and parameters.
+Command = collections.namedtuple('Command', ['cmd', 'timeout', 'kwargs'])
+# Command completed by `RemoteComponent.pipeline`, with its position in the stream of commands.
+Completion = collections.namedtuple('Completion', ['index', 'cmd_id', 'command', 'ack'])
+
+
+class CommandFailed(IOError):
+    """Raised when a command did not complete.
+
+    Parameters
+    ----------
+    component: str
+        Name of the component.
+    cmd: str
+        Name of the command.
+    cmd_id: int
+    ack: tuple
+        The last (ack, error, result) received for the command, or None if nothing was received.
+    """
+
+    def __init__(self, component, cmd, cmd_id, ack):
+        self.component = component
+        self.cmd = cmd
+        self.cmd_id = cmd_id
+        self.ack = ack
+        super().__init__('{} {} (cmd_id {}) did not complete, last ack {}.'.format(
+            component, cmd, cmd_id, ack))
+
+
+def check_ack(ack, component=None, cmd=None, cmd_id=None):
+    """Check that a command completed.
+
+    Parameters
+    ----------
+    ack: tuple
+        The last (ack, error, result) received for the command.
+    component: str, optional
+    cmd: str, optional
+    cmd_id: int, optional
+        Component, command and id given in the error.
+
+    Returns
+    -------
+    ack: tuple
+
+    Raises
+    ------
+    CommandFailed
+        If the command did not complete, i.e. it failed, timed out or nothing was received.
+    """
+    if ack is None or ack[0] != SAL__CMD_COMPLETE:
+        raise CommandFailed(component, cmd, cmd_id, ack)
+    return ack
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the thread pool used to run blocking DDS calls.
+
+    The pool is shared by all components so a sequence driving several of them at once does not
+    create one thread pool per component.
+
+    Returns
+    -------
+    executor: concurrent.futures.ThreadPoolExecutor
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='sequence-dds')
+        return _executor
+
+
+class _Outstanding:
+    """Command waiting for completion."""
+
+    __slots__ = ('cmd', 'sent_at', 'acked_at', 'in_progress_at')
+
+    def __init__(self, cmd, sent_at):
+        self.cmd = cmd
+        self.sent_at = sent_at
+        self.acked_at = None
+        self.in_progress_at = None
+
+    @property
+    def phase_start(self):
+        # Start of the phase the command is in, as far as it was seen.
+        for start in (self.in_progress_at, self.acked_at, self.sent_at):
+            if start is not None:
+                return start
+
+
+class RemoteComponent:
+    """Wrap a `salpylib.DDSSend` sender with awaitable command helpers.
+
+    Attributes not defined here are forwarded to the underlying sender, so existing code calling
+    ``send_Command`` or ``waitForCompletion`` keeps working unchanged.
+
+    The responses of completed commands are moved from the sender ``cmd_responses``, which would
+    otherwise grow with every command, to a bounded `CommandHistory` keeping their last ack. Use
+    `last_ack` to read it; waiting on a command already moved returns its last ack from the history, or
+    None if the history forgot it. Commands sent without waiting for them are moved once more than
+    ``history_size`` of them are outstanding.
+
+    The latency of each phase of the commands (send to ack, ack to in progress and in progress to
+    complete) is recorded in `Metrics`. A phase ends when a wait first sees the ack ending it: the ack phase
+    lasts until a wait sees the command acknowledged or in progress, and a command only waited on for
+    completion is timed as a whole from its send.
+
+    Repetitive commands, e.g. image triggers, are best sent with `pipeline`, which keeps several of them
+    in flight and checks their acks.
+
+    Parameters
+    ----------
+    name: str
+        Name of the component (e.g. ``atcamera``).
+    sender: salpylib.DDSSend
+        The sender used to communicate with the component.
+    tracer: Tracer, optional
+        Tracer recording the commands, by default the process-wide one.
+    history_size: int
+        Number of commands kept in the history.
+    metrics: Metrics, optional
+        Metrics recording the command latencies, by default the process-wide one.
+    """
+
+    def __init__(self, name, sender, tracer=None, history_size=1000, metrics=None):
+        self.name = name
+        self.sender = sender
+        self.tracer = tracer
+        self.metrics = metrics
+        self.history = CommandHistory(history_size)
+        # Commands not completed yet, oldest first, to tag the trace spans of the waits and time them.
+        self._outstanding = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, item):
+        return getattr(self.sender, item)
+
+    @property
+    def _tracer(self):
+        return self.tracer if self.tracer is not None else get_tracer()
+
+    @property
+    def _metrics(self):
+        return self.metrics if self.metrics is not None else get_metrics()
+
+    def send_Command(self, cmd, **kwargs):
+        command = _Outstanding(cmd, self._metrics.clock())
+        with self._tracer.span(cmd, self.name, phase='send') as span:
+            cmd_id = self.sender.send_Command(cmd, **kwargs)
+            span.args['cmd_id'] = cmd_id[0]
+        if kwargs.get('wait_command', False):
+            # Only the total time is known when the sender waits for completion.
+            self._settle(cmd_id[0], command)
+        else:
+            self._add_outstanding(cmd_id[0], command)
+        return cmd_id
+
+    def waitForInProgress(self, cmdid, timeout, deadline=None):
+        if self._retired(cmdid):
+            return self.history.latest(cmdid)
+        command = self._outstanding.get(cmdid)
+        with self._tracer.span(command.cmd if command is not None else 'command', self.name,
+                               phase='in_progress', cmd_id=cmdid):
+            ack = self._wait(self.sender.waitForInProgress, cmdid, timeout, deadline,
+                             lambda code: code != INTERMEDIATE_ACKS[0])
+        acked = command is not None and command.acked_at is not None
+        self._observe(cmdid, command)
+        if command is not None and command.in_progress_at is None:
+            last_ack = self.last_ack(cmdid)
+            if last_ack is not None and last_ack[0] != INTERMEDIATE_ACKS[0]:
+                command.in_progress_at = self._metrics.clock()
+                if acked:
+                    self._metrics.observe(self.name, command.cmd, 'in_progress',
+                                          command.in_progress_at - command.acked_at)
+        return ack
+
+    def waitForCompletion(self, cmdid, timeout, deadline=None):
+        if self._retired(cmdid):
+            return self.history.latest(cmdid)
+        command = self._outstanding.get(cmdid)
+        with self._tracer.span(command.cmd if command is not None else 'command', self.name,
+                               phase='complete', cmd_id=cmdid):
+            ack = self._wait(self.sender.waitForCompletion, cmdid, timeout, deadline,
+                             lambda code: code not in INTERMEDIATE_ACKS)
+        self._observe(cmdid, command)
+        self._settle(cmdid, command)
+        return ack
+
+    def _observe(self, cmd_id, command):
+        # Time the ack phase once a wait sees the command acknowledged or in progress.
+        if command is None or command.acked_at is not None:
+            return
+        acks = self._sender_acks(cmd_id)
+        if acks and acks[-1][0] in INTERMEDIATE_ACKS:
+            command.acked_at = self._metrics.clock()
+            self._metrics.observe(self.name, command.cmd, 'ack', command.acked_at - command.sent_at)
+
+    def _wait(self, wait, cmd_id, timeout, deadline, done):
+        # With a deadline, wait in short chunks to notice promptly that it was cancelled, and stop when
+        # it expires.
+        if deadline is None:
+            return wait(cmdid=cmd_id, timeout=timeout)
+        clock = deadline.clock
+        end = clock.time() + deadline.timeout(timeout)
+        while True:
+            ack = wait(cmdid=cmd_id, timeout=max(min(end - clock.time(), CHECK_INTERVAL), 0.))
+            self._observe(cmd_id, self._outstanding.get(cmd_id))
+            last_ack = self.last_ack(cmd_id)
+            if last_ack is not None and done(last_ack[0]):
+                return ack
+            deadline.check()
+            if clock.time() >= end:
+                return ack
+
+    def _add_outstanding(self, cmd_id, command):
+        with self._lock:
+            self._outstanding[cmd_id] = command
+            stale = []
+            while len(self._outstanding) > self.history.maxlen:
+                stale.append(self._outstanding.popitem(last=False))
+        for stale_id, stale_command in stale:
+            self._retire(stale_id, stale_command.cmd)
+
+    def _settle(self, cmd_id, command):
+        # Move a command to the history once its final ack is in, otherwise keep it outstanding (e.g. if
+        # the wait timed out) so it can still be waited on.
+        acks = self._sender_acks(cmd_id)
+        if acks and acks[-1][0] in INTERMEDIATE_ACKS:
+            if command is not None and cmd_id not in self._outstanding:
+                self._add_outstanding(cmd_id, command)
+            return
+        with self._lock:
+            self._outstanding.pop(cmd_id, None)
+        if command is not None and acks:
+            metrics = self._metrics
+            metrics.observe(self.name, command.cmd, 'complete', metrics.clock() - command.phase_start)
+            metrics.count_command(self.name, command.cmd,
+                                  'completed' if acks[-1][0] == SAL__CMD_COMPLETE else 'failed')
+        self._retire(cmd_id, command.cmd if command is not None else None)
+
+    def _retire(self, cmd_id, cmd=None):
+        # Move the last ack of a command from the sender responses to the history.
+        acks = self._sender_acks(cmd_id)
+        if acks:
+            self.history.add(cmd_id, tuple(acks[-1]), cmd)
+        self.sender.cmd_responses.pop(cmd_id, None)
+
+    def _retired(self, cmd_id):
+        # Whether the responses of a command were moved to the history, which may have forgotten it since.
+        return cmd_id not in self.sender.cmd_responses
+
+    def _sender_acks(self, cmd_id):
+        try:
+            return self.sender.cmd_responses[cmd_id]['ack']
+        except KeyError:
+            return None
+
+    def last_ack(self, cmd_id):
+        """Return the last ack received for a command.
+
+        Parameters
+        ----------
+        cmd_id: int
+
+        Returns
+        -------
+        ack: tuple
+            The (ack, error, result) tuple, or None if nothing was received yet or the command was
+            forgotten by the history.
+        """
+        acks = self._sender_acks(cmd_id)
+        if acks:
+            return acks[-1]
+        return self.history.latest(cmd_id)
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+    async def send_command_async(self, cmd, **kwargs):
+        """Send a command without waiting for it to complete.
+
+        Parameters
+        ----------
+        cmd: str
+            Name of the command.
+        kwargs
+            Command parameters.
+
+        Returns
+        -------
+        cmd_id: int
+        """
+        kwargs['wait_command'] = False
+        cmd_id = await self._run_blocking(self.send_Command, cmd, **kwargs)
+        return cmd_id[0]
+
+    @property
+    def outstanding(self):
+        """Ids of the commands sent that did not complete yet, oldest first."""
+        with self._lock:
+            return list(self._outstanding)
+
+    def abort(self):
+        """Send ``abort`` to the component if it has commands that did not complete yet.
+
+        Returns
+        -------
+        cmd_id: int
+            Id of the abort command, or None if nothing was outstanding.
+        """
+        if len(self._outstanding) == 0:
+            return None
+        return self.send_Command('abort', wait_command=False)[0]
+
+    async def wait_in_progress_async(self, cmd_id, timeout, deadline=None):
+        """Wait for a command to be in progress.
+
+        Parameters
+        ----------
+        cmd_id: int
+        timeout: float
+            Timeout in seconds.
+        deadline: Deadline, optional
+            Deadline of the step waiting, which also bounds the timeout.
+
+        Returns
+        -------
+        ack: tuple
+            The last ack received for the command.
+
+        Raises
+        ------
+        SequenceAborted
+            If the deadline is cancelled while waiting.
+        DeadlineExceeded
+            If the deadline expires while waiting.
+        """
+        await self._run_blocking(self.waitForInProgress, cmd_id, timeout, deadline)
+        return self.last_ack(cmd_id)
+
+    async def wait_completion_async(self, cmd_id, timeout, deadline=None, check=False):
+        """Wait for a command to complete.
+
+        Parameters
+        ----------
+        cmd_id: int
+        timeout: float
+            Timeout in seconds.
+        deadline: Deadline, optional
+            Deadline of the step waiting, which also bounds the timeout.
+        check: bool
+            Raise `CommandFailed` if the command does not complete.
+
+        Returns
+        -------
+        ack: tuple
+            The last ack received for the command.
+
+        Raises
+        ------
+        SequenceAborted
+            If the deadline is cancelled while waiting.
+        DeadlineExceeded
+            If the deadline expires while waiting.
+        CommandFailed
+            If ``check`` is set and the command failed or timed out.
+        """
+        command = self._outstanding.get(cmd_id)
+        await self._run_blocking(self.waitForCompletion, cmd_id, timeout, deadline)
+        ack = self.last_ack(cmd_id)
+        if check:
+            check_ack(ack, self.name, command.cmd if command is not None else None, cmd_id)
+        return ack
+
+    async def run_command_async(self, cmd, timeout, deadline=None, check=False, **kwargs):
+        """Send a command and wait for it to complete.
+
+        Parameters
+        ----------
+        cmd: str
+            Name of the command.
+        timeout: float
+            Timeout in seconds for the command to complete.
+        deadline: Deadline, optional
+            Deadline of the step running the command, which also bounds the timeout.
+        check: bool
+            Raise `CommandFailed` if the command does not complete.
+        kwargs
+            Command parameters.
+
+        Returns
+        -------
+        ack: tuple
+            The last ack received for the command.
+        """
+        if deadline is not None:
+            deadline.check()
+        cmd_id = await self.send_command_async(cmd, **kwargs)
+        ack = await self.wait_completion_async(cmd_id, timeout, deadline)
+        if check:
+            check_ack(ack, self.name, cmd, cmd_id)
+        return ack
+
+    async def _wait_after(self, previous, cmd_id, timeout, deadline):
+        # A command sent while others are in flight may be queued behind them, so its timeout only starts
+        # once the command before it is done. Until then it is polled, to still see it complete first.
+        done = (lambda code: code not in INTERMEDIATE_ACKS)
+        while previous is not None and not previous.done() and not self._retired(cmd_id):
+            await self._run_blocking(self._wait, self.sender.waitForCompletion, cmd_id, CHECK_INTERVAL,
+                                     deadline, done)
+            last_ack = self.last_ack(cmd_id)
+            if last_ack is not None and done(last_ack[0]):
+                break
+        return await self.wait_completion_async(cmd_id, timeout, deadline)
+
+    async def pipeline(self, commands, window=1, ordered=True, deadline=None, check=True):
+        """Send a stream of commands with up to ``window`` of them in flight, and yield their completions.
+
+        A new command is sent as soon as one completes, so the component is never idle waiting for the
+        round trip of the next command. Use it as ``async for completion in remote.pipeline(...)``; the
+        stream is read lazily, so each command is only built when it is about to be sent. Commands still
+        in flight when the loop is left early are no longer waited on, use `abort` to stop them.
+
+        Parameters
+        ----------
+        commands: iterable of Command
+            Commands to send, in order. The timeout of each command starts once the command before it
+            completes, as a component may queue the commands it receives while busy.
+        window: int
+            Number of commands in flight at once.
+        ordered: bool
+            Yield the completions in the order the commands were sent, otherwise as soon as each command
+            completes, e.g. on components executing several commands at once.
+        deadline: Deadline, optional
+            Deadline of the step running the commands, which also bounds their timeouts.
+        check: bool
+            Raise `CommandFailed` as soon as a command yielded did not complete.
+
+        Yields
+        ------
+        completion: Completion
+            Position of the command in the stream, its id, the command and its last ack.
+
+        Raises
+        ------
+        CommandFailed
+            If ``check`` is set and a command failed or timed out.
+        SequenceAborted
+            If the deadline is cancelled.
+        DeadlineExceeded
+            If the deadline expires.
+        """
+        if window < 1:
+            raise ValueError('Pipeline window must be at least 1.')
+        commands = iter(commands)
+        # Commands in flight, by id, in the order they were sent.
+        in_flight = collections.OrderedDict()
+        index = 0
+        exhausted = False
+        last_wait = None
+        try:
+            while True:
+                while not exhausted and len(in_flight) < window:
+                    command = next(commands, None)
+                    if command is None:
+                        exhausted = True
+                        break
+                    if deadline is not None:
+                        deadline.check()
+                    cmd_id = await self.send_command_async(command.cmd, **command.kwargs)
+                    last_wait = asyncio.ensure_future(self._wait_after(last_wait, cmd_id, command.timeout,
+                                                                       deadline))
+                    in_flight[cmd_id] = (index, command, last_wait)
+                    index += 1
+                if len(in_flight) == 0:
+                    return
+
+                if ordered:
+                    cmd_id = next(iter(in_flight))
+                    await asyncio.wait([in_flight[cmd_id][2]])
+                else:
+                    await asyncio.wait([wait for _, _, wait in in_flight.values()],
+                                       return_when=asyncio.FIRST_COMPLETED)
+                    cmd_id = next(cmd_id for cmd_id, (_, _, wait) in in_flight.items() if wait.done())
+                position, command, wait = in_flight.pop(cmd_id)
+                ack = wait.result()
+                if check:
+                    check_ack(ack, self.name, command.cmd, cmd_id)
+                yield Completion(position, cmd_id, command, ack)
+        finally:
+            for _, _, wait in in_flight.values():
+                wait.cancel()
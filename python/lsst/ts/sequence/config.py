@@ -0,0 +1,214 @@
+import itertools
+import json
+import os
+
+__all__ = ['ConfigSweep', 'validate_config', 'parse_config', 'load_config']
+
+SWEEP_KINDS = ('grid', 'zip')
+
+
+def validate_config(config, schema, name='sequence'):
+    """Check configuration parameters against the schema of a sequence.
+
+    Parameters
+    ----------
+    config: dict
+        Configuration parameters.
+    schema: dict or None
+        Type, or tuple of types, accepted for each parameter. None accepts anything.
+    name: str
+        Name of the sequence, for error messages.
+
+    Raises
+    ------
+    IOError
+        If a parameter is unknown or has the wrong type.
+    """
+    if schema is None:
+        return
+    errors = []
+    for key, value in config.items():
+        if key not in schema:
+            errors.append('unknown parameter {}'.format(key))
+        elif not isinstance(value, schema[key]):
+            errors.append('{} should be {}, not {!r}'.format(key, _type_names(schema[key]), value))
+    if errors:
+        raise IOError('Invalid configuration for {}: {}.'.format(name, '; '.join(errors)))
+
+
+def _type_names(types):
+    types = types if isinstance(types, tuple) else (types, )
+    return ' or '.join(t.__name__ for t in types)
+
+
+def _sweep_values(key, spec):
+    """Values of a sweep axis, given as a list or as ``{"start": ..., "stop": ..., "num": ...}``."""
+    if isinstance(spec, dict):
+        try:
+            start, stop, num = spec['start'], spec['stop'], int(spec['num'])
+        except KeyError as e:
+            raise IOError('Sweep of {} is missing {}.'.format(key, e))
+        if num < 2:
+            return [start] * num
+        step = (stop - start) / (num - 1)
+        return [start + i * step for i in range(num)]
+    return list(spec)
+
+
+class ConfigSweep:
+    """Lazy sequence of configurations swept over a grid and/or zipped parameters.
+
+    Every combination of the grid parameters is run with every set of zipped parameters, in order, with
+    the zipped parameters varying fastest. Configurations are only built while iterating.
+
+    Parameters
+    ----------
+    base: dict
+        Parameters common to all configurations.
+    grid: dict, optional
+        Values of each grid parameter.
+    zipped: dict, optional
+        Values of the zipped parameters, which all have the same length.
+    """
+
+    def __init__(self, base, grid=None, zipped=None):
+        self.base = base
+        self.grid = grid if grid is not None else {}
+        self.zipped = zipped if zipped is not None else {}
+
+        lengths = set(len(values) for values in self.zipped.values())
+        if len(lengths) > 1:
+            raise IOError('Zipped parameters {} have different lengths.'.format(', '.join(self.zipped)))
+        self._n_zipped = lengths.pop() if lengths else 1
+
+    def __len__(self):
+        n_configs = self._n_zipped
+        for values in self.grid.values():
+            n_configs *= len(values)
+        return n_configs
+
+    def __iter__(self):
+        grid_keys = list(self.grid)
+        zip_keys = list(self.zipped)
+        zipped = list(zip(*self.zipped.values())) if zip_keys else [()]
+        for grid_values in itertools.product(*self.grid.values()):
+            for zip_values in zipped:
+                config = dict(self.base)
+                config.update(zip(grid_keys, grid_values))
+                config.update(zip(zip_keys, zip_values))
+                yield config
+
+    def to_dict(self):
+        """Return the parameters of the sweep, as accepted by the constructor.
+
+        Returns
+        -------
+        sweep: dict
+            Values of ``base``, ``grid`` and ``zipped``.
+        """
+        return {'base': self.base, 'grid': self.grid, 'zipped': self.zipped}
+
+    @property
+    def is_sweep(self):
+        """True if there is more than the base configuration."""
+        return len(self.grid) > 0 or len(self.zipped) > 0
+
+    def run_time(self, sequence, dry_run=None):
+        """Estimate the time to run the sequence with all the configurations.
+
+        Parameters
+        ----------
+        sequence: BaseSequence
+            Sequence used for the estimate; it is left configured with the last configuration.
+        dry_run: DryRun, optional
+            If given, each configuration is dry run instead of using `BaseSequence.run_time`.
+
+        Returns
+        -------
+        run_time: float
+            Sum of the run time of each configuration, in seconds.
+        """
+        run_time = 0.
+        for config in self:
+            sequence.configure(**config)
+            if dry_run is not None:
+                run_time += dry_run.run(type(sequence), sequence.config).duration
+            else:
+                run_time += sequence.run_time()
+        return run_time
+
+
+def parse_config(data, schema=None, name='sequence'):
+    """Parse configuration parameters, expanding sweeps.
+
+    A parameter is swept when its value is an object with a single ``grid`` or ``zip`` key, e.g.::
+
+        {"intensity": 15000.,
+         "gratingType": {"grid": [1, 2]},
+         "wavelength": {"zip": {"start": 400., "stop": 800., "num": 5}},
+         "max_exptime": {"zip": [60., 60., 30., 30., 30.]}}
+
+    Values are given as a list or as ``start``, ``stop`` and ``num`` of evenly spaced values.
+
+    Parameters
+    ----------
+    data: dict
+        Configuration parameters.
+    schema: dict, optional
+        Schema of the sequence (see `validate_config`).
+    name: str
+        Name of the sequence, for error messages.
+
+    Returns
+    -------
+    sweep: ConfigSweep
+    """
+    if not isinstance(data, dict):
+        raise IOError('Configuration of {} should be a mapping of parameters.'.format(name))
+
+    base, grid, zipped = {}, {}, {}
+    for key, value in data.items():
+        if isinstance(value, dict) and len(value) == 1 and list(value)[0] in SWEEP_KINDS:
+            kind, spec = list(value.items())[0]
+            values = _sweep_values(key, spec)
+            if len(values) == 0:
+                raise IOError('Sweep of {} has no values.'.format(key))
+            (grid if kind == 'grid' else zipped)[key] = values
+        else:
+            base[key] = value
+
+    validate_config(base, schema, name)
+    for key, values in itertools.chain(grid.items(), zipped.items()):
+        for value in values:
+            validate_config({key: value}, schema, name)
+
+    return ConfigSweep(base, grid, zipped)
+
+
+def load_config(filename, schema=None, name='sequence'):
+    """Read configuration parameters from a JSON or YAML file.
+
+    YAML files (``.yaml`` or ``.yml``) require PyYAML.
+
+    Parameters
+    ----------
+    filename: str
+    schema: dict, optional
+        Schema of the sequence (see `validate_config`).
+    name: str
+        Name of the sequence, for error messages.
+
+    Returns
+    -------
+    sweep: ConfigSweep
+    """
+    with open(filename) as config_file:
+        if os.path.splitext(filename)[1] in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise IOError('PyYAML is required to read {}.'.format(filename))
+            data = yaml.safe_load(config_file)
+        else:
+            data = json.load(config_file)
+    return parse_config(data if data is not None else {}, schema, name)
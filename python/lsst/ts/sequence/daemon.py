@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import os
+import stat
+import time
+
+from .config import validate_config
+from .dds_pool import get_pool
+from .registry import get_registry
+from .scheduler import ComponentLocks
+
+__all__ = ['SequenceDaemon', 'default_socket_path']
+
+
+def default_socket_path():
+    """Return the default path of the daemon Unix socket.
+
+    Returns
+    -------
+    path: str
+    """
+    return os.path.expanduser('~/.sequence/daemon.sock')
+
+
+class SequenceDaemon:
+    """Long-lived process running sequences on request, received over a local Unix socket.
+
+    The registry, the DDS senders and the event subscriptions stay warm between requests, so a sequence
+    starts without paying for imports or DDS setup. Requests are JSON objects, one per line, with an
+    ``action`` (``ping``, ``list``, ``execute``, ``request``, ``abort`` or ``shutdown``) and, for ``execute``
+    and ``request``, a ``script`` and optional ``config``. ``abort`` stops the sequences being executed,
+    or only those of its optional ``script``. Each request gets one JSON line in response, with ``status``
+    set to "ok" or "error".
+
+    Sequences using different components run concurrently; sequences sharing a component are serialized.
+
+    Parameters
+    ----------
+    socket_path: str, optional
+        Path of the Unix socket, by default `default_socket_path`.
+    pool: DDSPool, optional
+        Pool of DDS senders and subscribers, by default the process-wide one.
+    registry: SequenceRegistry, optional
+        Registry of sequences, by default the process-wide one.
+    """
+
+    def __init__(self, socket_path=None, pool=None, registry=None):
+        self.log = logging.getLogger(type(self).__name__)
+        self.socket_path = socket_path if socket_path is not None else default_socket_path()
+        self.pool = pool if pool is not None else get_pool()
+        self.registry = registry if registry is not None else get_registry()
+        self.locks = ComponentLocks()
+        self._running = set()
+        self._server = None
+        self._done = None
+
+    def warm_up(self, scripts=None):
+        """Import sequences and start the senders and subscribers of their components.
+
+        Parameters
+        ----------
+        scripts: list of str, optional
+            Sequences to warm up, by default all registered sequences.
+        """
+        for script in (scripts if scripts is not None else self.registry.names()):
+            sequence = self.registry.resolve(script)(pool=self.pool)
+            for component, device_id in sequence.components():
+                self.pool.get_remote(component, device_id)
+                self.pool.get_subscriber(component, device_id)
+            self.log.debug('%s warmed up.', script)
+
+    async def start(self):
+        """Start listening on the socket.
+
+        Raises
+        ------
+        IOError
+            If another daemon is listening on the socket, or its path exists and is not a socket.
+        """
+        socket_dir = os.path.dirname(self.socket_path)
+        if socket_dir and not os.path.exists(socket_dir):
+            os.makedirs(socket_dir)
+        if os.path.exists(self.socket_path):
+            # Only remove the socket left behind by a daemon that did not shut down cleanly.
+            if not stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                raise IOError('{} exists and is not a socket.'.format(self.socket_path))
+            if await self._is_listening():
+                raise IOError('A sequence daemon is already listening on {}.'.format(self.socket_path))
+            self.log.info('Removing stale socket %s', self.socket_path)
+            os.remove(self.socket_path)
+        self._done = asyncio.Event()
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        self.log.info('Listening on %s', self.socket_path)
+
+    async def _is_listening(self):
+        try:
+            _, writer = await asyncio.open_unix_connection(self.socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        writer.close()
+        return True
+
+    async def serve(self):
+        """Start the daemon and serve requests until a shutdown request is received.
+        """
+        await self.start()
+        try:
+            await self._done.wait()
+        finally:
+            self._server.close()
+            await self._server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle(json.loads(line.decode()))
+                except Exception as e:
+                    self.log.exception('Failed to handle %s', line)
+                    response = {'status': 'error', 'error': '{}: {}'.format(type(e).__name__, e)}
+                writer.write((json.dumps(response, default=str) + '\n').encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle(self, message):
+        """Handle one request.
+
+        Parameters
+        ----------
+        message: dict
+
+        Returns
+        -------
+        response: dict
+        """
+        action = message.get('action')
+        if action == 'ping':
+            return {'status': 'ok'}
+        elif action == 'list':
+            return {'status': 'ok', 'result': [{'name': entry.name, 'description': entry.description}
+                                               for entry in self.registry]}
+        elif action == 'shutdown':
+            self._done.set()
+            return {'status': 'ok'}
+        elif action in ('execute', 'request'):
+            return await self._run(action, message.get('script'), message.get('config', {}))
+        elif action == 'abort':
+            return {'status': 'ok', 'result': self.abort(message.get('script'))}
+        raise ValueError('Unknown action {}.'.format(action))
+
+    def abort(self, script=None):
+        """Abort the sequences being executed.
+
+        Parameters
+        ----------
+        script: str, optional
+            Only abort the sequences of this script.
+
+        Returns
+        -------
+        aborted: list of str
+            Scripts aborted.
+        """
+        aborted = []
+        for sequence in list(self._running):
+            if script is None or sequence._name == script:
+                sequence.abort('aborted by request')
+                aborted.append(sequence._name)
+        return aborted
+
+    async def _run(self, action, script, config):
+        if script not in self.registry:
+            raise IOError('{} is not a valid sequence.'.format(script))
+
+        validate_config(config, self.registry.resolve(script).config_schema, script)
+        sequence = self.registry.resolve(script)(pool=self.pool)
+        sequence.configure(**config)
+        run_time = sequence.run_time()
+
+        start = time.time()
+        if action == 'execute':
+            self.log.info('Running script %s', script)
+            async with self.locks.acquire(sequence.components()):
+                self._running.add(sequence)
+                try:
+                    await sequence.run_async()
+                finally:
+                    self._running.discard(sequence)
+            result = None
+        else:
+            self.log.info('Requesting script %s', script)
+            result = await sequence.request_async()
+
+        return {'status': 'ok', 'result': result, 'run_time': run_time, 'elapsed': time.time() - start}
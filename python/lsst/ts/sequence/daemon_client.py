@@ -0,0 +1,88 @@
+import json
+import socket
+
+from .daemon import default_socket_path
+
+__all__ = ['DaemonClient']
+
+
+class DaemonClient:
+    """Client of a `SequenceDaemon`.
+
+    Parameters
+    ----------
+    socket_path: str, optional
+        Path of the daemon Unix socket, by default `default_socket_path`.
+    timeout: float, optional
+        Timeout, in seconds, for each response. None waits forever, as sequences may run for a long time.
+    """
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path if socket_path is not None else default_socket_path()
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+
+    def connect(self):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(self.timeout)
+        self._socket.connect(self.socket_path)
+        self._file = self._socket.makefile('rb')
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def call(self, action, **kwargs):
+        """Send a request to the daemon and wait for its response.
+
+        Parameters
+        ----------
+        action: str
+            One of ``ping``, ``list``, ``execute``, ``request``, ``abort`` or ``shutdown``.
+        kwargs
+            Other request fields, e.g. ``script`` and ``config``.
+
+        Returns
+        -------
+        response: dict
+            The daemon response, with the ``result`` of the action.
+
+        Raises
+        ------
+        IOError
+            If the daemon reports an error.
+        """
+        if self._socket is None:
+            self.connect()
+        message = dict(kwargs, action=action)
+        self._socket.sendall((json.dumps(message) + '\n').encode())
+        line = self._file.readline()
+        if not line:
+            raise IOError('Connection closed by the sequence daemon.')
+        response = json.loads(line.decode())
+        if response.get('status') != 'ok':
+            raise IOError(response.get('error', 'Unknown error.'))
+        return response
+
+    def execute(self, script, **config):
+        """Run a sequence in the daemon and wait for it to finish."""
+        return self.call('execute', script=script, config=config)
+
+    def request(self, script, **config):
+        """Have the daemon request the OCS to run a sequence."""
+        return self.call('request', script=script, config=config)
+
+    def abort(self, script=None):
+        """Abort the sequences being executed by the daemon, or only those of a script."""
+        return self.call('abort', script=script)
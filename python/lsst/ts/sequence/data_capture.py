@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+
+__all__ = ['CaptureStream', 'DataCapture', 'build_header', 'record_dtype']
+
+
+def build_header(config):
+    """Build a data product header from a sequence configuration.
+
+    Parameters
+    ----------
+    config: dict
+        Sequence configuration.
+
+    Returns
+    -------
+    header: dict
+        Scalar values are kept as they are, other values are converted to JSON strings.
+    """
+    header = {}
+    for key, value in config.items():
+        if isinstance(value, np.generic):
+            value = value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            header[key] = value
+        else:
+            header[key] = json.dumps(np.asarray(value).tolist())
+    return header
+
+
+def record_dtype(record, string_length=256):
+    """Declare the columns of a stream from a typical record.
+
+    Unlike the type taken from the first record by `CaptureStream`, the columns hold any later value of the
+    same kind: integers and floats are stored as 64 bits and strings up to ``string_length`` characters.
+
+    Parameters
+    ----------
+    record: dict
+        Value of each column.
+    string_length: int
+        Maximum length of the strings.
+
+    Returns
+    -------
+    dtype: numpy.dtype
+    """
+    columns = []
+    for name, value in record.items():
+        value = np.asarray(value)
+        if value.dtype.kind == 'i':
+            base = np.int64
+        elif value.dtype.kind == 'u':
+            base = np.uint64
+        elif value.dtype.kind == 'f':
+            base = np.float64
+        elif value.dtype.kind in 'US':
+            base = 'U{}'.format(string_length)
+        else:
+            base = value.dtype
+        columns.append((name, base, value.shape))
+    return np.dtype(columns)
+
+
+class CaptureStream:
+    """Table of records written into a memory-mapped file that grows in chunks.
+
+    The columns and their types and shapes are declared by ``dtype`` or else taken from the first record,
+    so a column may hold arrays (e.g. a spectrum) as long as they all have the same shape. Every record is
+    checked against them, so that a value which would be truncated (a longer string, a float in an integer
+    column, ...) fails instead of being stored silently. Declare the columns of strings of varying length.
+
+    Parameters
+    ----------
+    filename: str
+        Raw data file, removed by `finalize`.
+    chunk_size: int
+        Number of records allocated at a time.
+    dtype: numpy.dtype, optional
+        Structured type of the records.
+    """
+
+    def __init__(self, filename, chunk_size=1024, dtype=None):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype(dtype) if dtype is not None else None
+        self.n_records = 0
+        self._capacity = 0
+        self._array = None
+
+    def _grow(self):
+        if self._array is not None:
+            self._array.flush()
+            self._array = None
+        self._capacity += self.chunk_size
+        with open(self.filename, 'ab') as raw_file:
+            raw_file.truncate(self._capacity * self.dtype.itemsize)
+        self._array = np.memmap(self.filename, dtype=self.dtype, mode='r+', shape=(self._capacity, ))
+
+    def append(self, record):
+        """Write a record.
+
+        Parameters
+        ----------
+        record: dict
+            Value of each column.
+
+        Raises
+        ------
+        IOError
+            If the record does not have the columns of the stream, or a value does not fit its column.
+        """
+        values = {name: np.asarray(value) for name, value in record.items()}
+        if self.dtype is None:
+            self.dtype = np.dtype([(name, value.dtype, value.shape) for name, value in values.items()])
+        self._check(values)
+        if self.n_records == self._capacity:
+            self._grow()
+        row = self._array[self.n_records]
+        for name in self.dtype.names:
+            row[name] = values[name]
+        self.n_records += 1
+
+    def _check(self, values):
+        if set(values) != set(self.dtype.names):
+            raise IOError('Record columns {} do not match {}.'.format(sorted(values), list(self.dtype.names)))
+        for name, value in values.items():
+            column = self.dtype.fields[name][0]
+            if value.shape != column.shape:
+                raise IOError('Column {} has shape {}, got {}.'.format(name, column.shape, value.shape))
+            if not np.can_cast(value.dtype, column.base, 'safe'):
+                raise IOError('Column {} has type {}, got {}.'.format(name, column.base, value.dtype))
+
+    def finalize(self):
+        """Stop writing and return the records.
+
+        Returns
+        -------
+        data: numpy.ndarray
+            Structured array with the records, or None if there are none. It is read from the raw data
+            file, which is removed once the array is released.
+        """
+        if self._array is None:
+            return None
+        self._array.flush()
+        self._array = None
+        data = np.memmap(self.filename, dtype=self.dtype, mode='r', shape=(self.n_records, ))
+        return data
+
+
+class DataCapture:
+    """Record measurements to disk in the background while a sequence runs.
+
+    Measurements are queued by `record`, which does not block, and a writer thread appends them to a
+    `CaptureStream` per data product. `close` writes each product to ``<prefix>_<stream>.npy``, all of them
+    as binary tables of ``<prefix>.fits`` (if astropy is available) and the header to ``<prefix>.json``.
+
+    Parameters
+    ----------
+    directory: str
+        Output directory, created if needed.
+    prefix: str
+        Prefix of the output files.
+    header: dict, optional
+        Header of the data products (see `build_header`).
+    chunk_size: int
+        Number of records allocated at a time in each stream.
+    dtypes: dict, optional
+        Structured type of the records of some streams, by name. The other streams take theirs from their
+        first record.
+    """
+
+    def __init__(self, directory, prefix, header=None, chunk_size=1024, dtypes=None):
+        self.log = logging.getLogger(type(self).__name__)
+        self.directory = os.path.expanduser(directory)
+        self.prefix = prefix
+        self.header = header if header is not None else {}
+        self.chunk_size = chunk_size
+        self.dtypes = dtypes if dtypes is not None else {}
+        self.streams = {}
+        self.products = []
+        self._queue = queue.Queue()
+        self._thread = None
+        self._error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def start(self):
+        """Start the writer thread.
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self._thread = threading.Thread(target=self._write, name='data-capture', daemon=True)
+        self._thread.start()
+
+    def record(self, stream, **fields):
+        """Queue a record to be written.
+
+        Parameters
+        ----------
+        stream: str
+            Name of the data product.
+        fields
+            Value of each column.
+        """
+        self._queue.put((stream, fields))
+
+    def _write(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            stream, fields = item
+            try:
+                if stream not in self.streams:
+                    self.streams[stream] = CaptureStream(self.filename(stream, '.raw'), self.chunk_size,
+                                                         self.dtypes.get(stream))
+                self.streams[stream].append(fields)
+            except Exception as e:
+                self.log.exception('Failed to record %s.', stream)
+                self._error = e
+
+    def filename(self, stream=None, extension=''):
+        """Path of an output file.
+
+        Parameters
+        ----------
+        stream: str, optional
+            Name of the data product.
+        extension: str
+
+        Returns
+        -------
+        filename: str
+        """
+        name = self.prefix if stream is None else '{}_{}'.format(self.prefix, stream)
+        return os.path.join(self.directory, name + extension)
+
+    def close(self):
+        """Write the queued records and the data products.
+
+        Returns
+        -------
+        products: list of str
+            Files written.
+
+        Raises
+        ------
+        IOError
+            If a record could not be written.
+        """
+        if self._thread is None:
+            return self.products
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            raise IOError('Failed to capture data: {}'.format(self._error))
+
+        tables = {}
+        for name, stream in self.streams.items():
+            data = stream.finalize()
+            if data is None:
+                continue
+            np.save(self.filename(name, '.npy'), data)
+            self.products.append(self.filename(name, '.npy'))
+            tables[name] = data
+
+        self._write_fits(tables)
+
+        with open(self.filename(extension='.json'), 'w') as header_file:
+            json.dump({'header': self.header,
+                       'products': {name: os.path.basename(self.filename(name, '.npy')) for name in tables}},
+                      header_file, indent=2)
+        self.products.append(self.filename(extension='.json'))
+
+        tables.clear()
+        for stream in self.streams.values():
+            os.remove(stream.filename)
+        return self.products
+
+    def _write_fits(self, tables):
+        try:
+            from astropy.io import fits
+        except ImportError:
+            self.log.warning('astropy is not available, not writing %s.', self.filename(extension='.fits'))
+            return
+
+        primary = fits.PrimaryHDU()
+        for key, value in self.header.items():
+            if value is not None and not (isinstance(value, str) and len(value) > 60):
+                primary.header['HIERARCH ' + key] = value
+        hdus = [primary]
+        for name, data in tables.items():
+            hdus.append(fits.BinTableHDU(data=np.asarray(data), name=name.upper()))
+        fits.HDUList(hdus).writeto(self.filename(extension='.fits'), overwrite=True)
+        self.products.append(self.filename(extension='.fits'))
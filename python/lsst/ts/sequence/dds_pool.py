@@ -0,0 +1,240 @@
+import importlib
+import logging
+import threading
+
+from .component import RemoteComponent
+from .event_cache import EventCache
+from .fake_sal import RealClock
+
+__all__ = ['DDSPool', 'get_pool', 'shutdown_pool']
+
+
+class DDSPool:
+    """Process-wide pool of DDS senders and subscribers.
+
+    Senders and subscriber containers are keyed by ``(component, device_id)`` and only created (and
+    started) the first time they are requested, so building a sequence does not touch DDS at all and
+    sequences running in the same process share a single participant per component.
+
+    Parameters
+    ----------
+    salpylib: module, optional
+        Module providing ``DDSSend`` and ``DDSSubscriberContainer``. By default ``salpytools.salpylib``
+        is imported on first use.
+    clock: object, optional
+        Clock providing ``time()`` and ``sleep()``, used by sequences and event caches. By default the wall
+        clock; a `VirtualClock` when simulating.
+    tracer: Tracer, optional
+        Tracer of the commands and waits, by default the process-wide one.
+    history_size: int
+        Number of commands kept in the history of each component, unless set with `set_retention`.
+    event_history: int
+        Number of samples kept for each event topic, unless set with `set_retention`.
+    metrics: Metrics, optional
+        Metrics recording the command latencies, by default the process-wide one.
+    """
+
+    def __init__(self, salpylib=None, clock=None, tracer=None, history_size=1000, event_history=100,
+                 metrics=None):
+        self.log = logging.getLogger(type(self).__name__)
+        self._salpylib = salpylib
+        self.clock = clock if clock is not None else RealClock()
+        self.simulated = not isinstance(self.clock, RealClock)
+        self.tracer = tracer
+        self.metrics = metrics
+        self.history_size = history_size
+        self.event_history = event_history
+        self._retention = {}
+        self._lock = threading.RLock()
+        self._remotes = {}
+        self._subscribers = {}
+        self._event_caches = {}
+        self._creating = {}
+
+    @property
+    def salpylib(self):
+        with self._lock:
+            if self._salpylib is None:
+                self._salpylib = importlib.import_module('salpytools.salpylib')
+            return self._salpylib
+
+    def set_retention(self, component, commands=None, events=None):
+        """Set how much history is kept for a component.
+
+        Applies to all the devices of the component, including the senders and event caches already
+        created.
+
+        Parameters
+        ----------
+        component: str
+            Name of the component.
+        commands: int, optional
+            Number of commands kept in its history.
+        events: int, optional
+            Number of samples kept for each of its event topics.
+        """
+        with self._lock:
+            retention = self._retention.setdefault(component, {})
+            if commands is not None:
+                retention['commands'] = commands
+                for (name, _), remote in self._remotes.items():
+                    if name == component:
+                        remote.history.resize(commands)
+            if events is not None:
+                retention['events'] = events
+                for (name, _), event_cache in self._event_caches.items():
+                    if name == component:
+                        event_cache.resize(events)
+
+    def _create_once(self, items, key, create):
+        # Create an item outside the pool lock, so the slow DDS setup of different components can run
+        # concurrently (e.g. in the preflight), while each item is still only created once.
+        with self._lock:
+            if key in items:
+                return items[key]
+            creating = self._creating.setdefault((id(items), key), threading.Lock())
+        with creating:
+            with self._lock:
+                if key in items:
+                    return items[key]
+            item = create()
+            with self._lock:
+                items[key] = item
+                self._creating.pop((id(items), key), None)
+            return item
+
+    def _retention_of(self, component):
+        retention = self._retention.get(component, {})
+        return retention.get('commands', self.history_size), retention.get('events', self.event_history)
+
+    def get_remote(self, component, device_id=None):
+        """Return the shared sender for a component, creating and starting it if needed.
+
+        Parameters
+        ----------
+        component: str
+            Name of the component.
+        device_id: int, optional
+            Index of the component for components with multiple devices.
+
+        Returns
+        -------
+        remote: RemoteComponent
+        """
+        def create():
+            self.log.debug('Starting %s sender...', component)
+            sender = self.salpylib.DDSSend(component, device_id)
+            sender.start()
+            return RemoteComponent(component, sender, self.tracer, self._retention_of(component)[0],
+                                   self.metrics)
+
+        return self._create_once(self._remotes, (component, device_id), create)
+
+    def has_remote(self, component, device_id=None):
+        """Check if the sender of a component was created.
+
+        Parameters
+        ----------
+        component: str
+        device_id: int, optional
+
+        Returns
+        -------
+        created: bool
+        """
+        with self._lock:
+            return (component, device_id) in self._remotes
+
+    def get_subscriber(self, component, device_id=None):
+        """Return the shared event subscriber container for a component, creating it if needed.
+
+        Parameters
+        ----------
+        component: str
+            Name of the component.
+        device_id: int, optional
+            Index of the component for components with multiple devices.
+
+        Returns
+        -------
+        subscriber: salpylib.DDSSubscriberContainer
+        """
+        def create():
+            self.log.debug('Subscribing to %s events...', component)
+            return self.salpylib.DDSSubscriberContainer(component, device_id=device_id)
+
+        return self._create_once(self._subscribers, (component, device_id), create)
+
+    def get_event_cache(self, component, device_id=None):
+        """Return the shared event cache of a component, creating it if needed.
+
+        Parameters
+        ----------
+        component: str
+            Name of the component.
+        device_id: int, optional
+            Index of the component for components with multiple devices.
+
+        Returns
+        -------
+        event_cache: EventCache
+        """
+        def create():
+            return EventCache(self.get_subscriber(component, device_id),
+                              maxlen=self._retention_of(component)[1],
+                              clock=self.clock if self.simulated else None, tracer=self.tracer)
+
+        return self._create_once(self._event_caches, (component, device_id), create)
+
+    def shutdown(self):
+        """Stop and release all senders and subscribers created by the pool.
+        """
+        with self._lock:
+            event_caches = list(self._event_caches.values())
+            items = [remote.sender for remote in self._remotes.values()] + list(self._subscribers.values())
+            self._remotes = {}
+            self._subscribers = {}
+            self._event_caches = {}
+
+        for event_cache in event_caches:
+            event_cache.stop()
+
+        for item in items:
+            for method in ('stop', 'shutdown'):
+                if callable(getattr(item, method, None)):
+                    try:
+                        getattr(item, method)()
+                    except Exception:
+                        self.log.exception('Failed to %s %s.', method, item)
+                    break
+            mgr = getattr(item, 'mgr', None)
+            if mgr is not None and callable(getattr(mgr, 'salShutdown', None)):
+                mgr.salShutdown()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide `DDSPool`.
+
+    Returns
+    -------
+    pool: DDSPool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DDSPool()
+        return _pool
+
+
+def shutdown_pool():
+    """Shut down the process-wide `DDSPool`, if it was created.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
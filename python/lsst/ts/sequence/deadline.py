@@ -0,0 +1,176 @@
+import math
+import threading
+import weakref
+
+from .fake_sal import RealClock
+
+__all__ = ['Deadline', 'DeadlineExceeded', 'SequenceAborted']
+
+# Longest time a wait goes without checking if its deadline was cancelled, in seconds.
+CHECK_INTERVAL = 0.5
+
+
+class SequenceAborted(IOError):
+    """Raised in a sequence, and in the steps waiting in it, when it is aborted."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a sequence, or one of its steps, runs out of time."""
+
+
+class Deadline:
+    """Time budget and cancellation shared by a sequence, its sub-sequences and its command waits.
+
+    Each step of a sequence takes a `child` deadline, or a `share` of the remaining budget, which expires
+    no later than its parent and is cancelled with it. Waits use `timeout` to bound their own timeout by
+    the remaining budget, and check for cancellation at least every ``CHECK_INTERVAL`` seconds.
+
+    Parameters
+    ----------
+    budget: float, optional
+        Time budget in seconds, None for no time limit.
+    clock: object, optional
+        Clock providing ``time()`` and ``sleep()``, by default the wall clock.
+    parent: Deadline, optional
+        Deadline this one is a step of.
+    """
+
+    def __init__(self, budget=None, clock=None, parent=None):
+        self.clock = clock if clock is not None else (parent.clock if parent is not None else RealClock())
+        self.parent = parent
+        self.expires_at = math.inf if budget is None else self.clock.time() + max(budget, 0.)
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self.reason = None
+        self._cancelled = threading.Event()
+        self._children = weakref.WeakSet()
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent._add_child(self)
+
+    def _add_child(self, child):
+        with self._lock:
+            self._children.add(child)
+        if self.cancelled:
+            child.cancel(self.reason)
+
+    @property
+    def budget(self):
+        """Remaining time in seconds, ``inf`` if there is no time limit."""
+        return max(self.expires_at - self.clock.time(), 0.)
+
+    @property
+    def expired(self):
+        return self.clock.time() >= self.expires_at
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self, reason='aborted'):
+        """Cancel this deadline and all its steps.
+
+        Parameters
+        ----------
+        reason: str
+            Reason given by `SequenceAborted`.
+        """
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            children = list(self._children)
+        for child in children:
+            child.cancel(reason)
+
+    def check(self):
+        """Raise if the deadline was cancelled or expired.
+
+        Raises
+        ------
+        SequenceAborted
+        DeadlineExceeded
+        """
+        if self.cancelled:
+            raise SequenceAborted('Sequence {}.'.format(self.reason))
+        if self.expired:
+            raise DeadlineExceeded('Sequence ran out of time.')
+
+    def timeout(self, timeout=math.inf):
+        """Bound the timeout of a step by the remaining budget.
+
+        Parameters
+        ----------
+        timeout: float
+            Timeout of the step in seconds.
+
+        Returns
+        -------
+        timeout: float
+
+        Raises
+        ------
+        SequenceAborted
+        DeadlineExceeded
+        """
+        self.check()
+        return min(timeout, self.budget)
+
+    def child(self, budget=None):
+        """Return the deadline of a step.
+
+        Parameters
+        ----------
+        budget: float, optional
+            Time budget of the step in seconds, capped by the remaining budget.
+
+        Returns
+        -------
+        deadline: Deadline
+        """
+        return Deadline(budget, parent=self)
+
+    def share(self, estimate, total):
+        """Return the deadline of a step given its share of the remaining budget.
+
+        Parameters
+        ----------
+        estimate: float
+            Estimated time of the step in seconds.
+        total: float
+            Estimated time of all the remaining steps, including this one, in seconds.
+
+        Returns
+        -------
+        deadline: Deadline
+            Deadline with ``estimate / total`` of the remaining budget.
+        """
+        if total <= 0. or math.isinf(self.expires_at):
+            return self.child()
+        return self.child(self.budget * min(estimate / total, 1.))
+
+    def sleep(self, seconds):
+        """Sleep, waking up as soon as the deadline is cancelled.
+
+        Parameters
+        ----------
+        seconds: float
+
+        Raises
+        ------
+        SequenceAborted
+        DeadlineExceeded
+            If the deadline expires before the end of the sleep.
+        """
+        end = self.clock.time() + seconds
+        while True:
+            left = end - self.clock.time()
+            if left <= 0.:
+                return
+            self.check()
+            step = min(left, self.budget, CHECK_INTERVAL)
+            if isinstance(self.clock, RealClock):
+                self._cancelled.wait(step)
+            else:
+                self.clock.sleep(step)
@@ -0,0 +1,404 @@
+import asyncio
+import collections
+import functools
+import itertools
+import logging
+import threading
+import time
+
+from .component import get_executor
+from .deadline import CHECK_INTERVAL
+from .history import compact_sample
+from .tracing import get_tracer
+
+__all__ = ['EventCache', 'TopicCache']
+
+# Fields identifying a DDS sample, in order of preference.
+STAMP_FIELDS = ('private_sndStamp', 'private_seqNum')
+
+
+def snapshot(data):
+    """Copy the public fields of a DDS sample.
+
+    SAL may reuse the same object for consecutive samples, so the values are copied into a new object,
+    a compact named tuple shared by all the samples of a topic (see `compact_sample`).
+
+    Parameters
+    ----------
+    data: object
+        DDS sample.
+
+    Returns
+    -------
+    sample: tuple
+    """
+    fields = {}
+    for name in dir(data):
+        if name.startswith('_'):
+            continue
+        value = getattr(data, name)
+        if not callable(value):
+            fields[name] = value
+    return compact_sample(fields)
+
+
+class TopicCache:
+    """Latest value and bounded history of one event topic.
+
+    Parameters
+    ----------
+    name: str
+        Name of the topic.
+    maxlen: int
+        Number of samples kept in the history.
+    event_cache: EventCache, optional
+        Cache reading the topic. When it runs on a simulated clock, the topic is read on demand.
+    """
+
+    def __init__(self, name, maxlen=100, event_cache=None):
+        self.name = name
+        self.history = collections.deque(maxlen=maxlen)
+        self.n_samples = 0
+        self.event_cache = event_cache
+        self._callbacks = []
+        self._condition = threading.Condition()
+
+    @property
+    def _clock(self):
+        return self.event_cache.clock if self.event_cache is not None else None
+
+    @property
+    def latest(self):
+        """Latest sample received, or None."""
+        if self._clock is not None:
+            self.event_cache.read(self)
+        with self._condition:
+            return self.history[-1] if len(self.history) > 0 else None
+
+    def add_callback(self, callback):
+        """Call a function with each new sample.
+
+        Callbacks run in the thread adding the sample, before anyone waiting on this topic is woken up,
+        so they should return quickly.
+
+        Parameters
+        ----------
+        callback: callable
+            Function receiving the new sample.
+        """
+        with self._condition:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """Stop calling a function added with `add_callback`.
+
+        Parameters
+        ----------
+        callback: callable
+        """
+        with self._condition:
+            self._callbacks.remove(callback)
+
+    def resize(self, maxlen):
+        """Change the number of samples kept in the history, dropping the oldest ones if needed.
+
+        Parameters
+        ----------
+        maxlen: int
+        """
+        with self._condition:
+            self.history = collections.deque(self.history, maxlen=maxlen)
+
+    def add(self, sample):
+        """Add a new sample and wake up anyone waiting on this topic.
+
+        Parameters
+        ----------
+        sample: object
+        """
+        with self._condition:
+            self.history.append(sample)
+            self.n_samples += 1
+            for callback in self._callbacks:
+                try:
+                    callback(sample)
+                except Exception:
+                    logging.getLogger(type(self).__name__).exception('Callback failed on %s.', self.name)
+            self._condition.notify_all()
+
+    def wait_for(self, predicate, timeout, samples=1, fresh=False, deadline=None):
+        """Wait until the last samples satisfy a condition.
+
+        Parameters
+        ----------
+        predicate: callable
+            Function receiving the list of the last ``samples`` samples and returning True when the
+            condition holds.
+        timeout: float
+            Timeout in seconds.
+        samples: int
+            Number of samples passed to the predicate.
+        fresh: bool
+            Only consider samples received after this call.
+        deadline: Deadline, optional
+            Deadline of the step waiting, which also bounds the timeout.
+
+        Returns
+        -------
+        sample: object
+            The latest sample, once the condition holds.
+
+        Raises
+        ------
+        TimeoutError
+            If the condition does not hold before the timeout.
+        SequenceAborted
+            If the deadline is cancelled while waiting.
+        DeadlineExceeded
+            If the deadline expires while waiting.
+        """
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        tracer = self.event_cache.tracer if self.event_cache is not None else None
+        tracer = tracer if tracer is not None else get_tracer()
+        with tracer.span('wait ' + self.name, 'events', timeout=timeout, samples=samples):
+            if self._clock is not None:
+                return self._wait_for_clock(predicate, timeout, samples, fresh, deadline)
+            return self._wait_for(predicate, timeout, samples, fresh, deadline)
+
+    def _check(self, predicate, samples, first_sample):
+        n_available = min(self.n_samples - first_sample, len(self.history))
+        if n_available >= samples:
+            last = list(itertools.islice(reversed(self.history), samples))[::-1]
+            if predicate(last):
+                return last[-1]
+        return None
+
+    def _wait_for(self, predicate, timeout, samples, fresh, deadline=None):
+        end = time.monotonic() + timeout
+        with self._condition:
+            first_sample = self.n_samples if fresh else self.n_samples - len(self.history)
+            while True:
+                sample = self._check(predicate, samples, first_sample)
+                if sample is not None:
+                    return sample
+                if deadline is not None:
+                    deadline.check()
+                remaining = end - time.monotonic()
+                if remaining <= 0.:
+                    raise TimeoutError('Timed out waiting for condition on {}.'.format(self.name))
+                self._condition.wait(min(remaining, CHECK_INTERVAL) if deadline is not None else remaining)
+
+    def _wait_for_clock(self, predicate, timeout, samples, fresh, deadline=None):
+        # Read the topic every poll interval of the simulated clock instead of being woken up by the
+        # reading thread.
+        clock = self._clock
+        end = clock.time() + timeout
+        with self._condition:
+            first_sample = self.n_samples if fresh else self.n_samples - len(self.history)
+        while True:
+            self.event_cache.read(self)
+            with self._condition:
+                sample = self._check(predicate, samples, first_sample)
+            if sample is not None:
+                return sample
+            if deadline is not None:
+                deadline.check()
+            remaining = end - clock.time()
+            if remaining <= 0.:
+                raise TimeoutError('Timed out waiting for condition on {}.'.format(self.name))
+            clock.sleep(min(self.event_cache.poll_interval, remaining))
+
+    def wait_value(self, field, value, timeout, fresh=False, deadline=None):
+        """Wait until a field of the topic has a given value.
+
+        Parameters
+        ----------
+        field: str
+            Name of the field.
+        value: object
+            Expected value.
+        timeout: float
+            Timeout in seconds.
+        fresh: bool
+            Only consider samples received after this call.
+        deadline: Deadline, optional
+            Deadline of the step waiting.
+
+        Returns
+        -------
+        sample: object
+        """
+        return self.wait_for(lambda last: getattr(last[-1], field) == value, timeout, fresh=fresh,
+                             deadline=deadline)
+
+    def wait_stable(self, field, rtol, samples, timeout, fresh=True, deadline=None):
+        """Wait until a field is stable within a relative tolerance over a number of samples.
+
+        Parameters
+        ----------
+        field: str
+            Name of the field.
+        rtol: float
+            Maximum deviation of each sample from the mean of the samples, relative to the mean.
+        samples: int
+            Number of consecutive samples that have to be stable.
+        timeout: float
+            Timeout in seconds.
+        fresh: bool
+            Only consider samples received after this call.
+        deadline: Deadline, optional
+            Deadline of the step waiting.
+
+        Returns
+        -------
+        sample: object
+        """
+        def is_stable(last):
+            values = [getattr(sample, field) for sample in last]
+            mean = sum(values) / len(values)
+            return all(abs(value - mean) <= rtol * abs(mean) for value in values)
+
+        return self.wait_for(is_stable, timeout, samples=samples, fresh=fresh, deadline=deadline)
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+    async def wait_for_async(self, predicate, timeout, samples=1, fresh=False, deadline=None):
+        """Awaitable version of `wait_for`."""
+        return await self._run_blocking(self.wait_for, predicate, timeout, samples=samples, fresh=fresh,
+                                        deadline=deadline)
+
+    async def wait_value_async(self, field, value, timeout, fresh=False, deadline=None):
+        """Awaitable version of `wait_value`."""
+        return await self._run_blocking(self.wait_value, field, value, timeout, fresh=fresh,
+                                        deadline=deadline)
+
+    async def wait_stable_async(self, field, rtol, samples, timeout, fresh=True, deadline=None):
+        """Awaitable version of `wait_stable`."""
+        return await self._run_blocking(self.wait_stable, field, rtol, samples, timeout, fresh=fresh,
+                                        deadline=deadline)
+
+
+class EventCache:
+    """Cache of the latest samples of the event topics of a component.
+
+    Topics are read from a `salpylib.DDSSubscriberContainer` by a background thread, which only adds a
+    sample to the cache when it is new, based on its ``private_sndStamp``, or ``private_seqNum`` if it has
+    no time stamp. Samples with neither are added every time they are read. With a simulated
+    clock, there is no thread and topics are read when they are accessed or waited on.
+
+    Parameters
+    ----------
+    subscriber: salpylib.DDSSubscriberContainer
+        The component event subscriber.
+    maxlen: int
+        Number of samples kept in the history of each topic.
+    poll_interval: float
+        Interval, in seconds, between reads of the subscriber.
+    clock: VirtualClock, optional
+        Simulated clock, None to follow the topics in real time.
+    tracer: Tracer, optional
+        Tracer recording the waits, by default the process-wide one.
+    """
+
+    def __init__(self, subscriber, maxlen=100, poll_interval=0.01, clock=None, tracer=None):
+        self.log = logging.getLogger(type(self).__name__)
+        self.subscriber = subscriber
+        self.maxlen = maxlen
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.tracer = tracer
+        self._topics = {}
+        self._last_stamp = {}
+        self._failing = set()
+        self._unstamped = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def topic(self, name):
+        """Return the cache of a topic, starting to follow it if needed.
+
+        Parameters
+        ----------
+        name: str
+            Name of the topic.
+
+        Returns
+        -------
+        topic: TopicCache
+        """
+        with self._lock:
+            if name not in self._topics:
+                self._topics[name] = TopicCache(name, self.maxlen, self)
+                if self.clock is None and self._thread is None:
+                    self._thread = threading.Thread(target=self._poll, name='event-cache', daemon=True)
+                    self._thread.start()
+            return self._topics[name]
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return self.topic(item)
+
+    def resize(self, maxlen):
+        """Change the number of samples kept in the history of each topic.
+
+        Parameters
+        ----------
+        maxlen: int
+        """
+        with self._lock:
+            self.maxlen = maxlen
+            topics = list(self._topics.values())
+        for topic in topics:
+            topic.resize(maxlen)
+
+    def read(self, topic):
+        """Read a topic from the subscriber and add the sample to its cache if it is new.
+
+        Parameters
+        ----------
+        topic: TopicCache
+        """
+        try:
+            data = getattr(self.subscriber, topic.name)
+        except Exception:
+            # Only log the first of consecutive failures, the topic is read every poll interval.
+            if topic.name not in self._failing:
+                self._failing.add(topic.name)
+                self.log.exception('Failed to read %s.', topic.name)
+            return
+        self._failing.discard(topic.name)
+        if data is None:
+            return
+        # Check the stamp before copying the sample, as most reads return the sample already cached.
+        # Consecutive samples may have the same values, so only the stamp tells whether a sample is new.
+        stamp = next((getattr(data, field) for field in STAMP_FIELDS if hasattr(data, field)), None)
+        if stamp is None:
+            if topic.name not in self._unstamped:
+                self._unstamped.add(topic.name)
+                self.log.warning('%s has no %s, every read is taken as a new sample.', topic.name,
+                                 ' or '.join(STAMP_FIELDS))
+        elif stamp == self._last_stamp.get(topic.name):
+            return
+        else:
+            self._last_stamp[topic.name] = stamp
+        topic.add(snapshot(data))
+
+    def _poll(self):
+        while not self._stop.is_set():
+            with self._lock:
+                topics = list(self._topics.values())
+            for topic in topics:
+                self.read(topic)
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        """Stop following the topics.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
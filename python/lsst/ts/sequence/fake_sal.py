@@ -0,0 +1,232 @@
+import collections
+import itertools
+import math
+import threading
+import time
+import types
+
+__all__ = ['FakeSAL', 'CommandLatency', 'EventStream', 'RealClock']
+
+SAL__CMD_ACK = 300
+SAL__CMD_INPROGRESS = 301
+SAL__CMD_COMPLETE = 303
+
+# Tolerance on the time acks are due, so a wait waking up at that time on a simulated clock sees them
+# despite rounding errors.
+TIME_EPSILON = 1.e-9
+
+
+class RealClock:
+    """Wall clock used by `FakeSAL`."""
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0.:
+            time.sleep(seconds)
+
+
+class CommandLatency:
+    """Simulated timing of a command.
+
+    Parameters
+    ----------
+    ack: float
+        Time, in seconds, between sending the command and receiving the ack.
+    in_progress: float
+        Time between the ack and the command being in progress.
+    complete: float or callable
+        Time between the command being in progress and its completion. If callable, it receives the command
+        parameters and returns the time, e.g. ``lambda kwargs: kwargs['expTime']``.
+    result: tuple
+        The final (ack, error, result) of the command. Use it to simulate failing commands.
+    concurrent: bool
+        The command goes in progress without waiting for the commands executing on its component.
+    """
+
+    def __init__(self, ack=0., in_progress=0., complete=0., result=(SAL__CMD_COMPLETE, 0, 'Done : OK'),
+                 concurrent=False):
+        self.ack = ack
+        self.in_progress = in_progress
+        self.complete = complete
+        self.result = result
+        self.concurrent = concurrent
+
+    def durations(self, kwargs):
+        complete = self.complete(kwargs) if callable(self.complete) else self.complete
+        return self.ack, self.in_progress, complete
+
+
+class EventStream:
+    """Simulated event topic, publishing a new sample every ``period`` seconds.
+
+    Parameters
+    ----------
+    period: float
+        Time between samples in seconds.
+    fields: dict
+        Values of the topic fields. Values may be callables receiving the sample time.
+    """
+
+    def __init__(self, period=1., **fields):
+        self.period = period
+        self.fields = fields
+
+    def sample(self, now):
+        stamp = math.floor(now / self.period) * self.period
+        data = {name: value(stamp) if callable(value) else value for name, value in self.fields.items()}
+        return types.SimpleNamespace(private_sndStamp=stamp, **data)
+
+
+class _FakeCommand:
+
+    __slots__ = ('acks', 'pending', 'done_at', 'in_progress_at')
+
+    def __init__(self, acks, pending, in_progress_at, done_at):
+        self.acks = acks
+        self.pending = pending
+        self.in_progress_at = in_progress_at
+        self.done_at = done_at
+
+
+class _FakeResponses(dict):
+    """Command responses, updated with the acks that are due every time a command is looked up."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def __getitem__(self, cmd_id):
+        command = dict.__getitem__(self, cmd_id)
+        now = self.clock.time()
+        while command.pending and command.pending[0][0] <= now + TIME_EPSILON:
+            command.acks.append(command.pending.pop(0)[1])
+        return {'ack': command.acks}
+
+
+class FakeDDSSend:
+    """In-process stand-in for `salpylib.DDSSend`.
+
+    Like a real component, it executes one command at a time: a command sent while another one is
+    executing only goes in progress once the previous one completes, unless its latency is
+    ``concurrent``.
+    """
+
+    def __init__(self, sal, Device, device_id=None):
+        self.sal = sal
+        self.Device = Device
+        self.device_id = device_id
+        self.cmd_responses = _FakeResponses(sal.clock)
+        # Last commands sent, as (command, parameters).
+        self.commands_sent = collections.deque(maxlen=1000)
+        self._busy_until = -math.inf
+        self._lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def send_Command(self, cmd, wait_command=False, timeout=None, **kwargs):
+        latency = self.sal.latency(self.Device, cmd)
+        ack_time, in_progress_time, complete_time = latency.durations(kwargs)
+
+        self.sal.clock.sleep(ack_time)
+        now = self.sal.clock.time()
+        cmd_id = self.sal.next_cmd_id()
+        if latency.concurrent:
+            in_progress_at = now + in_progress_time
+            done_at = in_progress_at + complete_time
+        else:
+            with self._lock:
+                in_progress_at = max(now + in_progress_time, self._busy_until)
+                done_at = in_progress_at + complete_time
+                self._busy_until = done_at
+        pending = [(in_progress_at, (SAL__CMD_INPROGRESS, 0, 'In progress')),
+                   (done_at, tuple(latency.result))]
+        dict.__setitem__(self.cmd_responses, cmd_id,
+                         _FakeCommand([(SAL__CMD_ACK, 0, 'Ack : OK')], pending, in_progress_at, done_at))
+        self.commands_sent.append((cmd, kwargs))
+
+        if wait_command:
+            self.waitForCompletion(cmd_id, timeout if timeout is not None else self.sal.default_timeout)
+        return [cmd_id]
+
+    def _wait_until(self, when, timeout):
+        self.sal.clock.sleep(min(when - self.sal.clock.time(), timeout))
+
+    def waitForInProgress(self, cmdid, timeout):
+        self._wait_until(dict.__getitem__(self.cmd_responses, cmdid).in_progress_at, timeout)
+        return self.cmd_responses[cmdid]['ack'][-1]
+
+    def waitForCompletion(self, cmdid, timeout):
+        self._wait_until(dict.__getitem__(self.cmd_responses, cmdid).done_at, timeout)
+        return self.cmd_responses[cmdid]['ack'][-1]
+
+
+class FakeDDSSubscriberContainer:
+    """In-process stand-in for `salpylib.DDSSubscriberContainer`."""
+
+    def __init__(self, sal, component, device_id=None):
+        self.sal = sal
+        self.component = component
+        self.device_id = device_id
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        stream = self.sal.events.get(self.component, {}).get(item)
+        if stream is None:
+            raise AttributeError('{} has no event {}.'.format(self.component, item))
+        return stream.sample(self.sal.clock.time())
+
+
+class FakeSAL:
+    """In-process stand-in for the `salpylib` module.
+
+    Pass an instance as the ``salpylib`` of a `DDSPool` to run sequences without DDS. Commands are
+    acknowledged, go in progress and complete according to their configured `CommandLatency`, and events
+    are generated by `EventStream` objects.
+
+    Parameters
+    ----------
+    latencies: dict, optional
+        `CommandLatency` by ``(component, command)`` or by ``component``.
+    events: dict, optional
+        `EventStream` by topic, by component.
+    default_latency: CommandLatency, optional
+        Latency of commands not found in ``latencies``.
+    clock: object, optional
+        Clock providing ``time()`` and ``sleep()``, by default the wall clock.
+    """
+
+    SAL__CMD_ACK = SAL__CMD_ACK
+    SAL__CMD_INPROGRESS = SAL__CMD_INPROGRESS
+    SAL__CMD_COMPLETE = SAL__CMD_COMPLETE
+
+    def __init__(self, latencies=None, events=None, default_latency=None, clock=None):
+        self.latencies = latencies if latencies is not None else {}
+        self.events = events if events is not None else {}
+        self.default_latency = default_latency if default_latency is not None else CommandLatency()
+        self.default_timeout = 30.
+        self.clock = clock if clock is not None else RealClock()
+        self._cmd_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def latency(self, component, cmd):
+        for key in ((component, cmd), component):
+            if key in self.latencies:
+                return self.latencies[key]
+        return self.default_latency
+
+    def next_cmd_id(self):
+        with self._lock:
+            return next(self._cmd_ids)
+
+    def DDSSend(self, Device, device_id=None):
+        return FakeDDSSend(self, Device, device_id)
+
+    def DDSSubscriberContainer(self, component, device_id=None):
+        return FakeDDSSubscriberContainer(self, component, device_id)
@@ -0,0 +1,185 @@
+import threading
+import time
+
+import numpy as np
+
+__all__ = ['StreamingFluxEstimator']
+
+
+class StreamingFluxEstimator:
+    """Running mean, variance and drift of a flux time series over a sliding window.
+
+    Samples are kept in a fixed-size ring buffer and the window sums are updated as samples come in and
+    leave the window, so adding a sample or querying the estimate takes constant time and allocates
+    nothing. The sums are recomputed from the buffer once per window to avoid accumulating rounding
+    errors.
+
+    Samples may be added from one thread (e.g. an `EventCache` callback) while the estimate is queried
+    from another.
+
+    Parameters
+    ----------
+    size: int
+        Number of samples in the window.
+    """
+
+    def __init__(self, size=32):
+        if size < 2:
+            raise ValueError('Window size must be at least 2.')
+        self.size = size
+        self._time = np.zeros(size)
+        self._flux = np.zeros(size)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all samples, e.g. after the source changes.
+        """
+        with self._lock:
+            self.count = 0
+            self._index = 0
+            self._t0 = None
+            self._n_added = 0
+            self._sum_t = 0.
+            self._sum_f = 0.
+            self._sum_tt = 0.
+            self._sum_tf = 0.
+            self._sum_ff = 0.
+
+    def add(self, flux, timestamp=None):
+        """Add a flux sample.
+
+        Parameters
+        ----------
+        flux: float
+        timestamp: float, optional
+            Time of the sample in seconds, by default the current time.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if self._t0 is None:
+                self._t0 = timestamp
+            t = timestamp - self._t0
+
+            if self.count == self.size:
+                old_t = self._time[self._index]
+                old_f = self._flux[self._index]
+                self._sum_t -= old_t
+                self._sum_f -= old_f
+                self._sum_tt -= old_t * old_t
+                self._sum_tf -= old_t * old_f
+                self._sum_ff -= old_f * old_f
+            else:
+                self.count += 1
+
+            self._time[self._index] = t
+            self._flux[self._index] = flux
+            self._sum_t += t
+            self._sum_f += flux
+            self._sum_tt += t * t
+            self._sum_tf += t * flux
+            self._sum_ff += flux * flux
+            self._index = (self._index + 1) % self.size
+
+            self._n_added += 1
+            if self._n_added % self.size == 0:
+                self._resum()
+
+    def _resum(self):
+        t = self._time[:self.count]
+        f = self._flux[:self.count]
+        self._sum_t = t.sum()
+        self._sum_f = f.sum()
+        self._sum_tt = np.dot(t, t)
+        self._sum_tf = np.dot(t, f)
+        self._sum_ff = np.dot(f, f)
+
+    @property
+    def mean(self):
+        """Mean flux over the window, or None if there are no samples."""
+        with self._lock:
+            return self._sum_f / self.count if self.count > 0 else None
+
+    @property
+    def variance(self):
+        """Sample variance of the flux over the window, or None with less than two samples."""
+        with self._lock:
+            return self._variance()
+
+    def _variance(self):
+        if self.count < 2:
+            return None
+        variance = (self._sum_ff - self._sum_f * self._sum_f / self.count) / (self.count - 1)
+        return max(variance, 0.)
+
+    @property
+    def std(self):
+        """Standard deviation of the flux over the window, or None with less than two samples."""
+        variance = self.variance
+        return None if variance is None else np.sqrt(variance)
+
+    @property
+    def drift(self):
+        """Least-squares slope of the flux with time over the window, in flux per second.
+
+        None with less than two samples or if all samples have the same time.
+        """
+        with self._lock:
+            return self._drift()
+
+    def _drift(self):
+        if self.count < 2:
+            return None
+        denominator = self.count * self._sum_tt - self._sum_t * self._sum_t
+        if denominator <= 0.:
+            return None
+        return (self.count * self._sum_tf - self._sum_t * self._sum_f) / denominator
+
+    def is_stable(self, rtol, min_samples=3):
+        """Check if the flux is stable over the window.
+
+        The flux is stable when both its standard deviation and its drift over the time spanned by the
+        window are within ``rtol`` of the mean.
+
+        Parameters
+        ----------
+        rtol: float
+            Tolerance relative to the mean flux.
+        min_samples: int
+            Minimum number of samples needed to decide.
+
+        Returns
+        -------
+        stable: bool
+        """
+        with self._lock:
+            if self.count < max(min_samples, 2):
+                return False
+            mean = self._sum_f / self.count
+            tolerance = rtol * abs(mean)
+            if np.sqrt(self._variance()) > tolerance:
+                return False
+            drift = self._drift()
+            if drift is None:
+                return True
+            t = self._time[:self.count]
+            return abs(drift) * (t.max() - t.min()) <= tolerance
+
+    def exposure_time(self, intensity, max_exptime):
+        """Exposure time needed to reach a given intensity at the mean flux.
+
+        Parameters
+        ----------
+        intensity: float
+            Target intensity.
+        max_exptime: float
+            Maximum exposure time, also used when there is no flux.
+
+        Returns
+        -------
+        exptime: float
+        """
+        mean = self.mean
+        if mean is None or mean <= 0.:
+            return max_exptime
+        return min(intensity / mean, max_exptime)
@@ -0,0 +1,169 @@
+import collections
+import threading
+import time
+
+__all__ = ['AckRecord', 'CommandHistory', 'compact_sample']
+
+
+class AckRecord:
+    """Last ack received for a command.
+
+    Parameters
+    ----------
+    cmd_id: int
+    cmd: str
+        Name of the command, or None if unknown.
+    ack: tuple
+        The (ack, error, result) tuple.
+    timestamp: float
+        Time the ack was recorded, in seconds.
+    """
+
+    __slots__ = ('cmd_id', 'cmd', 'ack', 'error', 'result', 'time')
+
+    def __init__(self, cmd_id, cmd, ack, timestamp):
+        self.cmd_id = cmd_id
+        self.cmd = cmd
+        self.ack, self.error, self.result = ack
+        self.time = timestamp
+
+    def __repr__(self):
+        return 'AckRecord(cmd_id={}, cmd={!r}, ack={}, error={}, result={!r})'.format(
+            self.cmd_id, self.cmd, self.ack, self.error, self.result)
+
+    @property
+    def response(self):
+        """The (ack, error, result) tuple."""
+        return self.ack, self.error, self.result
+
+
+class CommandHistory:
+    """Bounded history of the last ack of each command sent to a component.
+
+    Only the last ack of each command is kept, in one `AckRecord`, and the oldest commands are forgotten
+    once ``maxlen`` commands are recorded, so memory stays flat however many commands are sent. Looking up
+    the last ack of a command takes constant time.
+
+    Parameters
+    ----------
+    maxlen: int
+        Number of commands kept.
+    """
+
+    def __init__(self, maxlen=1000):
+        if maxlen < 1:
+            raise ValueError('History size must be at least 1.')
+        self.maxlen = maxlen
+        self._records = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, cmd_id):
+        return cmd_id in self._records
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._records.values()))
+
+    def add(self, cmd_id, ack, cmd=None, timestamp=None):
+        """Record the last ack of a command.
+
+        Parameters
+        ----------
+        cmd_id: int
+        ack: tuple
+            The (ack, error, result) tuple.
+        cmd: str, optional
+            Name of the command, by default the name recorded with a previous ack.
+        timestamp: float, optional
+            Time of the ack in seconds, by default the current time.
+
+        Returns
+        -------
+        record: AckRecord
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            previous = self._records.pop(cmd_id, None)
+            if cmd is None and previous is not None:
+                cmd = previous.cmd
+            record = AckRecord(cmd_id, cmd, ack, timestamp)
+            self._records[cmd_id] = record
+            while len(self._records) > self.maxlen:
+                self._records.popitem(last=False)
+        return record
+
+    def get(self, cmd_id):
+        """Return the record of a command.
+
+        Parameters
+        ----------
+        cmd_id: int
+
+        Returns
+        -------
+        record: AckRecord
+            The record, or None if the command is unknown or was forgotten.
+        """
+        return self._records.get(cmd_id)
+
+    def latest(self, cmd_id):
+        """Return the last ack of a command.
+
+        Parameters
+        ----------
+        cmd_id: int
+
+        Returns
+        -------
+        ack: tuple
+            The (ack, error, result) tuple, or None if the command is unknown or was forgotten.
+        """
+        record = self._records.get(cmd_id)
+        return record.response if record is not None else None
+
+    def resize(self, maxlen):
+        """Change the number of commands kept, forgetting the oldest ones if needed.
+
+        Parameters
+        ----------
+        maxlen: int
+        """
+        if maxlen < 1:
+            raise ValueError('History size must be at least 1.')
+        with self._lock:
+            self.maxlen = maxlen
+            while len(self._records) > self.maxlen:
+                self._records.popitem(last=False)
+
+
+_sample_types = {}
+_sample_types_lock = threading.Lock()
+
+
+def _sample_type(names):
+    with _sample_types_lock:
+        if names not in _sample_types:
+            _sample_types[names] = collections.namedtuple('Sample', names)
+        return _sample_types[names]
+
+
+def compact_sample(fields):
+    """Build an event sample that does not carry a dictionary per instance.
+
+    Samples with the same fields share one `collections.namedtuple` type, so they only store their values
+    and their fields are still read as attributes.
+
+    Parameters
+    ----------
+    fields: dict
+        Value of each field.
+
+    Returns
+    -------
+    sample: tuple
+        Named tuple of the fields, with ``_asdict()`` to get them back as a dictionary.
+    """
+    return _sample_type(tuple(sorted(fields)))(**fields)
@@ -0,0 +1,323 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+__all__ = ['LatencyHistogram', 'Metrics', 'get_metrics']
+
+# Phases of a command: send to ack, ack to in progress and in progress to complete.
+PHASES = ('ack', 'in_progress', 'complete')
+
+
+class LatencyHistogram:
+    """Streaming histogram of latencies with logarithmic buckets.
+
+    Buckets double in width from ``smallest`` seconds, so a fixed and small number of counters covers
+    latencies from milliseconds to hours with a constant relative resolution.
+
+    Parameters
+    ----------
+    smallest: float
+        Upper bound of the first bucket, in seconds.
+    n_buckets: int
+        Number of buckets, the last one also counting anything above its bound.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, smallest=1.e-3, n_buckets=24):
+        self.bounds = [smallest * 2 ** i for i in range(n_buckets)]
+        self.counts = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        """Add a latency.
+
+        Parameters
+        ----------
+        value: float
+            Latency in seconds.
+        """
+        index = min(bisect.bisect_left(self.bounds, value), len(self.bounds) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self):
+        """Mean latency, or None if there are none."""
+        return self.sum / self.count if self.count > 0 else None
+
+    def quantile(self, q):
+        """Estimate a quantile of the latencies.
+
+        Parameters
+        ----------
+        q: float
+            Quantile, between 0 and 1.
+
+        Returns
+        -------
+        value: float
+            Upper bound of the bucket holding the quantile, clipped to the observed range, or None if there
+            are no latencies. The last bucket has no upper bound, so a quantile in it is the maximum.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds[:-1], self.counts):
+            seen += count
+            if count > 0 and seen >= rank:
+                return max(min(bound, self.max), self.min)
+        return self.max
+
+    def as_dict(self):
+        return {'count': self.count, 'sum': self.sum,
+                'min': self.min if self.count > 0 else None, 'max': self.max if self.count > 0 else None,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95),
+                'buckets': [[bound, count] for bound, count in zip(self.bounds, self.counts) if count > 0]}
+
+
+class _RunTimeError:
+    """Gap between the estimated and actual run times of a sequence."""
+
+    __slots__ = ('count', 'sum', 'sum_abs')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.
+        self.sum_abs = 0.
+
+    def add(self, error):
+        self.count += 1
+        self.sum += error
+        self.sum_abs += abs(error)
+
+    def as_dict(self):
+        return {'count': self.count,
+                'mean': self.sum / self.count if self.count > 0 else None,
+                'mean_abs': self.sum_abs / self.count if self.count > 0 else None}
+
+
+class Metrics:
+    """Aggregate command latencies and sequence outcomes.
+
+    Command latencies are kept in a `LatencyHistogram` per component, command and phase (``ack``,
+    ``in_progress`` and ``complete``), with the number of commands that completed or failed. Sequences are
+    counted by outcome, with the gap between their estimated run time and actual duration.
+
+    Parameters
+    ----------
+    clock: callable
+        Function returning the current time in seconds, used to time the commands.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._histograms = {}
+        self._commands = {}
+        self._sequences = {}
+        self._run_time_errors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, component, command, phase, seconds):
+        """Add the latency of a command phase.
+
+        Parameters
+        ----------
+        component: str
+        command: str
+        phase: str
+            One of ``ack``, ``in_progress`` or ``complete``.
+        seconds: float
+        """
+        key = (component, command, phase)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = LatencyHistogram()
+            self._histograms[key].add(seconds)
+
+    def count_command(self, component, command, outcome):
+        """Count a command by outcome.
+
+        Parameters
+        ----------
+        component: str
+        command: str
+        outcome: str
+            ``completed`` or ``failed``.
+        """
+        key = (component, command, outcome)
+        with self._lock:
+            self._commands[key] = self._commands.get(key, 0) + 1
+
+    def record_sequence(self, name, success, duration=None, estimate=None):
+        """Record the outcome of a sequence run.
+
+        Parameters
+        ----------
+        name: str
+            Name of the sequence.
+        success: bool
+        duration: float, optional
+            Actual run time in seconds.
+        estimate: float, optional
+            Estimated run time in seconds. The run time error is only recorded for successful runs with
+            both times.
+        """
+        key = (name, 'succeeded' if success else 'failed')
+        with self._lock:
+            self._sequences[key] = self._sequences.get(key, 0) + 1
+            if success and duration is not None and estimate is not None:
+                if name not in self._run_time_errors:
+                    self._run_time_errors[name] = _RunTimeError()
+                self._run_time_errors[name].add(duration - estimate)
+
+    def histogram(self, component, command, phase):
+        """Return the histogram of a command phase.
+
+        Returns
+        -------
+        histogram: LatencyHistogram
+            The histogram, or None if nothing was recorded.
+        """
+        return self._histograms.get((component, command, phase))
+
+    def __len__(self):
+        return len(self._histograms) + len(self._sequences)
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {}
+            self._commands = {}
+            self._sequences = {}
+            self._run_time_errors = {}
+
+    def as_dict(self):
+        """Return the metrics as a dictionary, e.g. to write them as JSON.
+
+        Returns
+        -------
+        metrics: dict
+        """
+        with self._lock:
+            commands = {}
+            for (component, command, phase), histogram in sorted(self._histograms.items()):
+                commands.setdefault(component, {}).setdefault(command, {})[phase] = histogram.as_dict()
+            for (component, command, outcome), count in sorted(self._commands.items()):
+                commands.setdefault(component, {}).setdefault(command, {})[outcome] = count
+            sequences = {}
+            for (name, outcome), count in sorted(self._sequences.items()):
+                sequences.setdefault(name, {})[outcome] = count
+            for name, error in sorted(self._run_time_errors.items()):
+                sequences.setdefault(name, {})['run_time_error'] = error.as_dict()
+        return {'commands': commands, 'sequences': sequences}
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        text: str
+        """
+        lines = ['# HELP sequence_command_seconds Latency of each phase of the commands.',
+                 '# TYPE sequence_command_seconds histogram']
+        with self._lock:
+            for (component, command, phase), histogram in sorted(self._histograms.items()):
+                labels = 'component="{}",command="{}",phase="{}"'.format(component, command, phase)
+                cumulative = 0
+                # The last bucket also counts anything above its bound, so it is only exported as +Inf.
+                for bound, count in zip(histogram.bounds[:-1], histogram.counts):
+                    cumulative += count
+                    lines.append('sequence_command_seconds_bucket{{{},le="{:g}"}} {}'.format(
+                        labels, bound, cumulative))
+                lines.append('sequence_command_seconds_bucket{{{},le="+Inf"}} {}'.format(
+                    labels, histogram.count))
+                lines.append('sequence_command_seconds_sum{{{}}} {:.6f}'.format(labels, histogram.sum))
+                lines.append('sequence_command_seconds_count{{{}}} {}'.format(labels, histogram.count))
+
+            lines += ['# HELP sequence_commands_total Commands by outcome.',
+                      '# TYPE sequence_commands_total counter']
+            for (component, command, outcome), count in sorted(self._commands.items()):
+                lines.append('sequence_commands_total{{component="{}",command="{}",outcome="{}"}} {}'.format(
+                    component, command, outcome, count))
+
+            lines += ['# HELP sequence_runs_total Sequence runs by outcome.',
+                      '# TYPE sequence_runs_total counter']
+            for (name, outcome), count in sorted(self._sequences.items()):
+                lines.append('sequence_runs_total{{sequence="{}",outcome="{}"}} {}'.format(
+                    name, outcome, count))
+
+            lines += ['# HELP sequence_run_time_error_seconds Actual minus estimated run time.',
+                      '# TYPE sequence_run_time_error_seconds summary']
+            for name, error in sorted(self._run_time_errors.items()):
+                lines.append('sequence_run_time_error_seconds_sum{{sequence="{}"}} {:.6f}'.format(
+                    name, error.sum))
+                lines.append('sequence_run_time_error_seconds_count{{sequence="{}"}} {}'.format(
+                    name, error.count))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, filename):
+        """Write the metrics to a file, as JSON if its extension is ``.json`` and in the Prometheus text
+        format otherwise.
+
+        Parameters
+        ----------
+        filename: str
+        """
+        with open(filename, 'w') as metrics_file:
+            if os.path.splitext(filename)[1] == '.json':
+                json.dump(self.as_dict(), metrics_file, indent=2)
+            else:
+                metrics_file.write(self.to_prometheus())
+
+    def summary(self):
+        """Format the metrics as a table, slowest commands first.
+
+        Returns
+        -------
+        table: str
+        """
+        lines = ['{:<25} {:<28} {:<12} {:>6} {:>10} {:>10} {:>10}'.format(
+            'Component', 'Command', 'Phase', 'Count', 'Mean [s]', 'p95 [s]', 'Max [s]')]
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: -item[1].sum)
+            commands = dict(self._commands)
+            sequences = sorted(self._sequences.items())
+            run_time_errors = dict((name, error.as_dict()) for name, error in self._run_time_errors.items())
+        for (component, command, phase), histogram in histograms:
+            lines.append('{:<25} {:<28} {:<12} {:>6} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                component, command, phase, histogram.count, histogram.mean, histogram.quantile(0.95),
+                histogram.max))
+        failed = [(key, count) for key, count in sorted(commands.items()) if key[2] == 'failed']
+        for (component, command, _), count in failed:
+            lines.append('{} {} failed {} times.'.format(component, command, count))
+        for (name, outcome), count in sequences:
+            error = run_time_errors.get(name) if outcome == 'succeeded' else None
+            if error is not None:
+                lines.append('{} {} {} times, run time error {:+.2f} s on average.'.format(
+                    name, outcome, count, error['mean']))
+            else:
+                lines.append('{} {} {} times.'.format(name, outcome, count))
+        return '\n'.join(lines)
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """Return the process-wide `Metrics`.
+
+    Returns
+    -------
+    metrics: Metrics
+    """
+    return _metrics
@@ -0,0 +1,168 @@
+import asyncio
+import collections
+import time
+
+from .component import get_executor
+
+__all__ = ['ComponentStatus', 'PreflightError', 'SUMMARY_STATES', 'check_component', 'check_components',
+           'format_preflight']
+
+# Values of the summaryState event of the components.
+DISABLED, ENABLED, FAULT, OFFLINE, STANDBY = 1, 2, 3, 4, 5
+SUMMARY_STATES = {DISABLED: 'DISABLED', ENABLED: 'ENABLED', FAULT: 'FAULT', OFFLINE: 'OFFLINE',
+                  STANDBY: 'STANDBY'}
+
+# Command bringing a component from a state to the next one on the way to ENABLED, and that state.
+BRING_UP = {STANDBY: ('start', DISABLED), DISABLED: ('enable', ENABLED)}
+
+ComponentStatus = collections.namedtuple('ComponentStatus', ['component', 'device_id', 'state', 'ready',
+                                                             'error', 'elapsed'])
+
+
+class PreflightError(IOError):
+    """Raised when components of a sequence are not ready to run it.
+
+    Parameters
+    ----------
+    report: list of ComponentStatus
+        Status of every component checked.
+    """
+
+    def __init__(self, report):
+        self.report = report
+        not_ready = ['{} ({})'.format(status.component, status.error)
+                     for status in report if not status.ready]
+        super().__init__('Components not ready: {}.'.format(', '.join(not_ready)))
+
+
+def _state_name(state):
+    return SUMMARY_STATES.get(state, 'UNKNOWN' if state is None else str(state))
+
+
+async def _read_state(topic, timeout, fresh=False):
+    sample = await topic.wait_for_async(lambda last: True, timeout, fresh=fresh)
+    return sample.summaryState
+
+
+async def _in_executor(func, *args):
+    # Creating DDS senders and subscribers blocks, so it is kept off the event loop.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
+
+
+async def check_component(pool, component, device_id=None, timeout=2., bring_up=False, command_timeout=30.,
+                          settings=None, require_state=False):
+    """Check that a component is ENABLED, optionally bringing it up.
+
+    SAL only publishes summaryState when it changes, so a new subscriber may not see it at all. A
+    component whose summary state is not seen within ``timeout`` has an unknown state, and is only
+    reported as not ready if ``require_state`` is set.
+
+    Parameters
+    ----------
+    pool: DDSPool
+    component: str
+        Name of the component.
+    device_id: int, optional
+    timeout: float
+        Time to wait for the summary state of the component, in seconds.
+    bring_up: bool
+        Send ``start`` and/or ``enable`` to a component in STANDBY or DISABLED.
+    command_timeout: float
+        Timeout of the commands bringing the component up, in seconds.
+    settings: str, optional
+        ``settingsToApply`` of the ``start`` command.
+    require_state: bool
+        Report a component whose summary state is unknown as not ready.
+
+    Returns
+    -------
+    status: ComponentStatus
+    """
+    start = time.monotonic()
+    state = None
+    try:
+        event_cache = await _in_executor(pool.get_event_cache, component, device_id)
+        topic = event_cache.summaryState
+        try:
+            state = await _read_state(topic, timeout)
+        except TimeoutError:
+            if require_state:
+                raise IOError('no summaryState in {} s'.format(timeout))
+            return ComponentStatus(component, device_id, None, True, None, time.monotonic() - start)
+
+        while bring_up and state in BRING_UP:
+            cmd, target = BRING_UP[state]
+            kwargs = {'settingsToApply': settings} if cmd == 'start' and settings is not None else {}
+            remote = await _in_executor(pool.get_remote, component, device_id)
+            await remote.run_command_async(cmd, command_timeout, check=True, **kwargs)
+            try:
+                state = (await topic.wait_value_async('summaryState', target, timeout)).summaryState
+            except TimeoutError:
+                raise IOError('still {} after {}'.format(_state_name(state), cmd))
+
+        if state != ENABLED:
+            raise IOError(_state_name(state))
+    except Exception as e:
+        error = str(e) if isinstance(e, IOError) else repr(e)
+        return ComponentStatus(component, device_id, state, False, error, time.monotonic() - start)
+    return ComponentStatus(component, device_id, state, True, None, time.monotonic() - start)
+
+
+async def check_components(pool, components, timeout=2., bring_up=False, command_timeout=30., settings=None,
+                           require_state=False):
+    """Check that components are ENABLED, all at the same time.
+
+    Parameters
+    ----------
+    pool: DDSPool
+    components: list of tuple
+        The (component, device_id) to check, e.g. a `BaseSequence.component_list`.
+    timeout: float
+        Time to wait for the summary state of each component, in seconds.
+    bring_up: bool
+        Bring the components in STANDBY or DISABLED up to ENABLED.
+    command_timeout: float
+        Timeout of the commands bringing the components up, in seconds.
+    settings: str, optional
+        ``settingsToApply`` of the ``start`` commands.
+    require_state: bool
+        Report the components whose summary state is unknown as not ready.
+
+    Returns
+    -------
+    report: list of ComponentStatus
+        Status of every component.
+
+    Raises
+    ------
+    PreflightError
+        If a component is not ENABLED.
+    """
+    report = await asyncio.gather(*[check_component(pool, component, device_id, timeout, bring_up,
+                                                    command_timeout, settings, require_state)
+                                    for component, device_id in components])
+    if not all(status.ready for status in report):
+        raise PreflightError(list(report))
+    return list(report)
+
+
+def format_preflight(report):
+    """Format a preflight report as a table.
+
+    Parameters
+    ----------
+    report: list of ComponentStatus
+
+    Returns
+    -------
+    table: str
+    """
+    lines = ['{:<30} {:<10} {:<6} {:>9}  {}'.format('Component', 'State', 'Ready', 'Time [s]', 'Error')]
+    for status in report:
+        name = (status.component if status.device_id is None
+                else '{}:{}'.format(status.component, status.device_id))
+        lines.append('{:<30} {:<10} {:<6} {:>9.3f}  {}'.format(
+            name, _state_name(status.state), 'yes' if status.ready else 'no', status.elapsed,
+            status.error if status.error is not None else ''))
+    return '\n'.join(lines)
@@ -0,0 +1,193 @@
+import collections
+import importlib
+import logging
+import threading
+
+__all__ = ['ENTRY_POINT_GROUP', 'SequenceRegistry', 'get_registry', 'register_sequence']
+
+# Sequences shipped with this package. Each entry maps the sequence name to "module:ClassName" and a short
+# description, so sequences can be listed without importing their modules.
+BUILTIN_SEQUENCES = [
+    ('WavelengthCalibrationSequence',
+     'lsst.ts.sequence.atcs.at_calibration_illumination_system:WavelengthCalibrationSequence',
+     'Measure the throughput of the calibration illumination system at a given wavelength.'),
+    ('ATTakeImage',
+     'lsst.ts.sequence.atcs.at_camera_take_image:ATTakeImage',
+     'Take a series of images with the AT Camera.'),
+    ('ATRaiseException',
+     'lsst.ts.sequence.atcs.at_raise_exception:ATRaiseException',
+     'Test script that just raises an exception.'),
+]
+
+# Entry point group of the sequences installed by other packages, e.g. in their setup.py:
+#     entry_points={'lsst.ts.sequence': ['MySequence = my_package.my_module:MySequence']}
+ENTRY_POINT_GROUP = 'lsst.ts.sequence'
+
+SequenceEntry = collections.namedtuple('SequenceEntry', ['name', 'target', 'description'])
+
+
+def _entry_points(group):
+    """Return the name and "module:ClassName" target of the entry points of a group, without loading them.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return []
+        return [(entry_point.name, '{}:{}'.format(entry_point.module_name, '.'.join(entry_point.attrs)))
+                for entry_point in pkg_resources.iter_entry_points(group)]
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        entry_points = entry_points.select(group=group)
+    else:
+        entry_points = entry_points.get(group, [])
+    return [(entry_point.name, entry_point.value.split('[')[0].strip()) for entry_point in entry_points]
+
+
+class SequenceRegistry:
+    """Registry of available sequences.
+
+    Sequences are registered by name with the import path of their class, which is only imported when the
+    sequence is resolved. The sequences installed by other packages under the ``group`` entry point group
+    are added the first time the registry is listed or asked for a name it does not have, so scanning the
+    installed packages is skipped when only registered sequences are used. Registered sequences take
+    precedence over the installed ones of the same name.
+
+    Parameters
+    ----------
+    group: str, optional
+        Entry point group of the installed sequences, None to only use the registered ones.
+    """
+
+    def __init__(self, group=None):
+        self.log = logging.getLogger(type(self).__name__)
+        self.group = group
+        self._entries = collections.OrderedDict()
+        self._classes = {}
+        self._lock = threading.Lock()
+        self._discovered = group is None
+
+    def _discover(self):
+        if self._discovered:
+            return
+        try:
+            entry_points = _entry_points(self.group)
+        except Exception:
+            self.log.exception('Failed to list the sequences of entry point group %s.', self.group)
+            entry_points = []
+        with self._lock:
+            if self._discovered:
+                return
+            for name, target in entry_points:
+                if ':' not in target:
+                    self.log.warning('Ignoring entry point %s = %s, not of the form "module:ClassName".',
+                                     name, target)
+                elif name not in self._entries:
+                    self._entries[name] = SequenceEntry(name, target, 'Installed from {}.'.format(
+                        target.split(':')[0]))
+            self._discovered = True
+
+    def register(self, name, target, description=''):
+        """Register a sequence.
+
+        Parameters
+        ----------
+        name: str
+            Name of the sequence, as given to ``run_sequence.py --script``.
+        target: str or type
+            Either "package.module:ClassName" or the sequence class itself.
+        description: str, optional
+            One line description, shown when listing sequences.
+        """
+        with self._lock:
+            if isinstance(target, str):
+                if ':' not in target:
+                    raise ValueError('Sequence target must be of the form "module:ClassName", got '
+                                     '{}.'.format(target))
+                self._classes.pop(name, None)
+            else:
+                self._classes[name] = target
+                target = '{}:{}'.format(target.__module__, target.__name__)
+            self._entries[name] = SequenceEntry(name, target, description)
+
+    def __contains__(self, name):
+        if name not in self._entries:
+            self._discover()
+        return name in self._entries
+
+    def __iter__(self):
+        self._discover()
+        return iter(list(self._entries.values()))
+
+    def names(self):
+        """Return the names of the registered sequences.
+
+        Returns
+        -------
+        names: list of str
+        """
+        self._discover()
+        return list(self._entries.keys())
+
+    def resolve(self, name):
+        """Import and return the class of a registered sequence.
+
+        Parameters
+        ----------
+        name: str
+            Name of the sequence.
+
+        Returns
+        -------
+        sequence_class: type
+        """
+        if name not in self:
+            raise IOError('{} is not a valid sequence.'.format(name))
+
+        with self._lock:
+            if name not in self._classes:
+                module_name, class_name = self._entries[name].target.split(':')
+                module = importlib.import_module(module_name)
+                self._classes[name] = getattr(module, class_name)
+            return self._classes[name]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide `SequenceRegistry`, populated with the built-in sequences and, lazily, the
+    ones installed under `ENTRY_POINT_GROUP`.
+
+    Returns
+    -------
+    registry: SequenceRegistry
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SequenceRegistry(ENTRY_POINT_GROUP)
+            for name, target, description in BUILTIN_SEQUENCES:
+                _registry.register(name, target, description)
+        return _registry
+
+
+def register_sequence(name, target, description=''):
+    """Register a sequence with the process-wide registry.
+
+    Registering the import path instead of the class keeps the sequence module from being imported
+    until the sequence is actually used.
+
+    Parameters
+    ----------
+    name: str
+        Name of the sequence.
+    target: str or type
+        Either "package.module:ClassName" or the sequence class itself.
+    description: str, optional
+        One line description, shown when listing sequences.
+    """
+    get_registry().register(name, target, description)
@@ -0,0 +1,154 @@
+import asyncio
+import collections
+import functools
+import json
+import logging
+
+from .component import INTERMEDIATE_ACKS, get_executor
+from .config import validate_config
+from .deadline import CHECK_INTERVAL
+from .registry import get_registry
+
+__all__ = ['QueueEntry', 'load_queue', 'create_sequences', 'submit_requests']
+
+QueueEntry = collections.namedtuple('QueueEntry', ['script', 'config'])
+
+
+def load_queue(filename):
+    """Read a queue of sequences from a JSON file.
+
+    The file contains a list of objects with the name of the sequence (``script``) and, optionally, its
+    configuration (``config``), e.g.::
+
+        [{"script": "ATTakeImage", "config": {"numImages": 10, "expTime": 0.}},
+         {"script": "WavelengthCalibrationSequence"}]
+
+    Parameters
+    ----------
+    filename: str
+
+    Returns
+    -------
+    queue: list of QueueEntry
+    """
+    with open(filename) as queue_file:
+        entries = json.load(queue_file)
+
+    queue = []
+    for i, entry in enumerate(entries):
+        if 'script' not in entry:
+            raise IOError('Entry {} of {} has no script.'.format(i, filename))
+        queue.append(QueueEntry(entry['script'], entry.get('config', {})))
+    return queue
+
+
+def create_sequences(queue, registry=None, **kwargs):
+    """Create and configure the sequences of a queue.
+
+    Parameters
+    ----------
+    queue: list of QueueEntry
+    registry: SequenceRegistry, optional
+        Registry used to find the sequences, by default the process-wide one.
+    kwargs
+        Passed to the constructor of each sequence (e.g. ``pool``).
+
+    Returns
+    -------
+    sequences: list of BaseSequence
+    """
+    registry = registry if registry is not None else get_registry()
+
+    for entry in queue:
+        if entry.script not in registry:
+            raise IOError('{} is not a valid sequence.'.format(entry.script))
+        validate_config(entry.config, registry.resolve(entry.script).config_schema, entry.script)
+
+    sequences = []
+    for entry in queue:
+        sequence = registry.resolve(entry.script)(**kwargs)
+        sequence.configure(**entry.config)
+        sequences.append(sequence)
+    return sequences
+
+
+async def submit_requests(sequences, interval=CHECK_INTERVAL):
+    """Request the OCS to run a list of sequences.
+
+    All requests are sent first, in order, and the OCS responses are then collected together, so the
+    submission does not wait for each request before sending the next one. A single coroutine polls the
+    acks of all the requests, so however long the queue, collecting them takes one thread of the shared
+    executor.
+
+    Parameters
+    ----------
+    sequences: list of BaseSequence
+    interval: float
+        Time between polls of the acks, in seconds.
+
+    Returns
+    -------
+    results: list
+        For each sequence, the last ack received from the OCS or the exception raised while requesting it.
+    """
+    log = logging.getLogger('submit_requests')
+    loop = asyncio.get_running_loop()
+
+    results = []
+    pending = []
+    for sequence in sequences:
+        try:
+            payload, timeout = sequence.request_payload()
+            log.info('Requesting %s', sequence.name)
+            log.debug('payload: %s', payload)
+            cmd_id = await sequence.sender.send_command_async('target', json_parameters=payload)
+        except Exception as e:
+            log.exception('Failed to request %s.', sequence.name)
+            results.append(e)
+            continue
+        future = loop.create_future()
+        pending.append((sequence.sender, cmd_id, loop.time() + timeout, future))
+        results.append(future)
+
+    if len(pending) > 0:
+        await _collect_acks(pending, interval)
+    results = [(result.exception() or result.result()) if isinstance(result, asyncio.Future) else result
+               for result in results]
+    for sequence, result in zip(sequences, results):
+        log.info('%s: %s', sequence.name, result)
+    return results
+
+
+async def _collect_acks(pending, interval):
+    """Resolve the future of each request with its last ack once it completes or times out.
+
+    Parameters
+    ----------
+    pending: list of tuple
+        The (sender, cmd_id, time the request times out, future) of each request, oldest first.
+    interval: float
+        Time between polls, in seconds.
+    """
+    loop = asyncio.get_running_loop()
+    pending = list(pending)
+    try:
+        while len(pending) > 0:
+            # Waiting on the oldest request also reads the acks of the others sent to the OCS.
+            sender, cmd_id, expires_at, _ = pending[0]
+            timeout = max(min(interval, expires_at - loop.time()), 0.)
+            await loop.run_in_executor(get_executor(), functools.partial(sender.sender.waitForCompletion,
+                                                                         cmdid=cmd_id, timeout=timeout))
+            now = loop.time()
+            for request in list(pending):
+                sender, cmd_id, expires_at, future = request
+                ack = sender.last_ack(cmd_id)
+                if (ack is not None and ack[0] not in INTERMEDIATE_ACKS) or now >= expires_at:
+                    pending.remove(request)
+                    # Record the final ack of the request, which is already in.
+                    future.set_result(await sender.wait_completion_async(cmd_id, 0.))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        for _, _, _, future in pending:
+            if not future.done():
+                future.set_exception(e)
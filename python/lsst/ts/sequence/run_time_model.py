@@ -0,0 +1,184 @@
+import collections
+import json
+import logging
+import math
+import os
+import threading
+
+__all__ = ['RunTimeModel', 'get_run_time_model']
+
+
+def config_key(config):
+    """Return a string uniquely identifying a sequence configuration.
+
+    Parameters
+    ----------
+    config: dict
+
+    Returns
+    -------
+    key: str
+    """
+    return json.dumps(config, sort_keys=True, default=str)
+
+
+class _RunningStats:
+    """Running mean and variance (Welford's algorithm)."""
+
+    __slots__ = ('n', 'mean', 'm2')
+
+    def __init__(self, n=0, mean=0., m2=0.):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.
+
+    def to_dict(self):
+        return {'n': self.n, 'mean': self.mean, 'm2': self.m2}
+
+
+class RunTimeModel:
+    """Persistent model of sequence run times, learned from measured durations.
+
+    For each sequence, the model keeps running statistics of the measured duration for every configuration
+    it has seen, and of the ratio between measured durations and the nominal (hand-computed) estimate of the
+    sequence. Known configurations are estimated from their own history; new ones from the nominal estimate
+    scaled by the learned ratio.
+
+    Parameters
+    ----------
+    filename: str, optional
+        File where the model is stored. By default ``~/.sequence/run_time.json``.
+    max_configs: int
+        Maximum number of configurations remembered per sequence. The oldest ones are dropped first.
+    """
+
+    def __init__(self, filename=None, max_configs=1000):
+        self.log = logging.getLogger(type(self).__name__)
+        self.filename = filename if filename is not None else os.path.expanduser('~/.sequence/run_time.json')
+        self.max_configs = max_configs
+        self._lock = threading.Lock()
+        self._sequences = None
+
+    def _load(self):
+        if self._sequences is not None:
+            return
+        self._sequences = {}
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename) as model_file:
+                data = json.load(model_file, object_pairs_hook=collections.OrderedDict)
+        except (IOError, ValueError):
+            self.log.warning('Could not read run time model from %s, starting a new one.', self.filename)
+            return
+        for name, sequence in data.items():
+            self._sequences[name] = {
+                'ratio': _RunningStats(**sequence['ratio']),
+                'configs': collections.OrderedDict((key, _RunningStats(**stats))
+                                                   for key, stats in sequence['configs'].items())}
+
+    def _get(self, name):
+        if name not in self._sequences:
+            self._sequences[name] = {'ratio': _RunningStats(), 'configs': collections.OrderedDict()}
+        return self._sequences[name]
+
+    def estimate(self, name, config, nominal=-1.):
+        """Estimate the run time of a sequence.
+
+        Parameters
+        ----------
+        name: str
+            Name of the sequence.
+        config: dict
+            Sequence configuration.
+        nominal: float
+            Nominal estimate of the run time, negative if unknown.
+
+        Returns
+        -------
+        run_time: float
+            Estimated run time in seconds, or ``nominal`` if the model has no information.
+        """
+        with self._lock:
+            self._load()
+            sequence = self._sequences.get(name)
+            if sequence is None:
+                return nominal
+            stats = sequence['configs'].get(config_key(config))
+            if stats is not None and stats.n > 0:
+                return stats.mean
+            if nominal > 0. and sequence['ratio'].n > 0:
+                return nominal * sequence['ratio'].mean
+            return nominal
+
+    def update(self, name, config, duration, nominal=-1.):
+        """Add a measured duration to the model.
+
+        Parameters
+        ----------
+        name: str
+            Name of the sequence.
+        config: dict
+            Sequence configuration.
+        duration: float
+            Measured run time in seconds.
+        nominal: float
+            Nominal estimate of the run time for this configuration, negative if unknown.
+        """
+        with self._lock:
+            self._load()
+            sequence = self._get(name)
+            key = config_key(config)
+            if key not in sequence['configs']:
+                sequence['configs'][key] = _RunningStats()
+                while len(sequence['configs']) > self.max_configs:
+                    sequence['configs'].popitem(last=False)
+            sequence['configs'][key].add(duration)
+            if nominal > 0.:
+                sequence['ratio'].add(duration / nominal)
+
+    def save(self):
+        """Write the model to its file.
+        """
+        with self._lock:
+            if self._sequences is None:
+                return
+            data = {name: {'ratio': sequence['ratio'].to_dict(),
+                           'configs': collections.OrderedDict((key, stats.to_dict())
+                                                              for key, stats in sequence['configs'].items())}
+                    for name, sequence in self._sequences.items()}
+            path = os.path.dirname(self.filename)
+            if path and not os.path.exists(path):
+                os.makedirs(path)
+            tmp_filename = self.filename + '.tmp'
+            with open(tmp_filename, 'w') as model_file:
+                json.dump(data, model_file)
+            os.replace(tmp_filename, self.filename)
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_run_time_model():
+    """Return the process-wide `RunTimeModel`.
+
+    Returns
+    -------
+    model: RunTimeModel
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = RunTimeModel()
+        return _model
@@ -0,0 +1,97 @@
+import json
+import logging
+
+from .request_queue import create_sequences
+from .scheduler import SequenceScheduler
+
+__all__ = ['run_queue', 'format_report', 'write_report']
+
+
+async def run_queue(queue, registry=None, **kwargs):
+    """Run a queue of sequences, executing sequences that use disjoint components concurrently.
+
+    The component footprint of each sequence is taken from its `BaseSequence.components`, including the
+    components of its sub-sequences; sequences sharing a component run one at a time, in queue order. A
+    failing sequence does not stop the others.
+
+    Parameters
+    ----------
+    queue: list of QueueEntry
+        Sequences to run with their configuration (see `load_queue`).
+    registry: SequenceRegistry, optional
+        Registry used to find the sequences, by default the process-wide one.
+    kwargs
+        Passed to the constructor of each sequence (e.g. ``pool``).
+
+    Returns
+    -------
+    report: list of dict
+        For each sequence, in queue order: its name, script, components, status ("done", "failed" or
+        "cancelled"), start and end times, estimated run time (None if it could not be estimated) and error
+        message, if any.
+    """
+    log = logging.getLogger('run_queue')
+
+    sequences = create_sequences(queue, registry, **kwargs)
+    scheduler = SequenceScheduler(fail_fast=False)
+    estimates = {}
+    for i, sequence in enumerate(sequences):
+        name = '{}:{}'.format(i, sequence.name)
+        # The estimate is only reported, so a sequence failing to estimate its run time still runs.
+        try:
+            estimates[name] = sequence.run_time()
+        except Exception:
+            log.exception('Failed to estimate the run time of %s.', name)
+            estimates[name] = None
+        scheduler.add(sequence, name=name)
+
+    log.info('Running %i sequences.', len(sequences))
+    results = await scheduler.run()
+
+    report = []
+    for sequence, result in zip(sequences, results):
+        report.append({'name': result.name,
+                       'script': sequence._name,
+                       'components': [component for component, _ in sequence.components()],
+                       'status': result.status,
+                       'start': result.start,
+                       'end': result.end,
+                       'run_time': estimates[result.name],
+                       'error': None if result.error is None else repr(result.error)})
+    return report
+
+
+def format_report(report):
+    """Format a `run_queue` report as a table.
+
+    Parameters
+    ----------
+    report: list of dict
+
+    Returns
+    -------
+    table: str
+    """
+    if len(report) == 0:
+        return 'No sequences were run.'
+    t0 = min(entry['start'] for entry in report)
+    lines = ['{:<40} {:<10} {:>9} {:>9} {:>9}  {}'.format('Sequence', 'Status', 'Start', 'Duration',
+                                                          'Estimate', 'Error')]
+    for entry in report:
+        estimate = '{:.2f}'.format(entry['run_time']) if entry['run_time'] is not None else '-'
+        lines.append('{:<40} {:<10} {:>9.2f} {:>9.2f} {:>9}  {}'.format(
+            entry['name'], entry['status'], entry['start'] - t0, entry['end'] - entry['start'],
+            estimate, entry['error'] if entry['error'] is not None else ''))
+    return '\n'.join(lines)
+
+
+def write_report(report, filename):
+    """Write a `run_queue` report as JSON.
+
+    Parameters
+    ----------
+    report: list of dict
+    filename: str
+    """
+    with open(filename, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
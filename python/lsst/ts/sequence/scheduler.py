@@ -0,0 +1,193 @@
+import asyncio
+import collections
+import logging
+import time
+
+__all__ = ['ComponentLocks', 'SequenceScheduler', 'SequenceResult']
+
+SequenceResult = collections.namedtuple('SequenceResult', ['name', 'status', 'start', 'end', 'error'])
+SequenceResult.__doc__ = """Outcome of a sequence run by the `SequenceScheduler`.
+
+status is one of "done", "failed", "skipped" (a dependency did not complete) or "cancelled".
+"""
+
+
+class _ComponentLocksContext:
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    async def __aenter__(self):
+        acquired = []
+        try:
+            for lock in self.locks:
+                await lock.acquire()
+                acquired.append(lock)
+        except BaseException:
+            for lock in reversed(acquired):
+                lock.release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+class ComponentLocks:
+    """Per-component asyncio locks used to serialize sequences sharing components.
+    """
+
+    def __init__(self):
+        self._locks = {}
+
+    def acquire(self, component_list):
+        """Return an async context manager holding the locks of all the given components.
+
+        Locks are always acquired in sorted order, so two sequences sharing more than one component cannot
+        deadlock.
+
+        Parameters
+        ----------
+        component_list: list of (str, int)
+            The (component, device_id) pairs to lock.
+        """
+        keys = sorted(set((name, device_id) for name, device_id in component_list),
+                      key=lambda key: (key[0], -1 if key[1] is None else key[1]))
+        return _ComponentLocksContext([self._locks.setdefault(key, asyncio.Lock()) for key in keys])
+
+
+class SequenceScheduler:
+    """Run a graph of sequences, in parallel where dependencies and components allow.
+
+    Each sequence starts as soon as all the sequences it depends on are done. Sequences using a common
+    component, directly or through their sub-sequences, are serialized by a per-component lock.
+
+    Parameters
+    ----------
+    fail_fast: bool
+        If True, cancel everything still running as soon as one sequence fails. Otherwise, only the
+        sequences depending on the failed one are skipped.
+    locks: ComponentLocks, optional
+        Locks to use, so several schedulers can share them.
+    deadline: Deadline, optional
+        Deadline of the sequences, e.g. of the sequence running them as sub-sequences. Each sequence gets
+        its own time budget, within what remains of this deadline when it starts, or all that remains of
+        it if its run time is unknown.
+    """
+
+    def __init__(self, fail_fast=True, locks=None, deadline=None):
+        self.log = logging.getLogger(type(self).__name__)
+        self.fail_fast = fail_fast
+        self.locks = locks if locks is not None else ComponentLocks()
+        self.deadline = deadline
+        self._sequences = collections.OrderedDict()
+        self._dependencies = {}
+
+    def add(self, sequence, depends_on=(), name=None):
+        """Add a sequence to the graph.
+
+        Parameters
+        ----------
+        sequence: BaseSequence
+            The sequence to run.
+        depends_on: iterable of str
+            Names of the sequences that must complete before this one starts.
+        name: str, optional
+            Name of the sequence in the graph, by default ``sequence.name``.
+        """
+        name = sequence.name if name is None else name
+        if name in self._sequences:
+            raise ValueError('A sequence named {} was already added.'.format(name))
+        self._sequences[name] = sequence
+        self._dependencies[name] = list(depends_on)
+
+    def check(self):
+        """Check that all dependencies exist and that the graph has no cycles.
+
+        Raises
+        ------
+        ValueError
+        """
+        for name, dependencies in self._dependencies.items():
+            for dependency in dependencies:
+                if dependency not in self._sequences:
+                    raise ValueError('{} depends on unknown sequence {}.'.format(name, dependency))
+
+        # Kahn's algorithm; anything left over is part of a cycle.
+        n_pending = {name: len(set(deps)) for name, deps in self._dependencies.items()}
+        dependents = collections.defaultdict(set)
+        for name, dependencies in self._dependencies.items():
+            for dependency in dependencies:
+                dependents[dependency].add(name)
+        ready = [name for name, count in n_pending.items() if count == 0]
+        while ready:
+            name = ready.pop()
+            for dependent in dependents[name]:
+                n_pending[dependent] -= 1
+                if n_pending[dependent] == 0:
+                    ready.append(dependent)
+            del n_pending[name]
+        if n_pending:
+            raise ValueError('Sequence dependencies have a cycle involving {}.'.format(sorted(n_pending)))
+
+    async def run(self):
+        """Run all the sequences.
+
+        Returns
+        -------
+        results: list of SequenceResult
+            One result per sequence, in the order they were added.
+        """
+        self.check()
+
+        tasks = collections.OrderedDict()
+        for name in self._sequences:
+            tasks[name] = asyncio.ensure_future(self._run_one(name, tasks))
+
+        try:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        now = time.time()
+        return [SequenceResult(name, 'cancelled', now, now, None) if task.cancelled() else task.result()
+                for name, task in tasks.items()]
+
+    def _deadline_of(self, sequence):
+        if self.deadline is None:
+            return None
+        try:
+            budget = sequence.time_budget()
+        except Exception:
+            self.log.exception('Could not estimate time budget of %s.', sequence.name)
+            budget = None
+        return self.deadline.child(budget)
+
+    async def _run_one(self, name, tasks):
+        sequence = self._sequences[name]
+        start = time.time()
+        try:
+            for dependency in self._dependencies[name]:
+                result = await asyncio.shield(tasks[dependency])
+                if result.status != 'done':
+                    self.log.warning('Skipping %s: %s did not complete.', name, dependency)
+                    return SequenceResult(name, 'skipped', start, time.time(), result.error)
+
+            # A sequence made of sub-sequences also drives their components.
+            async with self.locks.acquire(sequence.components()):
+                self.log.debug('Starting %s...', name)
+                start = time.time()
+                await sequence.run_async(deadline=self._deadline_of(sequence))
+        except asyncio.CancelledError:
+            return SequenceResult(name, 'cancelled', start, time.time(), None)
+        except Exception as e:
+            self.log.exception('%s failed.', name)
+            if self.fail_fast:
+                for other, task in tasks.items():
+                    if other != name:
+                        task.cancel()
+            return SequenceResult(name, 'failed', start, time.time(), e)
+
+        self.log.debug('%s done.', name)
+        return SequenceResult(name, 'done', start, time.time(), None)
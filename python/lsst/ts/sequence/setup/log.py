@@ -1,9 +1,17 @@
+import atexit
+import copy
+import gzip
+import json
 import logging
 import logging.handlers
 import os
+import queue
+import shutil
+import threading
 import time
 
-__all__ = ["EXTENSIVE", "TRACE", "WORDY", "configure_logging", "generate_logfile", "set_log_levels"]
+__all__ = ["EXTENSIVE", "TRACE", "WORDY", "JSONFormatter", "BatchedQueueListener", "configure_logging",
+           "generate_logfile", "set_log_levels"]
 
 # Extra INFO levels
 WORDY = 15
@@ -25,17 +33,178 @@ MIN_FILE = 3
 MAX_FILE = 5
 
 
-def generate_logfile(basename="sequence"):
+def generate_logfile(basename="sequence", keep=None):
     """Generate a log file name based on current time.
+
+    Parameters
+    ----------
+    basename : str
+        Base name of the log file and of the log directory.
+    keep : int, optional
+        If given, remove the oldest log files so that at most this many remain, including the new one.
     """
     timestr = time.strftime("%Y-%m-%d_%H:%M:%S")
     log_path = os.path.expanduser('~/.{}/log'.format(basename))
     if not os.path.exists(log_path):
         os.makedirs(log_path)
     logfilename = os.path.join(log_path, "%s.%s.log" % (basename, timestr))
+
+    if keep is not None:
+        # Time stamped names sort chronologically; rotated and compressed files share the same prefix.
+        prefix = "%s." % basename
+        old_files = sorted(f for f in os.listdir(log_path) if f.startswith(prefix))
+        runs = sorted(set(f[:len(prefix)+len(timestr)] for f in old_files))
+        for run in runs[:max(len(runs) - max(keep - 1, 0), 0)]:
+            for f in old_files:
+                if f.startswith(run):
+                    os.remove(os.path.join(log_path, f))
+
     return logfilename
 
 
+class JSONFormatter(logging.Formatter):
+    """Format log records as one JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {"time": record.created,
+                 "level": record.levelname,
+                 "name": record.name,
+                 "thread": record.threadName,
+                 "message": record.getMessage()}
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _BatchFlushMixin:
+    """Only flush the stream when the listener is done writing a batch of records."""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class _BatchedFileHandler(_BatchFlushMixin, logging.FileHandler):
+    pass
+
+
+class _BatchedRotatingFileHandler(_BatchFlushMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class _BatchedTimedRotatingFileHandler(_BatchFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+class _BatchedStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class BatchedQueueListener:
+    """Write queued log records from a background thread, in batches.
+
+    The listener takes all the records available in the queue (up to ``batch_size``), hands them to its
+    handlers and then flushes the handlers once per batch.
+
+    Parameters
+    ----------
+    log_queue : queue.Queue
+        Queue filled by a `logging.handlers.QueueHandler`.
+    handlers : list of logging.Handler
+        Handlers that write the records.
+    batch_size : int
+        Maximum number of records written between flushes.
+    """
+
+    _sentinel = None
+
+    def __init__(self, log_queue, handlers, batch_size=1000):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._monitor, name="log-listener", daemon=True)
+        self._thread.start()
+
+    def _handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _monitor(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not self._sentinel and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is not self._sentinel:
+                    self._handle(record)
+            for handler in self.handlers:
+                getattr(handler, "flush_batch", handler.flush)()
+            if batch[-1] is self._sentinel:
+                return
+
+    def stop(self):
+        """Write the remaining records and stop the listener thread.
+        """
+        if self._thread is not None:
+            self.queue.put_nowait(self._sentinel)
+            self._thread.join()
+            self._thread = None
+        for handler in self.handlers:
+            handler.close()
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records for a listener of the same process.
+
+    `logging.handlers.QueueHandler` formats the exception into the message so records can be pickled,
+    which would leave no exception for `JSONFormatter`. Only the message arguments are merged here.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _create_file_handler(options, logfilename, queued):
+    max_bytes = getattr(options, "log_max_bytes", 0)
+    when = getattr(options, "log_rotate_when", None)
+    backup_count = getattr(options, "log_backup_count", 0)
+
+    if max_bytes:
+        handler_class = _BatchedRotatingFileHandler if queued else logging.handlers.RotatingFileHandler
+        handler = handler_class(logfilename, maxBytes=max_bytes, backupCount=backup_count)
+    elif when is not None:
+        handler_class = (_BatchedTimedRotatingFileHandler if queued
+                         else logging.handlers.TimedRotatingFileHandler)
+        handler = handler_class(logfilename, when=when, backupCount=backup_count)
+    else:
+        handler = (_BatchedFileHandler if queued else logging.FileHandler)(logfilename)
+
+    if getattr(options, "log_compress", False) and (max_bytes or when is not None):
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = _gzip_rotator
+
+    return handler
+
+
 def configure_logging(options, logfilename=None):
     """Configure the logging for the system.
 
@@ -45,8 +214,26 @@ def configure_logging(options, logfilename=None):
         The options returned by the ArgumentParser instance.argparse.
     logfilename : str
         A name, including path, for a log file.
-    log_port : int, optional
-        An alternate port for the socket logger.
+
+    The following optional attributes of ``options`` control the file logging:
+
+    log_queue : bool
+        Only enqueue records on the calling thread and write them from a background thread, in batches.
+    log_max_bytes : int
+        Rotate the log file when it reaches this size.
+    log_rotate_when : str
+        Rotate the log file at this interval (see `logging.handlers.TimedRotatingFileHandler`).
+    log_backup_count : int
+        Number of rotated log files to keep.
+    log_compress : bool
+        Compress rotated log files with gzip.
+    log_json : bool
+        Write the log file as JSON lines.
+
+    Returns
+    -------
+    BatchedQueueListener or None
+        The listener writing the records, if ``log_queue`` is set. It is stopped at exit.
     """
     console_detail, file_detail = set_log_levels(options.verbose)
     console_detail = max(console_detail, 1)
@@ -67,15 +254,30 @@ def configure_logging(options, logfilename=None):
     logging.addLevelName(EXTENSIVE, 'EXTENSIVE')
     logging.addLevelName(TRACE, 'TRACE')
 
-    ch = logging.StreamHandler()
+    queued = getattr(options, "log_queue", False)
+
+    ch = _BatchedStreamHandler() if queued else logging.StreamHandler()
     ch.setLevel(DETAIL_LEVEL[console_detail])
     ch.setFormatter(logging.Formatter(console_format))
-    logging.getLogger().addHandler(ch)
 
-    log_file = logging.FileHandler(logfilename)
-    log_file.setFormatter(logging.Formatter(log_format))
+    log_file = _create_file_handler(options, logfilename, queued)
+    if getattr(options, "log_json", False):
+        log_file.setFormatter(JSONFormatter())
+    else:
+        log_file.setFormatter(logging.Formatter(log_format))
     log_file.setLevel(DETAIL_LEVEL[file_detail])
-    logging.getLogger().addHandler(log_file)
+
+    if not queued:
+        logging.getLogger().addHandler(ch)
+        logging.getLogger().addHandler(log_file)
+        return None
+
+    log_queue = queue.Queue()
+    logging.getLogger().addHandler(_RecordQueueHandler(log_queue))
+    listener = BatchedQueueListener(log_queue, [ch, log_file])
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
 
 
 def set_log_levels(verbose=0):
@@ -0,0 +1,363 @@
+import asyncio
+import collections
+import functools
+import selectors
+import threading
+import time
+
+from .dds_pool import DDSPool
+from .fake_sal import CommandLatency, EventStream, FakeSAL
+from .metrics import Metrics
+from .tracing import Tracer
+
+__all__ = ['VirtualClock', 'VirtualTimeLoop', 'MonochromatorModel', 'default_components', 'DryRun',
+           'DryRunResult', 'format_dry_run']
+
+DryRunResult = collections.namedtuple('DryRunResult', ['duration', 'steps', 'wall_time', 'error'])
+
+_local = threading.local()
+
+
+class VirtualClock:
+    """Simulated clock, for `FakeSAL`, `DDSPool` and `VirtualTimeLoop`.
+
+    Time only moves forward when everything running on the clock is waiting, and then jumps straight to
+    the next wake-up time, so simulated waits take no real time.
+
+    Parameters
+    ----------
+    start: float
+        Initial time in seconds.
+    """
+
+    def __init__(self, start=0.):
+        self._now = start
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        """Move the clock forward.
+
+        Parameters
+        ----------
+        seconds: float
+        """
+        if seconds > 0.:
+            self._now += seconds
+
+    def sleep(self, seconds):
+        """Wait on the simulated clock.
+
+        In a blocking call run by a `VirtualTimeLoop`, the call is suspended and the loop runs everything
+        else that happens in the meantime. Elsewhere, the clock just moves forward.
+
+        Parameters
+        ----------
+        seconds: float
+        """
+        job = getattr(_local, 'job', None)
+        if job is not None and job.loop.clock is self:
+            job.park(seconds)
+        else:
+            self.advance(seconds)
+
+
+class _JobAborted(BaseException):
+    """Raised in a blocking call still waiting when its loop is closed."""
+
+
+class _Job:
+    """Blocking call run in its own thread, in lockstep with a `VirtualTimeLoop`.
+
+    The loop and the thread never run at the same time: the loop hands over to the thread and waits until
+    the call returns or sleeps on the clock, in which case the loop resumes it at the wake-up time.
+    """
+
+    def __init__(self, loop, func):
+        self.loop = loop
+        self.func = func
+        self.future = loop.create_future()
+        self.wake_at = None
+        self.done = False
+        self.result = None
+        self.error = None
+        self.aborted = False
+        self._resume = threading.Event()
+        self._yield = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='virtual-job', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.step()
+
+    def step(self):
+        self._yield.clear()
+        self._resume.set()
+        self._yield.wait()
+        if not self.done:
+            self.loop.call_at(self.wake_at, self.step)
+            return
+        self.loop._jobs.discard(self)
+        if self.future.cancelled():
+            return
+        if self.error is not None:
+            self.future.set_exception(self.error)
+        else:
+            self.future.set_result(self.result)
+
+    def abort(self):
+        self.aborted = True
+        self.step()
+
+    def park(self, seconds):
+        self.wake_at = self.loop.time() + max(seconds, 0.)
+        self._yield.set()
+        self._resume.wait()
+        self._resume.clear()
+        if self.aborted:
+            raise _JobAborted()
+
+    def _run(self):
+        _local.job = self
+        self._resume.wait()
+        self._resume.clear()
+        try:
+            self.result = self.func()
+        except _JobAborted:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._yield.set()
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """Selector advancing the clock instead of waiting for a timeout."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            raise RuntimeError('The simulation is waiting for something that never happens.')
+        self.clock.advance(timeout)
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop running on a `VirtualClock`.
+
+    Timers (e.g. `asyncio.sleep`) fire as soon as nothing else is ready to run, at their simulated time.
+    Blocking calls sent to an executor are run in lockstep with the loop, with their sleeps on the clock
+    suspended until their simulated wake-up time, so concurrent waits overlap as they would in real time.
+
+    Parameters
+    ----------
+    clock: VirtualClock
+    """
+
+    def __init__(self, clock):
+        super().__init__(_VirtualSelector(clock))
+        self.clock = clock
+        self._jobs = set()
+
+    def time(self):
+        return self.clock.time()
+
+    def run_in_executor(self, executor, func, *args):
+        job = _Job(self, functools.partial(func, *args))
+        self._jobs.add(job)
+        job.start()
+        return job.future
+
+    def close(self):
+        for job in list(self._jobs):
+            job.abort()
+        self._jobs.clear()
+        super().close()
+
+
+class MonochromatorModel:
+    """Simulated monochromator setup time: a move, plus a grating change when the grating changes.
+
+    Use it as the ``complete`` time of the ``updateMonochromatorSetup`` `CommandLatency`; `grating` is
+    the grating in place, e.g. for the ``selectedGrating`` `EventStream`.
+
+    Parameters
+    ----------
+    grating: int
+        Initial grating.
+    move_time: float
+        Time to move to a wavelength in seconds.
+    grating_time: float
+        Time to change the grating in seconds.
+    """
+
+    def __init__(self, grating=1, move_time=5., grating_time=30.):
+        self.grating = grating
+        self.move_time = move_time
+        self.grating_time = grating_time
+
+    def __call__(self, kwargs):
+        setup_time = self.move_time
+        if kwargs.get('gratingType', self.grating) != self.grating:
+            self.grating = kwargs['gratingType']
+            setup_time += self.grating_time
+        return setup_time
+
+
+def _take_images_time(kwargs):
+    shutter_time = 2. if kwargs.get('shutter', False) else 0.
+    return kwargs.get('numImages', 1) * (kwargs.get('expTime', 0.) + shutter_time + 2.)
+
+
+def default_components():
+    """Simulated timing and events of the components used by the sequences of this package.
+
+    Returns
+    -------
+    latencies: dict
+        `CommandLatency` by component or ``(component, command)``.
+    events: dict
+        `EventStream` by topic, by component.
+    """
+    monochromator = MonochromatorModel()
+    latencies = {('atcamera', 'takeImages'): CommandLatency(0.01, 0.01, _take_images_time),
+                 ('atMonochromator', 'updateMonochromatorSetup'): CommandLatency(0.01, 0.01, monochromator),
+                 ('calibrationElectrometer', 'startScanDt'): CommandLatency(0.01, 0.01,
+                                                                            lambda kwargs: kwargs['time']),
+                 ('sedSpectrometer', 'captureSpectImage'): CommandLatency(
+                     0.01, 0.01, lambda kwargs: kwargs['integrationTime'] + 1.)}
+    grating = EventStream(1., gratingType=lambda stamp: monochromator.grating)
+    events = {'atMonochromator': {'selectedGrating': grating},
+              'calibrationElectrometer': {'intensity': EventStream(0.1, intensity=1000.),
+                                          'integrationTime': EventStream(1., intTime=1.)}}
+    return latencies, events
+
+
+class DryRun:
+    """Run sequences against simulated components on a virtual clock.
+
+    The sequence `execute` runs unchanged, but commands, event waits and sleeps take simulated time, so a
+    dry run takes milliseconds and gives the duration the sequence would have with these components.
+
+    Parameters
+    ----------
+    latencies: dict, optional
+        `CommandLatency` by component or ``(component, command)``, by default from `default_components`.
+    events: dict, optional
+        `EventStream` by topic, by component, by default from `default_components`.
+    default_latency: CommandLatency, optional
+        Latency of the commands not in ``latencies``.
+    """
+
+    def __init__(self, latencies=None, events=None, default_latency=None):
+        self.latencies = latencies
+        self.events = events
+        self.default_latency = default_latency
+
+    def run(self, sequence_class, config=None):
+        """Dry run a sequence.
+
+        Parameters
+        ----------
+        sequence_class: type
+            Class of the sequence.
+        config: dict, optional
+            Configuration of the sequence.
+
+        Returns
+        -------
+        result: DryRunResult
+            Simulated duration in seconds, steps (commands, waits and sequences, with their simulated
+            ``start`` and ``duration`` in milliseconds), real time taken by the dry run in seconds and the
+            exception raised by the sequence, if any.
+        """
+        latencies, events = default_components()
+        latencies = self.latencies if self.latencies is not None else latencies
+        events = self.events if self.events is not None else events
+
+        clock = VirtualClock()
+        tracer = Tracer(enabled=True, clock=clock.time)
+        # Simulated commands are kept out of the process-wide metrics.
+        pool = DDSPool(FakeSAL(latencies, events, self.default_latency, clock), clock=clock, tracer=tracer,
+                       metrics=Metrics(clock.time))
+        loop = VirtualTimeLoop(clock)
+
+        start = time.perf_counter()
+        error = None
+        try:
+            sequence = sequence_class(pool=pool)
+            sequence.dry_run = True
+            sequence.configure(**(config if config is not None else {}))
+            with tracer.span(sequence.name, 'sequence'):
+                loop.run_until_complete(sequence.execute_async())
+        except Exception as e:
+            error = e
+        finally:
+            loop.close()
+            pool.shutdown()
+        wall_time = time.perf_counter() - start
+
+        steps = [{'name': name, 'category': category, 'start': start * 1.e3, 'duration': (end - start) * 1.e3,
+                  'args': args}
+                 for name, category, start, end, args, _ in sorted(tracer.spans, key=lambda span: span[2])]
+        return DryRunResult(clock.time(), steps, wall_time, error)
+
+    def sweep(self, sequence_class, configs):
+        """Dry run a sequence with each configuration in turn.
+
+        Parameters
+        ----------
+        sequence_class: type
+        configs: iterable of dict
+            Configurations, e.g. a `ConfigSweep`.
+
+        Yields
+        ------
+        result: DryRunResult
+        """
+        for config in configs:
+            yield self.run(sequence_class, config)
+
+
+def format_dry_run(result):
+    """Format the steps of a dry run as a table.
+
+    Parameters
+    ----------
+    result: DryRunResult
+
+    Returns
+    -------
+    table: str
+    """
+    lines = ['{:<30} {:<25} {:>12} {:>12}'.format('Step', 'Category', 'Start [ms]', 'Duration [ms]')]
+    for step in result.steps:
+        lines.append('{:<30} {:<25} {:>12.1f} {:>12.1f}'.format(
+            step['name'], step['category'], step['start'], step['duration']))
+    lines.append('Simulated duration {:.3f} s in {:.1f} ms.'.format(result.duration, result.wall_time * 1.e3))
+    if result.error is not None:
+        lines.append('Failed: {!r}'.format(result.error))
+    return '\n'.join(lines)
@@ -0,0 +1,158 @@
+import collections
+import json
+import os
+import threading
+import time
+
+__all__ = ['Tracer', 'get_tracer']
+
+
+class Span:
+    """A timed operation recorded by a `Tracer`.
+
+    Use as a context manager; extra information can be added to ``args`` while the span is open.
+    """
+
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start', 'tid')
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+        self.tid = None
+
+    def __enter__(self):
+        self.tid = threading.get_ident()
+        self.start = self.tracer.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = repr(exc)
+        self.tracer.add_span(self.name, self.category, self.start, self.tracer.clock(), self.args, self.tid)
+        return False
+
+
+class _NullSpan:
+    """Span returned when tracing is disabled."""
+
+    __slots__ = ('args',)
+
+    def __init__(self):
+        self.args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class Tracer:
+    """Record spans of time spent in sequences, commands and waits.
+
+    Spans can be exported in the Chrome trace-event format, viewable in ``chrome://tracing`` or Perfetto.
+    Only the last ``max_spans`` spans are kept, so a long-running process (e.g. the daemon) tracing all
+    along does not grow without limit; `dropped` counts the older spans forgotten.
+
+    Parameters
+    ----------
+    enabled: bool
+        Record spans. When disabled, `span` returns a no-op context manager.
+    clock: callable
+        Function returning the current time in seconds.
+    max_spans: int
+        Number of spans kept.
+    """
+
+    def __init__(self, enabled=False, clock=time.time, max_spans=100000):
+        self.enabled = enabled
+        self.clock = clock
+        self.spans = collections.deque(maxlen=max_spans)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def span(self, name, category, **args):
+        """Return a context manager recording a span.
+
+        Parameters
+        ----------
+        name: str
+            Name of the operation (e.g. the command name).
+        category: str
+            Category of the operation, e.g. the component.
+        args
+            Extra information stored with the span (e.g. cmd_id).
+        """
+        if not self.enabled:
+            return _NullSpan()
+        return Span(self, name, category, args)
+
+    def add_span(self, name, category, start, end, args=None, tid=None):
+        """Record a span that was timed elsewhere.
+
+        Parameters
+        ----------
+        name: str
+        category: str
+        start: float
+            Start time in seconds.
+        end: float
+            End time in seconds.
+        args: dict, optional
+        tid: int, optional
+            Thread the span ran in, by default the calling thread.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if len(self.spans) == self.spans.maxlen:
+                self.dropped += 1
+            self.spans.append((name, category, start, end, args if args is not None else {},
+                               tid if tid is not None else threading.get_ident()))
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.dropped = 0
+
+    def to_chrome_trace(self):
+        """Return the recorded spans in Chrome trace-event format.
+
+        Returns
+        -------
+        trace: dict
+        """
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            dropped = self.dropped
+        events = [{'name': name, 'cat': category, 'ph': 'X', 'ts': start * 1.e6, 'dur': (end - start) * 1.e6,
+                   'pid': pid, 'tid': tid, 'args': args}
+                  for name, category, start, end, args, tid in spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'dropped_spans': dropped}}
+
+    def write(self, filename):
+        """Write the recorded spans to a file in Chrome trace-event format.
+
+        Parameters
+        ----------
+        filename: str
+        """
+        with open(filename, 'w') as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file, default=str)
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    """Return the process-wide `Tracer`, disabled until ``enabled`` is set.
+
+    Returns
+    -------
+    tracer: Tracer
+    """
+    return _tracer
@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 
 import argparse
+import asyncio
+import itertools
 import logging
-import inspect
 
-from lsst.ts.sequence import BaseSequence, atcs
+from lsst.ts.sequence import ConfigSweep, DryRun, SequenceDaemon, create_sequences, format_dry_run, \
+    format_report, get_metrics, get_registry, get_tracer, load_config, load_queue, run_queue, shutdown_pool, \
+    submit_requests, write_report
 from lsst.ts.sequence.setup import configure_logging, generate_logfile
 from lsst.ts.sequence import __version__
 
@@ -25,18 +28,167 @@ def create_parser():
                         help="Set the verbosity for the console logging.")
     parser.add_argument("-c", "--console-format", dest="console_format", default=None,
                         help="Override the console format.")
+    parser.add_argument("--log-queue", dest="log_queue", action="store_true",
+                        help="Write logs from a background thread so logging does not block the sequence.")
+    parser.add_argument("--log-max-bytes", dest="log_max_bytes", default=0, type=int,
+                        help="Rotate the log file when it reaches this size in bytes.")
+    parser.add_argument("--log-rotate-when", dest="log_rotate_when", default=None, type=str,
+                        help="Rotate the log file at this interval (e.g. 'midnight', 'H').")
+    parser.add_argument("--log-backup-count", dest="log_backup_count", default=5, type=int,
+                        help="Number of rotated log files to keep.")
+    parser.add_argument("--log-compress", dest="log_compress", action="store_true",
+                        help="Compress rotated log files.")
+    parser.add_argument("--log-json", dest="log_json", action="store_true",
+                        help="Write the log file as JSON lines.")
+    parser.add_argument("--log-keep", dest="log_keep", default=None, type=int,
+                        help="Number of log files, from previous runs, to keep in the log directory.")
     parser.add_argument("-s", "--script", dest="script", default=None, type=str,
                         help="Specify the name of the sequence.")
     parser.add_argument("-l", "--list", dest="list", action="store_true",
                         help="List available scripts.")
     parser.add_argument("-r", "--request", dest="request", default=None, type=str,
                         help="Send a request to the OCS to run a specific script.")
+    parser.add_argument("--request-queue", dest="request_queue", default=None, type=str,
+                        help="Send requests to the OCS to run all the scripts listed in this JSON file.")
+    parser.add_argument("--queue", dest="queue", default=None, type=str,
+                        help="Run all the scripts listed in this JSON file, in parallel when they use "
+                             "different components.")
+    parser.add_argument("--report", dest="report", default=None, type=str,
+                        help="Write the report of a --queue run to this JSON file.")
+    parser.add_argument("--daemon", dest="daemon", action="store_true",
+                        help="Run as a daemon, executing scripts sent with sequence_client.py.")
+    parser.add_argument("--socket", dest="socket", default=None, type=str,
+                        help="Path of the daemon socket, by default ~/.sequence/daemon.sock.")
+    parser.add_argument("--warm", dest="warm", default=None, nargs="*",
+                        help="Scripts whose components are connected to when the daemon starts "
+                             "(all scripts if no name is given).")
+    parser.add_argument("--trace", dest="trace", default=None, type=str,
+                        help="Write a timeline of the commands and waits of the sequence to this file, in "
+                             "Chrome trace-event format.")
+    parser.add_argument("--metrics", dest="metrics", default=None, type=str,
+                        help="Write latency histograms of the commands of each component and sequence "
+                             "outcomes to this file, as JSON if it ends in .json and in Prometheus text "
+                             "format otherwise.")
+    parser.add_argument("--dry-run", dest="dry_run", action="store_true",
+                        help="Run the script against simulated components on a virtual clock and report "
+                             "its duration and steps. With --request, derive the request timeout from a dry "
+                             "run.")
+    parser.add_argument("--preflight", dest="preflight", action="store_true",
+                        help="Check that all the components of the script are enabled, all at the same time, "
+                             "before running it.")
+    parser.add_argument("--bring-up", dest="bring_up", action="store_true",
+                        help="With --preflight, start and enable the components in standby or disabled.")
+    parser.add_argument("--preflight-timeout", dest="preflight_timeout", default=2., type=float,
+                        help="Time to wait for the state of each component in the preflight, in seconds.")
+    parser.add_argument("--resume", dest="resume", action="store_true",
+                        help="Continue the last run of the script selected with --script from its last "
+                             "completed step, with the same configuration. A sweep continues with the "
+                             "configurations not completed yet.")
     parser.add_argument("--config", dest="script_config", default=None, type=str,
-                        help="Filename with the configuration parameters for the requested script.")
+                        help="JSON or YAML file with the configuration parameters for the requested "
+                             "script. Parameters given as {\"grid\": [...]} or {\"zip\": [...]} are swept, "
+                             "running the script once per configuration.")
 
     return parser
 
 
+def run_script(args, registry, logger):
+    """Run or request the single script selected with --script or --request.
+    """
+    script = args.script if args.script is not None else args.request
+
+    seq = registry.resolve(script)()
+
+    first = 0
+    if args.resume:
+        state = seq.resume()
+        sweep = ConfigSweep(**state.sweep) if state.sweep is not None else ConfigSweep(state.config)
+        first = state.point
+        if args.script_config is not None and \
+                load_config(args.script_config, seq.config_schema, script).to_dict() != sweep.to_dict():
+            raise IOError('The configuration in {} is not the one of the run to resume.'.format(
+                args.script_config))
+    elif args.script_config is not None:
+        sweep = load_config(args.script_config, seq.config_schema, script)
+    else:
+        sweep = ConfigSweep({})
+
+    if args.script is not None and not args.dry_run:
+        # Journal the completed steps, so a failed run can be continued with --resume.
+        seq.enable_checkpoint()
+
+    if args.script is not None and args.preflight and not args.dry_run:
+        seq.enable_preflight(timeout=args.preflight_timeout, bring_up=args.bring_up)
+
+    # A dry run must not reach the components, so its estimate comes from dry runs as well.
+    run_time = sweep.run_time(seq, dry_run=DryRun() if args.dry_run else None)
+    logger.info('%i configurations, estimated run time is %s s', len(sweep), run_time)
+
+    for i, config in enumerate(itertools.islice(sweep, first, None), first):
+
+        seq.configure(**config)
+        if sweep.is_sweep:
+            seq.sweep_point = (sweep.to_dict(), i)
+            logger.info('Configuration %i of %i: %s', i + 1, len(sweep), config)
+
+        if args.script is not None and args.dry_run:
+
+            logger.info("Dry running script %s", script)
+            result = seq.simulate()
+            logger.info("Dry run:\n%s", format_dry_run(result))
+            if result.error is not None:
+                raise result.error
+
+        elif args.script is not None:
+
+            logger.info("Running script %s", script)
+            seq.run()
+
+        elif args.request is not None:
+
+            logger.info("Requesting script %s", script)
+            seq.request(simulate=args.dry_run)
+
+
+def request_queue(filename, logger):
+    """Request the OCS to run all the scripts in a queue file.
+    """
+    sequences = create_sequences(load_queue(filename))
+    logger.info("Requesting %i scripts from %s", len(sequences), filename)
+
+    results = asyncio.run(submit_requests(sequences))
+
+    failed = [seq.name for seq, result in zip(sequences, results) if isinstance(result, Exception)]
+    if failed:
+        raise IOError('Failed to request {}.'.format(', '.join(failed)))
+
+
+def execute_queue(filename, report_filename, logger):
+    """Run all the scripts in a queue file and report their outcome.
+    """
+    report = asyncio.run(run_queue(load_queue(filename)))
+
+    logger.info("Queue report:\n%s", format_report(report))
+    if report_filename is not None:
+        write_report(report, report_filename)
+        logger.info("Report written to %s", report_filename)
+
+    failed = [entry['name'] for entry in report if entry['status'] != 'done']
+    if failed:
+        raise IOError('{} of {} scripts did not complete: {}.'.format(len(failed), len(report),
+                                                                      ', '.join(failed)))
+
+
+def run_daemon(args):
+    """Serve execute and request commands until the daemon is asked to shut down.
+    """
+    daemon = SequenceDaemon(args.socket)
+    if args.warm is not None:
+        daemon.warm_up(args.warm if len(args.warm) > 0 else None)
+
+    asyncio.run(daemon.serve())
+
+
 def main(args):
     """
     Main method to startup OCS scripts in python.
@@ -45,48 +197,59 @@ def main(args):
     :return:
     """
 
-    logfilename = generate_logfile()
+    logfilename = generate_logfile(keep=args.log_keep)
     configure_logging(args, logfilename)
 
     logger = logging.getLogger("script")
     logger.info("logfile=%s", logfilename)
 
-    valid_sequences = {}
-    members = inspect.getmembers(atcs)
-    for member in members:
-        if inspect.isclass(member[1]) and issubclass(member[1], BaseSequence):
-            valid_sequences[member[0]] = member[1]
+    registry = get_registry()
 
     if args.list:
         logger.info("Listing all available scripts.")
-        for script in valid_sequences:
-            logger.info('%s', script)
+        for entry in registry:
+            logger.info('%s: %s', entry.name, entry.description)
         return 0
 
-    if args.script is not None and args.request is not None:
-        raise IOError('Only one of script or request options can be selected.')
-    elif args.script is not None and args.script not in valid_sequences:
-        raise IOError('{} is not a valid sequence.'.format(args.script))
-    elif args.request is not None and args.request not in valid_sequences:
+    selected = [option for option in (args.script, args.request, args.request_queue, args.queue)
+                if option is not None]
+    if args.daemon:
+        selected.append(args.daemon)
+    if len(selected) > 1:
+        raise IOError('Only one of script, request, request-queue, queue or daemon options can be selected.')
+    elif args.script is not None and args.script not in registry:
         raise IOError('{} is not a valid sequence.'.format(args.script))
+    elif args.request is not None and args.request not in registry:
+        raise IOError('{} is not a valid sequence.'.format(args.request))
+    elif args.resume and args.script is None:
+        raise IOError('resume can only be used with the script option.')
+    elif (args.preflight or args.bring_up) and args.script is None:
+        raise IOError('preflight can only be used with the script option.')
+    elif args.bring_up and not args.preflight:
+        raise IOError('bring-up can only be used with the preflight option.')
 
-    script = args.script if args.script is not None else args.request
-
-    seq = valid_sequences[script]()
-
-    seq.configure(script_config=args.script_config)
-
-    logger.info('Estimated run time is %s s', seq.run_time())
-
-    if args.script is not None:
-
-        logger.info("Running script %s", script)
-        seq.execute()
-
-    elif args.request is not None:
+    if args.trace is not None:
+        get_tracer().enabled = True
 
-        logger.info("Requesting script %s", script)
-        seq.request()
+    try:
+        if args.daemon:
+            run_daemon(args)
+        elif args.request_queue is not None:
+            request_queue(args.request_queue, logger)
+        elif args.queue is not None:
+            execute_queue(args.queue, args.report, logger)
+        else:
+            run_script(args, registry, logger)
+    finally:
+        shutdown_pool()
+        if args.trace is not None:
+            get_tracer().write(args.trace)
+            logger.info('Trace written to %s', args.trace)
+        if len(get_metrics()) > 0:
+            logger.info('Metrics:\n%s', get_metrics().summary())
+        if args.metrics is not None:
+            get_metrics().write(args.metrics)
+            logger.info('Metrics written to %s', args.metrics)
 
     logger.info('Done')
 
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import sys
+
+from lsst.ts.sequence.daemon_client import DaemonClient
+
+__all__ = ["main"]
+
+
+def create_parser():
+    """Create parser
+    """
+    description = ["Send commands to a sequence daemon started with run_sequence.py --daemon."]
+
+    parser = argparse.ArgumentParser(usage="sequence_client.py [options] action",
+                                     description=" ".join(description),
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument("action", choices=["ping", "list", "execute", "request", "abort", "shutdown"],
+                        help="Action to perform.")
+    parser.add_argument("-s", "--script", dest="script", default=None, type=str,
+                        help="Name of the sequence to execute, request or abort.")
+    parser.add_argument("--config", dest="config", default="{}", type=str,
+                        help="Sequence configuration, as a JSON object.")
+    parser.add_argument("--socket", dest="socket", default=None, type=str,
+                        help="Path of the daemon socket, by default ~/.sequence/daemon.sock.")
+
+    return parser
+
+
+def main(args):
+    """
+    Send one command to the sequence daemon and print its response.
+
+    :param args:
+    :return:
+    """
+    with DaemonClient(args.socket) as client:
+        if args.action in ("execute", "request"):
+            if args.script is None:
+                raise IOError('A script is required to {}.'.format(args.action))
+            response = client.call(args.action, script=args.script, config=json.loads(args.config))
+        elif args.action == "abort":
+            response = client.abort(args.script)
+        else:
+            response = client.call(args.action)
+
+    print(json.dumps(response, indent=2))
+
+    return 0
+
+
+if __name__ == '__main__':
+    parser = create_parser()
+    args = parser.parse_args()
+
+    sys.exit(main(args))
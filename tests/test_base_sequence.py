@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DDSPool, FakeSAL, Metrics, RunTimeModel, Tracer
+
+
+class ParallelSequence(BaseSequence):
+    """Sequence running one command on each of two components at the same time."""
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None), ('atSpectrograph', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config.update(kwargs)
+
+    async def execute_async(self):
+        return await asyncio.gather(self.atcamera.run_command_async('takeImages', 5., check=True),
+                                    self.atSpectrograph.run_command_async('takeImages', 5., check=True))
+
+
+class BlockingSequence(BaseSequence):
+    """Sequence implementing the blocking `execute`."""
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config.update(kwargs)
+
+    def execute(self):
+        cmd_id = self.atcamera.send_Command('takeImages', wait_command=False)[0]
+        self.sleep(0.05)
+        return self.atcamera.waitForCompletion(cmd_id, 5.)
+
+
+class BaseSequenceTestCase(unittest.TestCase):
+    """Test the blocking and awaitable execution of sequences on FakeSAL."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        sal = FakeSAL(default_latency=CommandLatency(complete=0.2))
+        self.pool = DDSPool(sal, tracer=Tracer(), metrics=Metrics())
+        self.run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_sequence(self, sequence_class=ParallelSequence):
+        return sequence_class(pool=self.pool, run_time_model=self.run_time_model)
+
+    def test_concurrent_commands(self):
+        start = time.time()
+        acks = self.make_sequence().run()
+        self.assertEqual([ack[0] for ack in acks], [303, 303])
+        # Both components execute their command at the same time.
+        self.assertLess(time.time() - start, 0.35)
+        self.assertGreater(self.run_time_model.estimate('ParallelSequence', {}, -1), 0.)
+
+    def test_run_from_threads(self):
+        # Blocking runs create their own event loop, so sequences can be run from worker threads.
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            futures = [executor.submit(self.make_sequence().run) for _ in range(2)]
+            for future in futures:
+                self.assertEqual([ack[0] for ack in future.result(timeout=10.)], [303, 303])
+
+    def test_blocking_execute(self):
+        sequence = self.make_sequence(BlockingSequence)
+        self.assertEqual(sequence.run()[0], 303)
+        self.assertEqual(asyncio.run(sequence.run_async())[0], 303)
+
+    def test_not_implemented(self):
+        sequence = BaseSequence([], pool=self.pool, run_time_model=self.run_time_model)
+        with self.assertRaises(NotImplementedError):
+            sequence.execute()
+        with self.assertRaises(NotImplementedError):
+            asyncio.run(sequence.execute_async())
+
+
+if __name__ == '__main__':
+    unittest.main()
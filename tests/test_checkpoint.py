@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lsst.ts.sequence import BaseSequence, Checkpoint, ConfigSweep, DDSPool, FakeSAL, RunTimeModel
+
+
+class StepSequence(BaseSequence):
+    """Sequence journaling each of its ``n_steps`` steps, failing at step ``fail_at``."""
+
+    def __init__(self, fail_at=None, **kwargs):
+        super().__init__(component_list=[], **kwargs)
+        self.fail_at = fail_at
+        self.steps_run = []
+
+    def configure(self, **kwargs):
+        self.config.update(kwargs)
+
+    async def execute_async(self):
+        for step in range(self.resume_step, self.config['n_steps']):
+            if step == self.fail_at:
+                raise IOError('Failed at step {}.'.format(step))
+            self.steps_run.append(step)
+            self.save_checkpoint(step + 1, [step], last=step)
+
+
+class CheckpointTestCase(unittest.TestCase):
+    """Test the checkpoint journal and resuming sequences from it."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'checkpoints', 'StepSequence.jsonl')
+        self.pool = DDSPool(FakeSAL())
+        self.run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def make_sequence(self, fail_at=None):
+        return StepSequence(fail_at, pool=self.pool, run_time_model=self.run_time_model)
+
+    def run_sequence(self, sequence):
+        return self.loop.run_until_complete(sequence.run_async())
+
+    def test_journal(self):
+        checkpoint = Checkpoint(self.filename)
+        self.assertIsNone(checkpoint.load())
+
+        checkpoint.start('StepSequence', {'n_steps': 3})
+        checkpoint.step(1, [10], {'counter': 1})
+        checkpoint.step(2, [11, 12], {'counter': 2})
+        state = checkpoint.load()
+        self.assertEqual(state.script, 'StepSequence')
+        self.assertEqual(state.config, {'n_steps': 3})
+        self.assertEqual(state.step, 2)
+        self.assertEqual(state.state, {'counter': 2})
+        self.assertEqual(state.cmd_ids, [10, 11, 12])
+        self.assertFalse(state.done)
+
+        # A record truncated by a crash is ignored.
+        with open(self.filename, 'a') as journal:
+            journal.write('{"event": "step", "st')
+        self.assertEqual(checkpoint.load().step, 2)
+
+        checkpoint.start('StepSequence', {'n_steps': 1})
+        checkpoint.finish()
+        state = checkpoint.load()
+        self.assertEqual((state.config, state.step, state.done), ({'n_steps': 1}, 0, True))
+
+    def test_sweep_journal(self):
+        sweep = ConfigSweep({}, zipped={'n_steps': [2, 3]}).to_dict()
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.start('StepSequence', {'n_steps': 2}, sweep, 0)
+        checkpoint.step(1)
+        checkpoint.finish()
+        checkpoint.start('StepSequence', {'n_steps': 3}, sweep, 1)
+        checkpoint.step(1, [5])
+        state = checkpoint.load()
+        self.assertEqual((state.point, state.step, state.cmd_ids, state.done), (1, 1, [5], False))
+        self.assertEqual(state.sweep, json.loads(json.dumps(sweep)))
+        with open(self.filename) as journal:
+            self.assertEqual([json.loads(line)['event'] for line in journal],
+                             ['start', 'step', 'done', 'start', 'step'])
+
+    def test_resume(self):
+        sequence = self.make_sequence(fail_at=2)
+        sequence.configure(n_steps=4)
+        sequence.enable_checkpoint(self.filename)
+        with self.assertRaises(IOError):
+            self.run_sequence(sequence)
+        self.assertEqual(sequence.steps_run, [0, 1])
+
+        resumed = self.make_sequence()
+        state = resumed.resume(self.filename)
+        self.assertEqual(state.step, 2)
+        self.assertEqual(state.state, {'last': 1})
+        self.assertEqual(resumed.config, {'n_steps': 4})
+        self.assertEqual(resumed.resume_step, 2)
+        self.run_sequence(resumed)
+        self.assertEqual(resumed.steps_run, [2, 3])
+        self.assertIsNone(resumed.resume_state)
+
+        state = Checkpoint(self.filename).load()
+        self.assertEqual((state.step, state.cmd_ids, state.done), (4, [0, 1, 2, 3], True))
+        with self.assertRaises(IOError):
+            self.make_sequence().resume(self.filename)
+
+    def test_resume_without_journal(self):
+        with self.assertRaises(IOError):
+            self.make_sequence().resume(self.filename)
+
+    def test_resume_sweep(self):
+        sweep = ConfigSweep({}, zipped={'n_steps': [1, 2, 3]})
+        sequence = self.make_sequence()
+        sequence.enable_checkpoint(self.filename)
+        for point, config in enumerate(sweep):
+            sequence.configure(**config)
+            sequence.sweep_point = (sweep.to_dict(), point)
+            if point == 1:
+                break
+            self.run_sequence(sequence)
+
+        # The first configuration completed and the second one did not start, so the sweep continues
+        # with the second one from its start.
+        resumed = self.make_sequence()
+        state = resumed.resume(self.filename)
+        self.assertEqual((state.point, state.step, state.config), (1, 0, {'n_steps': 2}))
+        self.assertIsNone(resumed.resume_state)
+
+        resumed.fail_at = 2
+        for point, config in enumerate(sweep):
+            if point < state.point:
+                continue
+            resumed.configure(**config)
+            resumed.sweep_point = (sweep.to_dict(), point)
+            if point == 2:
+                with self.assertRaises(IOError):
+                    self.run_sequence(resumed)
+            else:
+                self.run_sequence(resumed)
+        self.assertEqual(resumed.steps_run, [0, 1, 0, 1])
+
+        # The last configuration stopped after two steps.
+        last = self.make_sequence()
+        state = last.resume(self.filename)
+        self.assertEqual((state.point, state.step, state.config), (2, 2, {'n_steps': 3}))
+        self.run_sequence(last)
+        self.assertEqual(last.steps_run, [2])
+        with self.assertRaises(IOError):
+            self.make_sequence().resume(self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lsst.ts.sequence import ConfigSweep, load_config, parse_config, validate_config
+
+
+class ConfigSweepTestCase(unittest.TestCase):
+    """Test the grid and zip sweeps of `ConfigSweep`."""
+
+    def test_single(self):
+        sweep = parse_config({'intensity': 15000., 'grating': 1})
+        self.assertFalse(sweep.is_sweep)
+        self.assertEqual(len(sweep), 1)
+        self.assertEqual(list(sweep), [{'intensity': 15000., 'grating': 1}])
+
+    def test_grid(self):
+        sweep = parse_config({'intensity': 15000., 'grating': {'grid': [1, 2]},
+                              'filter': {'grid': ['a', 'b']}})
+        self.assertTrue(sweep.is_sweep)
+        self.assertEqual(len(sweep), 4)
+        self.assertEqual([(config['grating'], config['filter']) for config in sweep],
+                         [(1, 'a'), (1, 'b'), (2, 'a'), (2, 'b')])
+        self.assertTrue(all(config['intensity'] == 15000. for config in sweep))
+
+    def test_zip(self):
+        sweep = parse_config({'wavelength': {'zip': {'start': 400., 'stop': 800., 'num': 5}},
+                              'max_exptime': {'zip': [60., 60., 30., 30., 30.]}})
+        self.assertEqual(len(sweep), 5)
+        self.assertEqual([(config['wavelength'], config['max_exptime']) for config in sweep],
+                         [(400., 60.), (500., 60.), (600., 30.), (700., 30.), (800., 30.)])
+
+    def test_grid_and_zip(self):
+        # The zipped parameters vary fastest.
+        sweep = parse_config({'grating': {'grid': [1, 2]}, 'wavelength': {'zip': [400., 500., 600.]},
+                              'exptime': {'zip': [3., 2., 1.]}})
+        self.assertEqual(len(sweep), 6)
+        self.assertEqual([(config['grating'], config['wavelength'], config['exptime']) for config in sweep],
+                         [(1, 400., 3.), (1, 500., 2.), (1, 600., 1.),
+                          (2, 400., 3.), (2, 500., 2.), (2, 600., 1.)])
+
+    def test_to_dict(self):
+        sweep = parse_config({'intensity': 1., 'grating': {'grid': [1, 2]},
+                              'wavelength': {'zip': [400., 500.]}})
+        copy = ConfigSweep(**json.loads(json.dumps(sweep.to_dict())))
+        self.assertEqual(list(copy), list(sweep))
+
+    def test_invalid(self):
+        with self.assertRaises(IOError):
+            parse_config({'wavelength': {'zip': [400., 500.]}, 'exptime': {'zip': [1., 2., 3.]}})
+        with self.assertRaises(IOError):
+            parse_config({'wavelength': {'grid': []}})
+        with self.assertRaises(IOError):
+            parse_config({'wavelength': {'zip': {'start': 400., 'stop': 800.}}})
+        with self.assertRaises(IOError):
+            parse_config([400., 500.])
+
+    def test_schema(self):
+        schema = {'wavelength': (int, float), 'grating': int}
+        validate_config({'wavelength': 400, 'grating': 1}, schema)
+        validate_config({'anything': 'goes'}, None)
+        with self.assertRaises(IOError):
+            validate_config({'wavelength': '400'}, schema)
+        with self.assertRaises(IOError):
+            validate_config({'exptime': 1.}, schema)
+        # Every swept value is checked.
+        with self.assertRaises(IOError):
+            parse_config({'grating': {'grid': [1, 2.5]}}, schema)
+
+    def test_load_config(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'config.json')
+            with open(filename, 'w') as config_file:
+                json.dump({'grating': {'grid': [1, 2]}, 'wavelength': 500.}, config_file)
+            sweep = load_config(filename, {'grating': int, 'wavelength': float})
+            self.assertEqual(list(sweep), [{'grating': 1, 'wavelength': 500.},
+                                           {'grating': 2, 'wavelength': 500.}])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
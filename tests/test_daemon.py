@@ -0,0 +1,149 @@
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DaemonClient, DDSPool, FakeSAL, RunTimeModel, \
+    SequenceDaemon, SequenceRegistry
+
+
+class CameraSequence(BaseSequence):
+    """Sequence taking ``numImages`` images of 0.05 s."""
+
+    config_schema = {'numImages': int}
+    # Run time model of the sequences created by the daemon, set by the tests.
+    model = None
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('run_time_model', self.model)
+        super().__init__(component_list=[('atcamera', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config['numImages'] = kwargs.get('numImages', 1)
+
+    def nominal_run_time(self):
+        return 0.05 * self.config['numImages']
+
+    async def execute_async(self):
+        for _ in range(self.config['numImages']):
+            await self.atcamera.run_command_async('takeImages', 5., deadline=self.deadline, check=True)
+
+
+class SequenceDaemonTestCase(unittest.TestCase):
+    """Test running sequences in a `SequenceDaemon` through a `DaemonClient`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        CameraSequence.model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+        self.socket_path = os.path.join(self.directory, 'daemon.sock')
+        self.pool = DDSPool(FakeSAL(default_latency=CommandLatency(complete=0.05)))
+        self.registry = SequenceRegistry()
+        self.registry.register('CameraSequence', CameraSequence, 'Take images.')
+
+    def tearDown(self):
+        CameraSequence.model = None
+        shutil.rmtree(self.directory)
+
+    def make_daemon(self):
+        return SequenceDaemon(self.socket_path, pool=self.pool, registry=self.registry)
+
+    def shutdown(self):
+        with DaemonClient(self.socket_path, timeout=5.) as client:
+            client.call('shutdown')
+
+    def serve(self, client_calls):
+        """Serve requests while ``client_calls`` runs in a thread, then shut the daemon down."""
+        async def main():
+            loop = asyncio.get_running_loop()
+            daemon = self.make_daemon()
+            serve = loop.create_task(daemon.serve())
+            while daemon._server is None:
+                await asyncio.sleep(0.01)
+            try:
+                return await loop.run_in_executor(None, client_calls)
+            finally:
+                await loop.run_in_executor(None, self.shutdown)
+                await serve
+
+        return asyncio.run(main())
+
+    def test_execute(self):
+        def client_calls():
+            with DaemonClient(self.socket_path, timeout=5.) as client:
+                client.call('ping')
+                listed = client.call('list')['result']
+                response = client.execute('CameraSequence', numImages=3)
+                with self.assertRaises(IOError):
+                    client.execute('Unknown')
+                with self.assertRaises(IOError):
+                    client.execute('CameraSequence', numImages='three')
+                with self.assertRaises(IOError):
+                    client.call('unknown')
+                return listed, response
+
+        listed, response = self.serve(client_calls)
+        self.assertEqual(listed, [{'name': 'CameraSequence', 'description': 'Take images.'}])
+        self.assertAlmostEqual(response['run_time'], 0.15)
+        self.assertGreaterEqual(response['elapsed'], 0.15)
+        sent = self.pool.get_remote('atcamera').sender.commands_sent
+        self.assertEqual([cmd for cmd, _ in sent], ['takeImages'] * 3)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_abort(self):
+        def client_calls():
+            with DaemonClient(self.socket_path, timeout=5.) as client, \
+                    concurrent.futures.ThreadPoolExecutor(1) as executor:
+                other = DaemonClient(self.socket_path, timeout=5.)
+                running = executor.submit(other.execute, 'CameraSequence', numImages=100)
+                time.sleep(0.2)
+                aborted = client.abort()['result']
+                with self.assertRaises(IOError):
+                    running.result()
+                other.close()
+                return aborted
+
+        start = time.time()
+        self.assertEqual(self.serve(client_calls), ['CameraSequence'])
+        self.assertLess(time.time() - start, 2.)
+        self.assertLess(len(self.pool.get_remote('atcamera').sender.commands_sent), 100)
+
+    def test_already_running(self):
+        async def main():
+            daemon = self.make_daemon()
+            await daemon.start()
+            try:
+                with self.assertRaises(IOError):
+                    await self.make_daemon().start()
+            finally:
+                daemon._server.close()
+                await daemon._server.wait_closed()
+            self.assertTrue(os.path.exists(self.socket_path))
+
+        asyncio.run(main())
+
+    def test_stale_socket(self):
+        # A daemon that was killed leaves its socket behind, with nobody listening on it.
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socket_path)
+        stale.close()
+        self.assertTrue(os.path.exists(self.socket_path))
+
+        def client_calls():
+            with DaemonClient(self.socket_path, timeout=5.) as client:
+                return client.call('ping')['status']
+
+        self.assertEqual(self.serve(client_calls), 'ok')
+
+    def test_not_a_socket(self):
+        open(self.socket_path, 'w').close()
+        with self.assertRaises(IOError):
+            asyncio.run(self.make_daemon().start())
+        self.assertTrue(os.path.isfile(self.socket_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
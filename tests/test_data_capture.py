@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from lsst.ts.sequence.data_capture import CaptureStream, DataCapture, build_header, record_dtype
+
+
+class CaptureStreamTestCase(unittest.TestCase):
+    """Test that `CaptureStream` grows its file in chunks and checks the records."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'stream.raw')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_chunks(self):
+        stream = CaptureStream(self.filename, chunk_size=4)
+        self.assertIsNone(stream.finalize())
+        for i in range(10):
+            stream.append({'time': float(i), 'point': i, 'spectrum': np.full(3, i, dtype=float)})
+            n_chunks = i // 4 + 1
+            self.assertEqual(os.path.getsize(self.filename), n_chunks * 4 * stream.dtype.itemsize)
+        self.assertEqual(stream.n_records, 10)
+
+        data = stream.finalize()
+        self.assertEqual(data.shape, (10, ))
+        self.assertEqual(data.dtype.names, ('time', 'point', 'spectrum'))
+        np.testing.assert_array_equal(data['point'], np.arange(10))
+        np.testing.assert_array_equal(data['spectrum'][7], [7., 7., 7.])
+
+    def test_mismatch(self):
+        stream = CaptureStream(self.filename, chunk_size=4)
+        stream.append({'point': 1, 'name': 'ab', 'spectrum': np.zeros(3)})
+        # Values that can be stored without loss are accepted.
+        stream.append({'point': np.int16(2), 'name': 'c', 'spectrum': [1, 2, 3]})
+        for record in ({'point': 1.5, 'name': 'ab', 'spectrum': np.zeros(3)},
+                       {'point': 1, 'name': 'abc', 'spectrum': np.zeros(3)},
+                       {'point': 1, 'name': 'ab', 'spectrum': np.zeros(4)},
+                       {'point': 1, 'name': 'ab'},
+                       {'point': 1, 'name': 'ab', 'spectrum': np.zeros(3), 'extra': 0}):
+            with self.assertRaises(IOError):
+                stream.append(record)
+        self.assertEqual(stream.n_records, 2)
+        self.assertEqual(list(stream.finalize()['name']), ['ab', 'c'])
+
+    def test_record_dtype(self):
+        dtype = record_dtype({'point': np.int16(1), 'flux': 1, 'name': 'ab', 'spectrum': np.zeros(3, 'f4'),
+                              'ok': True}, string_length=8)
+        self.assertEqual(dtype, np.dtype([('point', 'i8'), ('flux', 'i8'), ('name', 'U8'),
+                                          ('spectrum', 'f8', (3, )), ('ok', '?')]))
+        stream = CaptureStream(self.filename, dtype=record_dtype({'value': 1.5, 'name': 'a'}))
+        stream.append({'value': 2, 'name': 'a longer name'})
+        self.assertEqual(list(stream.finalize()['name']), ['a longer name'])
+
+    def test_declared_dtype(self):
+        stream = CaptureStream(self.filename, dtype=[('name', 'U16'), ('value', 'f8')])
+        stream.append({'name': 'a', 'value': 1})
+        stream.append({'name': 'a much longer', 'value': 2.5})
+        data = stream.finalize()
+        self.assertEqual(list(data['name']), ['a', 'a much longer'])
+        np.testing.assert_array_equal(data['value'], [1., 2.5])
+
+
+class DataCaptureTestCase(unittest.TestCase):
+    """Test writing data products with `DataCapture`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_capture(self):
+        header = build_header({'wavelength': np.float64(500.), 'gratings': [1, 2], 'name': 'test'})
+        self.assertEqual(header, {'wavelength': 500., 'gratings': '[1, 2]', 'name': 'test'})
+
+        capture = DataCapture(os.path.join(self.directory, 'data'), 'run', header=header, chunk_size=8,
+                              dtypes={'points': [('point', 'i8'), ('label', 'U8')]})
+        with capture:
+            for i in range(20):
+                capture.record('electrometer', time=float(i), intensity=i * 2.)
+            capture.record('points', point=0, label='start')
+            capture.record('points', point=1, label='end')
+
+        products = [os.path.basename(product) for product in capture.products]
+        self.assertIn('run_electrometer.npy', products)
+        self.assertIn('run_points.npy', products)
+        self.assertIn('run.json', products)
+        self.assertEqual([name for name in os.listdir(capture.directory) if name.endswith('.raw')], [])
+
+        electrometer = np.load(capture.filename('electrometer', '.npy'))
+        self.assertEqual(electrometer.shape, (20, ))
+        np.testing.assert_array_equal(electrometer['intensity'], np.arange(20) * 2.)
+        points = np.load(capture.filename('points', '.npy'))
+        self.assertEqual(list(points['label']), ['start', 'end'])
+        with open(capture.filename(extension='.json')) as header_file:
+            self.assertEqual(json.load(header_file)['header'], header)
+
+    def test_invalid_record(self):
+        capture = DataCapture(self.directory, 'run')
+        capture.start()
+        capture.record('points', point=1)
+        capture.record('points', point=1.5)
+        capture.record('points', point=2)
+        with self.assertRaises(IOError):
+            capture.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
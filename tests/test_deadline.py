@@ -0,0 +1,128 @@
+import asyncio
+import math
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DDSPool, Deadline, DeadlineExceeded, FakeSAL, \
+    Metrics, RunTimeModel, SequenceAborted, Tracer
+
+
+class SlowSequence(BaseSequence):
+    """Sequence running one command that takes much longer than its nominal run time."""
+
+    deadline_slack = 0.2
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config.update(kwargs)
+
+    def nominal_run_time(self):
+        return 0.1
+
+    async def execute_async(self):
+        await self.atcamera.run_command_async('takeImages', 30., deadline=self.deadline, check=True)
+
+
+class DeadlineTestCase(unittest.TestCase):
+    """Test `Deadline` budgets and cancellation."""
+
+    def test_unbounded(self):
+        deadline = Deadline()
+        self.assertTrue(math.isinf(deadline.budget))
+        self.assertFalse(deadline.expired)
+        self.assertEqual(deadline.timeout(5.), 5.)
+        self.assertTrue(math.isinf(deadline.share(1., 2.).budget))
+
+    def test_expiry(self):
+        deadline = Deadline(0.1)
+        self.assertLessEqual(deadline.timeout(5.), 0.1)
+        start = time.time()
+        with self.assertRaises(DeadlineExceeded):
+            deadline.sleep(5.)
+        self.assertLess(time.time() - start, 1.)
+        self.assertTrue(deadline.expired)
+
+    def test_child(self):
+        parent = Deadline(1.)
+        self.assertLessEqual(parent.child(10.).budget, 1.)
+        self.assertLessEqual(parent.child(0.2).budget, 0.2)
+        self.assertLessEqual(parent.child().budget, 1.)
+        share = parent.share(1., 4.)
+        self.assertLessEqual(share.budget, 0.25)
+        self.assertGreater(share.budget, 0.2)
+
+    def test_cancel(self):
+        parent = Deadline()
+        child = parent.child(10.)
+        parent.cancel('stopped')
+        self.assertTrue(child.cancelled)
+        with self.assertRaises(SequenceAborted):
+            child.check()
+        # A step started after the cancellation is cancelled as well.
+        self.assertTrue(parent.child().cancelled)
+
+    def test_cancel_wakes_up_sleep(self):
+        deadline = Deadline()
+        loop = asyncio.new_event_loop()
+        try:
+            loop.call_later(0.1, deadline.cancel)
+            start = time.time()
+            with self.assertRaises(SequenceAborted):
+                loop.run_until_complete(loop.run_in_executor(None, deadline.sleep, 5.))
+            self.assertLess(time.time() - start, 1.)
+        finally:
+            loop.close()
+
+
+class SequenceDeadlineTestCase(unittest.TestCase):
+    """Test that a sequence stops when its deadline expires or it is aborted."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.mkdtemp()
+        self.sal = FakeSAL(latencies={'atcamera': CommandLatency(complete=5.)})
+        self.pool = DDSPool(self.sal, tracer=Tracer(), metrics=Metrics())
+        run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+        self.sequence = SlowSequence(pool=self.pool, run_time_model=run_time_model)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def test_time_budget(self):
+        self.assertAlmostEqual(self.sequence.time_budget(), 0.1 * 1.2 + 0.2)
+        self.assertIsNone(self.sequence.time_budget(-1))
+
+    def test_deadline_expiry(self):
+        start = time.time()
+        with self.assertRaises(DeadlineExceeded):
+            self.loop.run_until_complete(self.sequence.run_async())
+        self.assertLess(time.time() - start, 2.)
+        self.assertIsNone(self.sequence.deadline)
+
+    def test_abort(self):
+        self.sequence.deadline_slack = 60.
+        self.loop.call_later(0.2, self.sequence.abort, 'test')
+        start = time.time()
+        with self.assertRaises(SequenceAborted):
+            self.loop.run_until_complete(self.sequence.run_async())
+        self.assertLess(time.time() - start, 2.)
+        sent = [cmd for cmd, _ in self.pool.get_remote('atcamera').sender.commands_sent]
+        self.assertEqual(sent, ['takeImages', 'abort'])
+
+    def test_given_deadline(self):
+        deadline = Deadline(0.2)
+        with self.assertRaises(DeadlineExceeded):
+            self.loop.run_until_complete(self.sequence.run_async(deadline=deadline))
+        self.assertTrue(deadline.expired)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import types
+import unittest
+
+from lsst.ts.sequence import DDSPool, EventCache, EventStream, FakeSAL
+from lsst.ts.sequence.simulation import VirtualClock
+
+
+class UnstampedSubscriber:
+    """Subscriber whose samples have no stamp, returning the same values on every read."""
+
+    def __init__(self):
+        self.reads = 0
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        self.reads += 1
+        return types.SimpleNamespace(value=1.)
+
+
+class EventCacheTestCase(unittest.TestCase):
+    """Test following event topics with `EventCache` on FakeSAL."""
+
+    def make_pool(self, clock=None, **events):
+        sal = FakeSAL(events={'electrometer': events}, clock=clock)
+        return DDSPool(sal, clock=clock)
+
+    def test_identical_samples(self):
+        # A steady topic publishes samples with the same values, each of which is a new sample.
+        clock = VirtualClock()
+        cache = self.make_pool(clock, intensity=EventStream(1., intensity=5.)).get_event_cache('electrometer')
+        topic = cache.intensity
+        self.assertEqual(topic.latest.intensity, 5.)
+        # Reading again at the same time returns the same sample.
+        self.assertEqual(topic.latest.intensity, 5.)
+        self.assertEqual(topic.n_samples, 1)
+        clock.advance(3.)
+        topic.latest
+        clock.advance(1.)
+        topic.latest
+        self.assertEqual(topic.n_samples, 3)
+        self.assertEqual([sample.private_sndStamp for sample in topic.history], [0., 3., 4.])
+
+    def test_wait_value(self):
+        clock = VirtualClock()
+        stream = EventStream(1., summaryState=lambda stamp: int(stamp >= 5.))
+        cache = self.make_pool(clock, summaryState=stream).get_event_cache('electrometer')
+        sample = cache.summaryState.wait_value('summaryState', 1, timeout=10.)
+        self.assertEqual(sample.private_sndStamp, 5.)
+        # The topic is read every poll interval of the simulated clock.
+        self.assertAlmostEqual(clock.time(), 5., delta=cache.poll_interval)
+        start = clock.time()
+        with self.assertRaises(TimeoutError):
+            cache.summaryState.wait_value('summaryState', 2, timeout=3.)
+        self.assertAlmostEqual(clock.time() - start, 3.)
+
+    def test_wait_stable(self):
+        # The intensity settles at 100 after 4 s. Identical consecutive samples count as stable samples.
+        clock = VirtualClock()
+        stream = EventStream(1., intensity=lambda stamp: 100. if stamp >= 4. else 100. + 10. * (4. - stamp))
+        cache = self.make_pool(clock, intensity=stream).get_event_cache('electrometer')
+        sample = cache.intensity.wait_stable('intensity', 0.01, samples=3, timeout=20.)
+        self.assertEqual(sample.private_sndStamp, 6.)
+        self.assertEqual(sample.intensity, 100.)
+
+    def test_unstamped(self):
+        clock = VirtualClock()
+        subscriber = UnstampedSubscriber()
+        cache = EventCache(subscriber, clock=clock)
+        with self.assertLogs('EventCache', 'WARNING'):
+            cache.topic('value').latest
+        cache.topic('value').latest
+        # Without a stamp, there is no telling whether a sample is new, so every read is a sample.
+        self.assertEqual(cache.topic('value').n_samples, subscriber.reads)
+        self.assertEqual(cache.topic('value').n_samples, 2)
+
+    def test_poll(self):
+        pool = self.make_pool(intensity=EventStream(0.01, intensity=5.))
+        cache = pool.get_event_cache('electrometer')
+        try:
+            received = []
+            cache.intensity.add_callback(received.append)
+            sample = asyncio.run(cache.intensity.wait_for_async(lambda last: True, 5., samples=3, fresh=True))
+            self.assertEqual(sample.intensity, 5.)
+            self.assertGreaterEqual(len(received), 3)
+            stamps = [sample.private_sndStamp for sample in cache.intensity.history]
+            self.assertEqual(len(set(stamps)), len(stamps))
+        finally:
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
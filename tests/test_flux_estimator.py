@@ -0,0 +1,84 @@
+import threading
+import unittest
+
+import numpy as np
+
+from lsst.ts.sequence.flux_estimator import StreamingFluxEstimator
+
+
+class StreamingFluxEstimatorTestCase(unittest.TestCase):
+    """Compare `StreamingFluxEstimator` with batch estimates over its window."""
+
+    def setUp(self):
+        rng = np.random.RandomState(42)
+        self.times = 1.e9 + np.cumsum(rng.uniform(0.05, 0.15, 200))
+        self.flux = 1.e4 + 3. * (self.times - self.times[0]) + rng.normal(0., 10., self.times.size)
+
+    def test_empty(self):
+        estimator = StreamingFluxEstimator(8)
+        self.assertIsNone(estimator.mean)
+        self.assertIsNone(estimator.std)
+        self.assertIsNone(estimator.drift)
+        self.assertFalse(estimator.is_stable(0.1))
+        self.assertEqual(estimator.exposure_time(1.e4, 30.), 30.)
+        estimator.add(100., 1.)
+        self.assertEqual(estimator.mean, 100.)
+        self.assertIsNone(estimator.variance)
+        with self.assertRaises(ValueError):
+            StreamingFluxEstimator(1)
+
+    def test_window(self):
+        size = 32
+        estimator = StreamingFluxEstimator(size)
+        for i, (timestamp, flux) in enumerate(zip(self.times, self.flux)):
+            estimator.add(flux, timestamp)
+            if i < 2:
+                continue
+            window = slice(max(0, i + 1 - size), i + 1)
+            self.assertEqual(estimator.count, min(i + 1, size))
+            self.assertAlmostEqual(estimator.mean, np.mean(self.flux[window]), delta=1.e-6)
+            self.assertAlmostEqual(estimator.std, np.std(self.flux[window], ddof=1), delta=1.e-6)
+            slope = np.polyfit(self.times[window] - self.times[0], self.flux[window], 1)[0]
+            self.assertAlmostEqual(estimator.drift, slope, delta=1.e-6)
+
+    def test_stability(self):
+        estimator = StreamingFluxEstimator(16)
+        for i in range(16):
+            estimator.add(1.e4 + (1. if i % 2 else -1.), float(i))
+        self.assertTrue(estimator.is_stable(1.e-3))
+        self.assertFalse(estimator.is_stable(1.e-5))
+        self.assertAlmostEqual(estimator.exposure_time(5.e4, 30.), 5.)
+        self.assertEqual(estimator.exposure_time(1.e6, 30.), 30.)
+
+        # A steady drift makes the flux unstable even without noise.
+        for i in range(16):
+            estimator.add(1.e4 + 100. * i, 16. + i)
+        self.assertAlmostEqual(estimator.drift, 100.)
+        self.assertFalse(estimator.is_stable(1.e-2))
+
+        estimator.reset()
+        self.assertEqual(estimator.count, 0)
+        self.assertIsNone(estimator.mean)
+
+    def test_threads(self):
+        estimator = StreamingFluxEstimator(64)
+
+        def add(offset):
+            for i in range(1000):
+                estimator.add(1.e4, offset + i * 0.01)
+
+        threads = [threading.Thread(target=add, args=(offset, )) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for _ in range(100):
+            mean = estimator.mean
+            self.assertTrue(mean is None or abs(mean - 1.e4) < 1.e-6)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(estimator.count, 64)
+        self.assertAlmostEqual(estimator.mean, 1.e4)
+        self.assertAlmostEqual(estimator.std, 0., delta=1.e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
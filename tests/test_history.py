@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+
+from lsst.ts.sequence import Command, CommandHistory, CommandLatency, DDSPool, FakeSAL, Metrics, Tracer
+
+
+class CommandHistoryTestCase(unittest.TestCase):
+    """Test that `CommandHistory` stays bounded."""
+
+    def test_bounds(self):
+        history = CommandHistory(3)
+        for cmd_id in range(1, 6):
+            history.add(cmd_id, (303, 0, 'Done : OK'), 'takeImages', timestamp=float(cmd_id))
+        self.assertEqual(len(history), 3)
+        self.assertEqual([record.cmd_id for record in history], [3, 4, 5])
+        self.assertNotIn(1, history)
+        self.assertIsNone(history.latest(1))
+        self.assertIsNone(history.get(2))
+        self.assertEqual(history.latest(5), (303, 0, 'Done : OK'))
+
+    def test_update(self):
+        history = CommandHistory(2)
+        history.add(1, (300, 0, 'Ack : OK'), 'takeImages')
+        history.add(2, (300, 0, 'Ack : OK'), 'abort')
+        # A new ack of a command keeps its name and makes it the most recent.
+        history.add(1, (303, 0, 'Done : OK'))
+        history.add(3, (300, 0, 'Ack : OK'), 'takeImages')
+        self.assertEqual([record.cmd_id for record in history], [1, 3])
+        self.assertEqual(history.get(1).cmd, 'takeImages')
+        self.assertEqual(history.latest(1)[0], 303)
+
+    def test_resize(self):
+        history = CommandHistory(5)
+        for cmd_id in range(5):
+            history.add(cmd_id, (303, 0, 'Done : OK'))
+        history.resize(2)
+        self.assertEqual([record.cmd_id for record in history], [3, 4])
+        history.add(5, (303, 0, 'Done : OK'))
+        self.assertEqual(len(history), 2)
+        with self.assertRaises(ValueError):
+            history.resize(0)
+        with self.assertRaises(ValueError):
+            CommandHistory(0)
+
+    def test_component_history(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            pool = DDSPool(FakeSAL(), tracer=Tracer(), metrics=Metrics(), history_size=5)
+            remote = pool.get_remote('atcamera')
+
+            async def run():
+                acks = []
+                for _ in range(20):
+                    acks.append(await remote.run_command_async('takeImages', 5., check=True))
+                return acks
+            acks = loop.run_until_complete(run())
+
+            self.assertEqual(len(acks), 20)
+            self.assertEqual(len(remote.history), 5)
+            self.assertEqual(remote.outstanding, [])
+            last_ids = [record.cmd_id for record in remote.history]
+            self.assertEqual(last_ids, list(range(last_ids[0], last_ids[0] + 5)))
+            self.assertEqual(remote.last_ack(last_ids[-1])[0], 303)
+
+            pool.set_retention('atcamera', commands=2)
+            self.assertEqual(len(remote.history), 2)
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
+
+    def test_component_bounds(self):
+        # However many commands are sent, the responses kept by the sender and the history stay bounded.
+        sal = FakeSAL(default_latency=CommandLatency(complete=0.001, concurrent=True))
+        pool = DDSPool(sal, tracer=Tracer(), metrics=Metrics(), history_size=10)
+        remote = pool.get_remote('atcamera')
+        sizes = []
+
+        async def run():
+            for _ in range(100):
+                await remote.run_command_async('takeImages', 5., check=True)
+            sizes.append(len(remote.sender.cmd_responses))
+            commands = (Command('takeImages', 5., {}) for _ in range(200))
+            async for completion in remote.pipeline(commands, window=20, ordered=False):
+                sizes.append(len(remote.sender.cmd_responses))
+
+        asyncio.run(run())
+        for _ in range(100):
+            cmd_id = remote.send_Command('takeImages', wait_command=True)[0]
+            # The response is moved to the history, where waits and last_ack still find it.
+            self.assertEqual(remote.last_ack(cmd_id)[0], 303)
+            self.assertEqual(remote.waitForCompletion(cmd_id, 5.)[0], 303)
+        sizes.append(len(remote.sender.cmd_responses))
+        # Commands sent without waiting for them are moved once more than the history size are outstanding.
+        cmd_ids = [remote.send_Command('takeImages')[0] for _ in range(100)]
+        sizes.append(len(remote.sender.cmd_responses))
+        self.assertIsNone(remote.waitForCompletion(cmd_ids[0], 5.))
+        for cmd_id in cmd_ids[-10:]:
+            self.assertEqual(remote.waitForCompletion(cmd_id, 5.)[0], 303)
+
+        self.assertLessEqual(max(sizes), 30)
+        self.assertEqual(len(remote.sender.cmd_responses), 0)
+        self.assertEqual(len(remote.history), 10)
+        self.assertEqual(remote.outstanding, [])
+        self.assertEqual(len(remote.sender.commands_sent), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+
+from lsst.ts.sequence.setup import BatchedQueueListener, configure_logging, generate_logfile, set_log_levels
+
+
+class RecordingHandler(logging.Handler):
+    """Handler keeping the messages it handles and counting the flushes of batches."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.batches = 0
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def flush_batch(self):
+        self.batches += 1
+
+
+class LogTestCase(unittest.TestCase):
+    """Test the queued, batched, rotated and JSON logging."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.root = logging.getLogger()
+        self.root_handlers = self.root.handlers[:]
+        self.root_level = self.root.level
+        self.root.handlers = []
+
+    def tearDown(self):
+        for handler in self.root.handlers:
+            handler.close()
+        self.root.handlers = self.root_handlers
+        self.root.setLevel(self.root_level)
+        shutil.rmtree(self.directory)
+
+    def make_options(self, **kwargs):
+        return argparse.Namespace(verbose=3, console_format=None, **kwargs)
+
+    def test_batched_listener(self):
+        log_queue = queue.Queue()
+        handler = RecordingHandler()
+        listener = BatchedQueueListener(log_queue, [handler], batch_size=10)
+        logger = logging.getLogger('test_batched_listener')
+        for i in range(25):
+            log_queue.put(logger.makeRecord(logger.name, logging.INFO, __file__, 0, 'record %i', (i, ), None))
+        listener.start()
+        listener.stop()
+        self.assertEqual(handler.messages, ['record {}'.format(i) for i in range(25)])
+        # Records queued before the listener started are written in batches of 10, and stopping may take
+        # one more.
+        self.assertIn(handler.batches, (3, 4))
+
+    def test_queued_json(self):
+        filename = os.path.join(self.directory, 'sequence.log')
+        listener = configure_logging(self.make_options(log_queue=True, log_json=True), filename)
+        try:
+            log = logging.getLogger('test_queued_json')
+            for i in range(100):
+                log.debug('message %i', i)
+            try:
+                raise IOError('failed')
+            except IOError:
+                log.exception('error')
+        finally:
+            listener.stop()
+
+        with open(filename) as log_file:
+            entries = [json.loads(line) for line in log_file]
+        entries = [entry for entry in entries if entry['name'] == 'test_queued_json']
+        self.assertEqual([entry['message'] for entry in entries[:100]],
+                         ['message {}'.format(i) for i in range(100)])
+        self.assertEqual(entries[0]['level'], 'DEBUG')
+        # The exception is formatted by the file handler, not merged into the message when queued.
+        self.assertEqual(entries[100]['message'], 'error')
+        self.assertIn('failed', entries[100]['exception'])
+
+    def test_rotation(self):
+        filename = os.path.join(self.directory, 'sequence.log')
+        options = self.make_options(log_queue=True, log_max_bytes=1000, log_backup_count=3, log_compress=True)
+        listener = configure_logging(options, filename)
+        try:
+            log = logging.getLogger('test_rotation')
+            for i in range(200):
+                log.info('message %i', i)
+        finally:
+            listener.stop()
+
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['sequence.log', 'sequence.log.1.gz', 'sequence.log.2.gz', 'sequence.log.3.gz'])
+        self.assertLessEqual(os.path.getsize(filename), 1000)
+        with gzip.open(filename + '.1.gz', 'rt') as log_file:
+            self.assertIn('test_rotation - message', log_file.read())
+
+    def test_unqueued(self):
+        filename = os.path.join(self.directory, 'sequence.log')
+        self.assertIsNone(configure_logging(self.make_options(), filename))
+        logging.getLogger('test_unqueued').info('message')
+        with open(filename) as log_file:
+            self.assertIn('INFO - test_unqueued - message', log_file.read())
+
+    def test_keep(self):
+        home = os.environ.get('HOME')
+        os.environ['HOME'] = self.directory
+        try:
+            log_path = os.path.join(self.directory, '.sequence', 'log')
+            os.makedirs(log_path)
+            old_runs = ['2020-01-0{}_00:00:00'.format(day) for day in range(1, 5)]
+            for run in old_runs:
+                for suffix in ('.log', '.log.1.gz'):
+                    open(os.path.join(log_path, 'sequence.{}{}'.format(run, suffix)), 'w').close()
+            open(os.path.join(log_path, 'other.log'), 'w').close()
+
+            filename = generate_logfile(keep=3)
+            self.assertEqual(os.path.dirname(filename), log_path)
+            # The two most recent runs are kept, with the new one.
+            kept = ['sequence.{}{}'.format(run, suffix) for run in old_runs[2:]
+                    for suffix in ('.log', '.log.1.gz')]
+            self.assertEqual(sorted(os.listdir(log_path)), ['other.log'] + sorted(kept))
+        finally:
+            if home is None:
+                del os.environ['HOME']
+            else:
+                os.environ['HOME'] = home
+
+    def test_log_levels(self):
+        self.assertEqual(set_log_levels(0), (0, 3))
+        self.assertEqual(set_log_levels(4), (3, 4))
+        self.assertEqual(set_log_levels(9), (3, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
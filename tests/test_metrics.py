@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DDSPool, Deadline, FakeSAL, LatencyHistogram, \
+    Metrics, RunTimeModel, Tracer, get_metrics
+from lsst.ts.sequence.deadline import CHECK_INTERVAL
+from lsst.ts.sequence.simulation import VirtualClock
+
+
+class CameraSequence(BaseSequence):
+    """Sequence taking an image, failing if ``fail`` is set."""
+
+    config_schema = {'fail': bool}
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config['fail'] = kwargs.get('fail', False)
+
+    def nominal_run_time(self):
+        return 10.
+
+    def execute(self):
+        if self.config['fail']:
+            raise IOError('Camera failed.')
+
+
+class LatencyHistogramTestCase(unittest.TestCase):
+    """Test the logarithmic buckets of `LatencyHistogram`."""
+
+    def test_histogram(self):
+        histogram = LatencyHistogram(smallest=1., n_buckets=4)
+        self.assertIsNone(histogram.mean)
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.5, 1.5, 1.5, 3., 100.):
+            histogram.add(value)
+
+        self.assertEqual(histogram.bounds, [1., 2., 4., 8.])
+        # Anything above the last bound is counted in the last bucket.
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual((histogram.count, histogram.min, histogram.max), (5, 0.5, 100.))
+        self.assertAlmostEqual(histogram.mean, 21.3)
+        self.assertEqual(histogram.quantile(0.5), 2.)
+        self.assertEqual(histogram.quantile(0.), 1.)
+        self.assertEqual(histogram.quantile(1.), 100.)
+        self.assertEqual(histogram.as_dict()['buckets'], [[1., 1], [2., 2], [4., 1], [8., 1]])
+
+    def test_prometheus_buckets(self):
+        # The last bucket also counts the latencies above its bound, so it is only exported as +Inf.
+        metrics = Metrics()
+        for value in (0.0005, 0.0015, 10000.):
+            metrics.observe('atcamera', 'takeImages', 'complete', value)
+        buckets = [line.split('le=')[1] for line in metrics.to_prometheus().splitlines()
+                   if line.startswith('sequence_command_seconds_bucket')]
+        self.assertEqual(len(buckets), 24)
+        self.assertEqual(buckets[:2], ['"0.001"} 1', '"0.002"} 2'])
+        self.assertEqual(buckets[-2:], ['"4194.3"} 2', '"+Inf"} 3'])
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Test recording command latencies and sequence outcomes in `Metrics`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = VirtualClock()
+        self.metrics = Metrics(self.clock.time)
+        latencies = {'atcamera': CommandLatency(0.5, 1., 2.),
+                     ('atcamera', 'fail'): CommandLatency(complete=1., result=(-302, 1, 'Failed'))}
+        self.pool = DDSPool(FakeSAL(latencies, clock=self.clock), clock=self.clock, tracer=Tracer(),
+                            metrics=self.metrics)
+        self.remote = self.pool.get_remote('atcamera')
+
+    def tearDown(self):
+        self.pool.shutdown()
+        shutil.rmtree(self.directory)
+
+    def test_phases(self):
+        # With a deadline, waits poll the command, so each phase ends within a check interval of its ack.
+        deadline = Deadline(None, self.clock)
+        cmd_id = self.remote.send_Command('takeImages')[0]
+        self.remote.waitForInProgress(cmd_id, 5., deadline)
+        self.remote.waitForCompletion(cmd_id, 5., deadline)
+        total = 0.
+        for phase, latency in (('ack', 0.5), ('in_progress', 1.), ('complete', 2.)):
+            histogram = self.metrics.histogram('atcamera', 'takeImages', phase)
+            self.assertEqual(histogram.count, 1)
+            self.assertAlmostEqual(histogram.sum, latency, delta=CHECK_INTERVAL)
+            total += histogram.sum
+        self.assertAlmostEqual(total, 3.5)
+
+    def test_whole_command(self):
+        # A command only waited on for completion is timed as a whole from its send.
+        cmd_id = self.remote.send_Command('takeImages')[0]
+        self.remote.waitForCompletion(cmd_id, 5.)
+        self.remote.send_Command('takeImages', wait_command=True)
+        self.remote.waitForCompletion(self.remote.send_Command('fail')[0], 5.)
+
+        self.assertIsNone(self.metrics.histogram('atcamera', 'takeImages', 'ack'))
+        complete = self.metrics.histogram('atcamera', 'takeImages', 'complete')
+        self.assertEqual(complete.count, 2)
+        self.assertAlmostEqual(complete.max, 3.5)
+        commands = self.metrics.as_dict()['commands']['atcamera']
+        self.assertEqual((commands['takeImages']['completed'], commands['fail']['failed']), (2, 1))
+        self.assertIn('atcamera fail failed 1 times.', self.metrics.summary())
+
+    def test_sequences(self):
+        self.metrics.record_sequence('CameraSequence', True, 12., 10.)
+        self.metrics.record_sequence('CameraSequence', True, 9., 10.)
+        # Failed runs and runs without an estimate do not count in the run time error.
+        self.metrics.record_sequence('CameraSequence', False, 1., 10.)
+        self.metrics.record_sequence('CameraSequence', True, 5.)
+        self.assertEqual(self.metrics.as_dict()['sequences'],
+                         {'CameraSequence': {'succeeded': 3, 'failed': 1,
+                                             'run_time_error': {'count': 2, 'mean': 0.5, 'mean_abs': 1.5}}})
+        self.assertIn('CameraSequence succeeded 3 times, run time error +0.50 s on average.',
+                      self.metrics.summary())
+
+        self.metrics.clear()
+        self.assertEqual(len(self.metrics), 0)
+
+    def test_sequence_runs(self):
+        metrics = get_metrics()
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+        run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+        for fail in (False, True):
+            sequence = CameraSequence(pool=self.pool, run_time_model=run_time_model)
+            sequence.configure(fail=fail)
+            try:
+                sequence.run()
+            except IOError:
+                pass
+        sequences = metrics.as_dict()['sequences']['CameraSequence']
+        self.assertEqual((sequences['succeeded'], sequences['failed']), (1, 1))
+        self.assertAlmostEqual(sequences['run_time_error']['mean'], -10., delta=0.5)
+
+    def test_export(self):
+        cmd_id = self.remote.send_Command('takeImages')[0]
+        self.remote.waitForCompletion(cmd_id, 5.)
+        self.metrics.record_sequence('CameraSequence', True, 12., 10.)
+
+        filename = os.path.join(self.directory, 'metrics.json')
+        self.metrics.write(filename)
+        with open(filename) as metrics_file:
+            self.assertEqual(json.load(metrics_file), json.loads(json.dumps(self.metrics.as_dict())))
+
+        filename = os.path.join(self.directory, 'metrics.prom')
+        self.metrics.write(filename)
+        with open(filename) as metrics_file:
+            lines = metrics_file.read().splitlines()
+        labels = 'component="atcamera",command="takeImages",phase="complete"'
+        self.assertIn('sequence_command_seconds_bucket{{{},le="4.096"}} 1'.format(labels), lines)
+        self.assertIn('sequence_command_seconds_bucket{{{},le="2.048"}} 0'.format(labels), lines)
+        self.assertIn('sequence_command_seconds_bucket{{{},le="+Inf"}} 1'.format(labels), lines)
+        self.assertIn('sequence_command_seconds_count{{{}}} 1'.format(labels), lines)
+        labels = 'component="atcamera",command="takeImages",outcome="completed"'
+        self.assertIn('sequence_commands_total{{{}}} 1'.format(labels), lines)
+        self.assertIn('sequence_runs_total{sequence="CameraSequence",outcome="succeeded"} 1', lines)
+        self.assertIn('sequence_run_time_error_seconds_sum{sequence="CameraSequence"} 2.000000', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
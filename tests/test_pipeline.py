@@ -0,0 +1,101 @@
+import asyncio
+import time
+import unittest
+
+from lsst.ts.sequence import Command, CommandFailed, CommandLatency, DDSPool, FakeSAL, Metrics, Tracer
+
+
+class PipelineTestCase(unittest.TestCase):
+    """Test `RemoteComponent.pipeline` against a `FakeSAL` component."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def make_remote(self, concurrent=False, complete=0.05, result=None):
+        latency = CommandLatency(complete=lambda kwargs: kwargs.get('duration', complete),
+                                 concurrent=concurrent)
+        latencies = {'atcamera': latency}
+        if result is not None:
+            latencies[('atcamera', 'fail')] = CommandLatency(complete=complete, result=result)
+        sal = FakeSAL(latencies=latencies)
+        pool = DDSPool(sal, tracer=Tracer(), metrics=Metrics())
+        return pool.get_remote('atcamera')
+
+    def collect(self, remote, commands, **kwargs):
+        # Run the pipeline, recording how many commands were sent but not yielded yet at each completion.
+        async def run():
+            completions, in_flight = [], []
+            async for completion in remote.pipeline(commands, **kwargs):
+                completions.append(completion)
+                in_flight.append(len(remote.sender.commands_sent) - len(completions) + 1)
+            return completions, in_flight
+        return self.loop.run_until_complete(run())
+
+    def test_window(self):
+        remote = self.make_remote(concurrent=True, complete=0.2)
+        commands = [Command('takeImages', 5., {'numImages': 1}) for _ in range(6)]
+        start = time.time()
+        completions, in_flight = self.collect(remote, commands, window=3)
+        duration = time.time() - start
+
+        self.assertEqual([completion.index for completion in completions], list(range(6)))
+        self.assertEqual(max(in_flight), 3)
+        # Two rounds of three concurrent commands, instead of six commands one after the other.
+        self.assertLess(duration, 6 * 0.2)
+        self.assertEqual(remote.outstanding, [])
+
+    def test_window_of_one(self):
+        remote = self.make_remote()
+        commands = [Command('takeImages', 5., {}) for _ in range(3)]
+        completions, in_flight = self.collect(remote, commands, window=1)
+        self.assertEqual(in_flight, [1, 1, 1])
+        self.assertEqual([completion.ack[0] for completion in completions], [303] * 3)
+
+    def test_invalid_window(self):
+        remote = self.make_remote()
+        with self.assertRaises(ValueError):
+            self.collect(remote, [Command('takeImages', 5., {})], window=0)
+
+    def test_ordered(self):
+        remote = self.make_remote(concurrent=True)
+        commands = [Command('takeImages', 5., {'duration': duration}) for duration in (0.3, 0.2, 0.1)]
+        completions, _ = self.collect(remote, commands, window=3, ordered=True)
+        self.assertEqual([completion.index for completion in completions], [0, 1, 2])
+        self.assertEqual([completion.cmd_id for completion in completions],
+                         sorted(completion.cmd_id for completion in completions))
+
+    def test_unordered(self):
+        remote = self.make_remote(concurrent=True)
+        commands = [Command('takeImages', 5., {'duration': duration}) for duration in (0.3, 0.2, 0.1)]
+        completions, _ = self.collect(remote, commands, window=3, ordered=False)
+        self.assertEqual([completion.index for completion in completions], [2, 1, 0])
+        self.assertEqual([completion.command.kwargs['duration'] for completion in completions],
+                         [0.1, 0.2, 0.3])
+
+    def test_queued_commands_do_not_time_out(self):
+        # The component executes one command at a time, so the third command only completes after 0.3 s,
+        # longer than its own timeout, which only starts once the command before it completes.
+        remote = self.make_remote(complete=0.1)
+        commands = [Command('takeImages', 0.15, {}) for _ in range(3)]
+        completions, _ = self.collect(remote, commands, window=3)
+        self.assertEqual([completion.ack[0] for completion in completions], [303] * 3)
+
+    def test_failed_command(self):
+        remote = self.make_remote(result=(-302, 1, 'Failed'))
+        commands = [Command('takeImages', 5., {}), Command('fail', 5., {}), Command('takeImages', 5., {})]
+        with self.assertRaises(CommandFailed) as context:
+            self.collect(remote, commands, window=2)
+        self.assertEqual(context.exception.cmd, 'fail')
+        self.assertEqual(context.exception.ack[0], -302)
+
+        completions, _ = self.collect(remote, commands, window=2, check=False)
+        self.assertEqual([completion.ack[0] for completion in completions], [303, -302, 303])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DDSPool, EventStream, FakeSAL, PreflightError, \
+    Tracer, check_components, format_preflight
+from lsst.ts.sequence.preflight import DISABLED, ENABLED, FAULT, STANDBY
+from lsst.ts.sequence.simulation import VirtualClock, VirtualTimeLoop
+
+
+class SummaryStates:
+    """Simulated summary states, changed by the ``start`` and ``enable`` commands."""
+
+    def __init__(self, **states):
+        self.states = states
+        self.settings = {}
+
+    def command(self, component, target):
+        def complete_time(kwargs):
+            self.states[component] = target
+            if 'settingsToApply' in kwargs:
+                self.settings[component] = kwargs['settingsToApply']
+            return 1.
+        return CommandLatency(complete=complete_time)
+
+    def components(self):
+        latencies = {}
+        events = {}
+        for component in self.states:
+            latencies[(component, 'start')] = self.command(component, DISABLED)
+            latencies[(component, 'enable')] = self.command(component, ENABLED)
+            state = EventStream(0.1, summaryState=lambda stamp, component=component: self.states[component])
+            events[component] = {'summaryState': state}
+        return latencies, events
+
+
+class CameraSequence(BaseSequence):
+    """Sequence using the camera and the electrometer."""
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None), ('electrometer', None)], **kwargs)
+
+    async def execute_async(self):
+        pass
+
+
+class PreflightTestCase(unittest.TestCase):
+    """Test checking that components are ENABLED before running a sequence."""
+
+    def setUp(self):
+        self.clock = VirtualClock()
+        self.loop = VirtualTimeLoop(self.clock)
+        self.states = SummaryStates(atcamera=ENABLED, electrometer=STANDBY, atMonochromator=FAULT)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def make_pool(self):
+        latencies, events = self.states.components()
+        pool = DDSPool(FakeSAL(latencies, events, clock=self.clock), clock=self.clock, tracer=Tracer())
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def check(self, components, **kwargs):
+        return self.loop.run_until_complete(check_components(self.make_pool(), components, **kwargs))
+
+    def test_ready(self):
+        report = self.check([('atcamera', None)])
+        self.assertEqual([(status.component, status.state, status.ready) for status in report],
+                         [('atcamera', ENABLED, True)])
+        self.assertIn('ENABLED', format_preflight(report))
+
+    def test_not_ready(self):
+        with self.assertRaises(PreflightError) as context:
+            self.check([('atcamera', None), ('electrometer', None), ('atMonochromator', None)])
+        report = context.exception.report
+        self.assertEqual([(status.ready, status.error) for status in report],
+                         [(True, None), (False, 'STANDBY'), (False, 'FAULT')])
+        self.assertEqual(str(context.exception), 'Components not ready: electrometer (STANDBY), '
+                                                 'atMonochromator (FAULT).')
+        # Without bring_up, no command is sent.
+        self.assertEqual(self.states.states['electrometer'], STANDBY)
+
+    def test_unknown_state(self):
+        # A component that does not publish its summary state is only not ready if its state is required.
+        report = self.check([('atcamera', None), ('atspectrograph', None)], timeout=2.)
+        self.assertEqual([(status.state, status.ready) for status in report], [(ENABLED, True), (None, True)])
+        self.assertIn('UNKNOWN', format_preflight(report))
+
+        with self.assertRaises(PreflightError) as context:
+            self.check([('atspectrograph', None)], timeout=2., require_state=True)
+        self.assertEqual(context.exception.report[0].error, 'no summaryState in 2.0 s')
+
+    def test_concurrent(self):
+        # The components are checked at the same time, so their timeouts overlap.
+        components = [('atspectrograph{}'.format(i), None) for i in range(5)]
+        self.check(components, timeout=2.)
+        self.assertLess(self.clock.time(), 3.)
+
+    def test_bring_up(self):
+        report = self.check([('atcamera', None), ('electrometer', None)], bring_up=True, settings='Default1')
+        self.assertTrue(all(status.ready for status in report))
+        self.assertEqual(self.states.states['electrometer'], ENABLED)
+        self.assertEqual(self.states.settings, {'electrometer': 'Default1'})
+
+        # A component in FAULT is not brought up.
+        with self.assertRaises(PreflightError):
+            self.check([('atMonochromator', None)], bring_up=True)
+        self.assertEqual(self.states.states['atMonochromator'], FAULT)
+
+    def test_sequence(self):
+        sequence = CameraSequence(pool=self.make_pool())
+        sequence.enable_preflight(timeout=2.)
+        with self.assertLogs('CameraSequence', 'ERROR') as logs, self.assertRaises(PreflightError):
+            self.loop.run_until_complete(sequence.preflight_async(**sequence.preflight_options))
+        self.assertIn('electrometer', logs.output[0])
+
+        self.loop.run_until_complete(sequence.preflight_async(bring_up=True))
+        self.assertEqual(self.states.states['electrometer'], ENABLED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import lsst.ts.sequence
+from lsst.ts.sequence import BaseSequence, SequenceRegistry, get_registry
+
+ENTRY_POINTS = """[test.lsst.ts.sequence]
+PluginSequence = test_registry_plugin:PluginSequence
+BadTarget = test_registry_plugin
+ATTakeImage = test_registry_plugin:PluginSequence
+"""
+
+
+class SequenceRegistryTestCase(unittest.TestCase):
+    """Test registering sequences, importing them lazily and finding the installed ones."""
+
+    def setUp(self):
+        # Install a distribution with entry points in a temporary directory.
+        self.directory = tempfile.mkdtemp()
+        dist_info = os.path.join(self.directory, 'test_registry_plugin-1.0.dist-info')
+        os.mkdir(dist_info)
+        with open(os.path.join(dist_info, 'METADATA'), 'w') as metadata:
+            metadata.write('Metadata-Version: 2.1\nName: test_registry_plugin\nVersion: 1.0\n')
+        with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as entry_points:
+            entry_points.write(ENTRY_POINTS)
+        with open(os.path.join(self.directory, 'test_registry_plugin.py'), 'w') as module:
+            module.write('from lsst.ts.sequence import BaseSequence\n\n\n'
+                         'class PluginSequence(BaseSequence):\n    pass\n')
+        sys.path.insert(0, self.directory)
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        sys.modules.pop('test_registry_plugin', None)
+        shutil.rmtree(self.directory)
+
+    def test_register(self):
+        registry = SequenceRegistry()
+        registry.register('Raise', 'lsst.ts.sequence.atcs.at_raise_exception:ATRaiseException', 'Raise.')
+        registry.register('Base', BaseSequence)
+        self.assertEqual(registry.names(), ['Raise', 'Base'])
+        self.assertEqual([entry.description for entry in registry], ['Raise.', ''])
+        self.assertIn('Raise', registry)
+        self.assertNotIn('Missing', registry)
+
+        self.assertIs(registry.resolve('Base'), BaseSequence)
+        self.assertEqual(registry.resolve('Raise').__name__, 'ATRaiseException')
+        with self.assertRaises(IOError):
+            registry.resolve('Missing')
+        with self.assertRaises(ValueError):
+            registry.register('Invalid', 'lsst.ts.sequence.atcs')
+
+    def test_lazy_import(self):
+        registry = SequenceRegistry()
+        registry.register('Plugin', 'test_registry_plugin:PluginSequence')
+        self.assertEqual(registry.names(), ['Plugin'])
+        self.assertNotIn('test_registry_plugin', sys.modules)
+        self.assertEqual(registry.resolve('Plugin').__name__, 'PluginSequence')
+        self.assertIn('test_registry_plugin', sys.modules)
+
+    def test_entry_points(self):
+        registry = SequenceRegistry('test.lsst.ts.sequence')
+        registry.register('ATTakeImage', 'lsst.ts.sequence.atcs.at_camera_take_image:ATTakeImage')
+        # Registering does not scan the installed packages.
+        self.assertFalse(registry._discovered)
+        with self.assertLogs('SequenceRegistry', 'WARNING'):
+            self.assertIn('PluginSequence', registry)
+        self.assertEqual(registry.names(), ['ATTakeImage', 'PluginSequence'])
+        self.assertNotIn('test_registry_plugin', sys.modules)
+
+        self.assertEqual(registry.resolve('PluginSequence').__name__, 'PluginSequence')
+        # Registered sequences take precedence over the installed ones.
+        self.assertEqual(registry.resolve('ATTakeImage').__module__,
+                         'lsst.ts.sequence.atcs.at_camera_take_image')
+
+    def test_package_attributes(self):
+        self.assertEqual(get_registry().names()[:3],
+                         ['WavelengthCalibrationSequence', 'ATTakeImage', 'ATRaiseException'])
+        self.assertIs(lsst.ts.sequence.ATTakeImage, get_registry().resolve('ATTakeImage'))
+        from lsst.ts.sequence import ATRaiseException
+        self.assertTrue(issubclass(ATRaiseException, BaseSequence))
+        with self.assertRaises(AttributeError):
+            lsst.ts.sequence.NotASequence
+
+
+if __name__ == '__main__':
+    unittest.main()
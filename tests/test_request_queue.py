@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DDSPool, FakeSAL, QueueEntry, RunTimeModel, \
+    SequenceRegistry, create_sequences, load_queue, submit_requests
+
+
+class CameraSequence(BaseSequence):
+    """Sequence taking ``numImages`` images."""
+
+    config_schema = {'numImages': int, 'timeout': float}
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config.update(kwargs)
+
+    def request_payload(self, simulate=False):
+        payload, timeout = super().request_payload(simulate)
+        return payload, self.config.get('timeout', timeout)
+
+
+class InvalidSequence(CameraSequence):
+    """Sequence failing to build its request."""
+
+    def request_payload(self, simulate=False):
+        raise IOError('Invalid request.')
+
+
+def ocs_time(kwargs):
+    """Time the simulated OCS takes to process a request: 0.1 s, or 5 s for sequences of 100 images."""
+    return 5. if json.loads(kwargs['json_parameters'])['config'].get('numImages') == 100 else 0.1
+
+
+class RequestQueueTestCase(unittest.TestCase):
+    """Test loading queues of sequences and requesting them from the OCS."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        ocs = CommandLatency(complete=ocs_time, concurrent=True)
+        self.pool = DDSPool(FakeSAL(latencies={'ocs': ocs}))
+        self.run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+        self.registry = SequenceRegistry()
+        self.registry.register('CameraSequence', CameraSequence)
+        self.registry.register('InvalidSequence', InvalidSequence)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_queue(self, entries):
+        filename = os.path.join(self.directory, 'queue.json')
+        with open(filename, 'w') as queue_file:
+            json.dump(entries, queue_file)
+        return filename
+
+    def create_sequences(self, queue):
+        return create_sequences(queue, self.registry, pool=self.pool, run_time_model=self.run_time_model)
+
+    def test_load_queue(self):
+        filename = self.write_queue([{'script': 'CameraSequence', 'config': {'numImages': 2}},
+                                     {'script': 'CameraSequence'}])
+        self.assertEqual(load_queue(filename), [QueueEntry('CameraSequence', {'numImages': 2}),
+                                                QueueEntry('CameraSequence', {})])
+        with self.assertRaises(IOError):
+            load_queue(self.write_queue([{'script': 'CameraSequence'}, {'config': {}}]))
+
+    def test_create_sequences(self):
+        sequences = self.create_sequences([QueueEntry('CameraSequence', {'numImages': 2}),
+                                           QueueEntry('CameraSequence', {})])
+        self.assertEqual([sequence.config for sequence in sequences], [{'numImages': 2}, {}])
+        self.assertIs(sequences[0].pool, self.pool)
+        # The whole queue is checked before any sequence is created.
+        with self.assertRaises(IOError):
+            self.create_sequences([QueueEntry('CameraSequence', {}), QueueEntry('Unknown', {})])
+        with self.assertRaises(IOError):
+            self.create_sequences([QueueEntry('CameraSequence', {'numImages': 'two'})])
+
+    def test_submit_requests(self):
+        queue = [QueueEntry('CameraSequence', {'numImages': i}) for i in range(20)]
+        sequences = self.create_sequences(queue)
+        start = time.time()
+        results = asyncio.run(submit_requests(sequences, interval=0.02))
+        # The requests are processed by the OCS at the same time.
+        self.assertLess(time.time() - start, 1.)
+        self.assertEqual([result[0] for result in results], [303] * 20)
+
+        sent = self.pool.get_remote('ocs').sender.commands_sent
+        self.assertEqual([cmd for cmd, _ in sent], ['target'] * 20)
+        payloads = [json.loads(kwargs['json_parameters']) for _, kwargs in sent]
+        self.assertEqual([payload['config']['numImages'] for payload in payloads], list(range(20)))
+        self.assertEqual(payloads[0]['script'], 'CameraSequence')
+        self.assertEqual(payloads[0]['components'], [['atcamera', None]])
+
+    def test_failed_requests(self):
+        queue = [QueueEntry('CameraSequence', {'numImages': 1}),
+                 QueueEntry('InvalidSequence', {}),
+                 QueueEntry('CameraSequence', {'numImages': 100, 'timeout': 0.2}),
+                 QueueEntry('CameraSequence', {'numImages': 2})]
+        results = asyncio.run(submit_requests(self.create_sequences(queue), interval=0.02))
+
+        self.assertEqual(results[0][0], 303)
+        self.assertIsInstance(results[1], IOError)
+        # The OCS did not process the third request before it timed out, so its last ack is in progress.
+        self.assertEqual(results[2][0], 301)
+        self.assertEqual(results[3][0], 303)
+        self.assertEqual(len(self.pool.get_remote('ocs').sender.commands_sent), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DDSPool, FakeSAL, RunTimeModel
+
+
+class CameraSequence(BaseSequence):
+    """Sequence taking ``numImages`` images, nominally 0.1 s each."""
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config['numImages'] = kwargs.get('numImages', 1)
+
+    def nominal_run_time(self):
+        return 0.1 * self.config['numImages']
+
+    async def execute_async(self):
+        for _ in range(self.config['numImages']):
+            await self.atcamera.run_command_async('takeImages', 5., check=True)
+
+
+class RunTimeModelTestCase(unittest.TestCase):
+    """Test learning, estimating and storing sequence run times."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'model', 'run_time.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_estimate(self):
+        model = RunTimeModel(self.filename)
+        self.assertEqual(model.estimate('Sequence', {'a': 1}, 10.), 10.)
+        self.assertEqual(model.estimate('Sequence', {'a': 1}), -1.)
+
+        model.update('Sequence', {'a': 1}, 12., 10.)
+        model.update('Sequence', {'a': 1}, 14., 10.)
+        # Known configurations are estimated from their measured durations.
+        self.assertAlmostEqual(model.estimate('Sequence', {'a': 1}, 10.), 13.)
+        # New ones from the nominal estimate, scaled by the measured ratio.
+        self.assertAlmostEqual(model.estimate('Sequence', {'a': 2}, 20.), 26.)
+        self.assertEqual(model.estimate('Sequence', {'a': 2}), -1.)
+        self.assertEqual(model.estimate('Other', {'a': 1}, 5.), 5.)
+
+    def test_save(self):
+        model = RunTimeModel(self.filename)
+        model.save()
+        self.assertFalse(os.path.exists(self.filename))
+
+        model.update('Sequence', {'a': 1, 'b': [1, 2]}, 3., 2.)
+        model.save()
+        loaded = RunTimeModel(self.filename)
+        self.assertEqual(loaded.estimate('Sequence', {'b': [1, 2], 'a': 1}), 3.)
+        self.assertAlmostEqual(loaded.estimate('Sequence', {'a': 2}, 4.), 6.)
+        self.assertEqual(os.listdir(os.path.dirname(self.filename)), ['run_time.json'])
+
+    def test_invalid_file(self):
+        os.makedirs(os.path.dirname(self.filename))
+        with open(self.filename, 'w') as model_file:
+            model_file.write('{"Sequence": ')
+        model = RunTimeModel(self.filename)
+        with self.assertLogs('RunTimeModel', 'WARNING'):
+            self.assertEqual(model.estimate('Sequence', {}, 1.), 1.)
+        model.update('Sequence', {}, 2.)
+        model.save()
+        with open(self.filename) as model_file:
+            self.assertEqual(json.load(model_file)['Sequence']['configs']['{}']['mean'], 2.)
+
+    def test_max_configs(self):
+        model = RunTimeModel(self.filename, max_configs=3)
+        for i in range(5):
+            model.update('Sequence', {'i': i}, float(i))
+        self.assertEqual(model.estimate('Sequence', {'i': 0}), -1.)
+        self.assertEqual(model.estimate('Sequence', {'i': 1}), -1.)
+        self.assertEqual(model.estimate('Sequence', {'i': 4}), 4.)
+
+    def test_sequence(self):
+        # Sequences record their measured run time, so the next estimate of the same configuration uses it.
+        model = RunTimeModel(self.filename)
+        pool = DDSPool(FakeSAL(default_latency=CommandLatency(complete=0.02)))
+        sequence = CameraSequence(pool=pool, run_time_model=model)
+        sequence.configure(numImages=3)
+        self.assertAlmostEqual(sequence.run_time(), 0.3)
+        asyncio.run(sequence.run_async())
+
+        estimate = sequence.run_time()
+        self.assertGreaterEqual(estimate, 0.06)
+        self.assertLess(estimate, 0.3)
+        self.assertEqual(RunTimeModel(self.filename).estimate('CameraSequence', {'numImages': 3}), estimate)
+        # The other configurations are scaled by the measured ratio.
+        sequence.configure(numImages=6)
+        self.assertAlmostEqual(sequence.run_time(), 2. * estimate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, DDSPool, FakeSAL, Metrics, QueueEntry, \
+    RunTimeModel, SequenceRegistry, Tracer, format_report, run_queue
+
+
+class CameraSequence(BaseSequence):
+    """Sequence taking ``numImages`` images."""
+
+    config_schema = {'numImages': int}
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config['numImages'] = kwargs.get('numImages', 1)
+
+    def nominal_run_time(self):
+        return 0.05 * self.config['numImages']
+
+    async def execute_async(self):
+        for _ in range(self.config['numImages']):
+            await self.atcamera.run_command_async('takeImages', 5., deadline=self.deadline, check=True)
+
+
+class FailingSequence(CameraSequence):
+    """Sequence whose command fails."""
+
+    async def execute_async(self):
+        await self.atcamera.run_command_async('fail', 5., deadline=self.deadline, check=True)
+
+
+class UnestimatedSequence(CameraSequence):
+    """Sequence failing to estimate its run time."""
+
+    def nominal_run_time(self):
+        raise KeyError('expTime')
+
+
+class SpectrographSequence(CameraSequence):
+    """Sequence taking spectra, with no component in common with the others."""
+
+    def __init__(self, **kwargs):
+        BaseSequence.__init__(self, component_list=[('atSpectrograph', None)], **kwargs)
+
+    async def execute_async(self):
+        for _ in range(self.config['numImages']):
+            await self.atSpectrograph.run_command_async('takeImages', 5., deadline=self.deadline,
+                                                        check=True)
+
+
+class RunQueueTestCase(unittest.TestCase):
+    """Test that `run_queue` isolates the failures of the sequences of a queue."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.mkdtemp()
+        sal = FakeSAL(latencies={('atcamera', 'fail'): CommandLatency(complete=0.05,
+                                                                      result=(-302, 1, 'Failed'))},
+                      default_latency=CommandLatency(complete=0.05))
+        self.pool = DDSPool(sal, tracer=Tracer(), metrics=Metrics())
+        self.registry = SequenceRegistry()
+        for sequence_class in (CameraSequence, FailingSequence, UnestimatedSequence, SpectrographSequence):
+            self.registry.register(sequence_class.__name__, sequence_class)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def run_queue(self, queue):
+        run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+        return self.loop.run_until_complete(run_queue(queue, self.registry, pool=self.pool,
+                                                      run_time_model=run_time_model))
+
+    def test_failure_isolation(self):
+        queue = [QueueEntry('CameraSequence', {'numImages': 2}),
+                 QueueEntry('FailingSequence', {}),
+                 QueueEntry('CameraSequence', {'numImages': 3}),
+                 QueueEntry('SpectrographSequence', {'numImages': 4})]
+        report = self.run_queue(queue)
+
+        self.assertEqual([entry['name'] for entry in report],
+                         ['0:CameraSequence', '1:FailingSequence', '2:CameraSequence',
+                          '3:SpectrographSequence'])
+        self.assertEqual([entry['status'] for entry in report], ['done', 'failed', 'done', 'done'])
+        self.assertIn('fail', report[1]['error'])
+        self.assertTrue(all(entry['error'] is None for entry in report if entry['status'] == 'done'))
+        self.assertEqual(report[0]['components'], ['atcamera'])
+        self.assertAlmostEqual(report[2]['run_time'], 0.15)
+
+        # The camera sequences ran one at a time, in queue order, and the spectrograph alongside them.
+        camera = [entry for entry in report if entry['components'] == ['atcamera']]
+        for first, second in zip(camera, camera[1:]):
+            self.assertLessEqual(first['end'], second['start'])
+        self.assertLess(report[3]['start'], report[0]['end'])
+
+        sent = [cmd for cmd, _ in self.pool.get_remote('atcamera').sender.commands_sent]
+        self.assertEqual(sent.count('takeImages'), 5)
+        table = format_report(report).splitlines()
+        self.assertEqual(len(table), 5)
+        self.assertIn('failed', table[2])
+
+    def test_failed_estimate(self):
+        queue = [QueueEntry('UnestimatedSequence', {'numImages': 2}), QueueEntry('CameraSequence', {})]
+        with self.assertLogs('run_queue', 'ERROR'):
+            report = self.run_queue(queue)
+        self.assertEqual([entry['status'] for entry in report], ['done', 'done'])
+        self.assertIsNone(report[0]['run_time'])
+        self.assertAlmostEqual(report[1]['run_time'], 0.05)
+        self.assertEqual(len(self.pool.get_remote('atcamera').sender.commands_sent), 3)
+        self.assertIn(' - ', format_report(report).splitlines()[1])
+
+    def test_invalid_queue(self):
+        with self.assertRaises(IOError):
+            self.run_queue([QueueEntry('CameraSequence', {}), QueueEntry('Unknown', {})])
+        with self.assertRaises(IOError):
+            self.run_queue([QueueEntry('CameraSequence', {'numImages': 'two'})])
+        self.assertEqual(len(self.pool.get_remote('atcamera').sender.commands_sent), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from lsst.ts.sequence import BaseSequence, ComponentLocks, DDSPool, FakeSAL, RunTimeModel, SequenceScheduler
+
+
+class SleepSequence(BaseSequence):
+    """Sequence sleeping ``duration`` seconds on its components, recording when it ran."""
+
+    def __init__(self, name, component_list=(), duration=0.05, fail=False, sub_sequences=None, runs=None,
+                 **kwargs):
+        super().__init__(component_list=list(component_list), sub_sequences=sub_sequences, **kwargs)
+        self.name = name
+        self.duration = duration
+        self.fail = fail
+        self.runs = runs
+
+    def configure(self, **kwargs):
+        self.config.update(kwargs)
+
+    async def execute_async(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if len(self.sub_sequences) > 0:
+            await self.execute_sub_sequences()
+        await asyncio.sleep(self.duration)
+        if self.runs is not None:
+            self.runs[self.name] = (start, loop.time())
+        if self.fail:
+            raise IOError('{} failed.'.format(self.name))
+
+
+class SchedulerTestCase(unittest.TestCase):
+    """Test the dependency ordering and the component locks of `SequenceScheduler`."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.mkdtemp()
+        self.pool = DDSPool(FakeSAL())
+        self.run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+        self.runs = {}
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def make_sequence(self, name, component_list=(), **kwargs):
+        return SleepSequence(name, component_list, runs=self.runs, pool=self.pool,
+                             run_time_model=self.run_time_model, **kwargs)
+
+    def run_scheduler(self, scheduler):
+        results = self.loop.run_until_complete(scheduler.run())
+        return {result.name: result for result in results}
+
+    def assertBefore(self, first, second):
+        self.assertLessEqual(self.runs[first][1], self.runs[second][0])
+
+    def assertOverlap(self, first, second):
+        self.assertLess(max(self.runs[first][0], self.runs[second][0]),
+                        min(self.runs[first][1], self.runs[second][1]))
+
+    def test_dependencies(self):
+        scheduler = SequenceScheduler()
+        scheduler.add(self.make_sequence('d'), depends_on=['b', 'c'])
+        scheduler.add(self.make_sequence('b'), depends_on=['a'])
+        scheduler.add(self.make_sequence('c'), depends_on=['a'])
+        scheduler.add(self.make_sequence('a'))
+        results = self.run_scheduler(scheduler)
+
+        self.assertEqual(list(results), ['d', 'b', 'c', 'a'])
+        self.assertTrue(all(result.status == 'done' for result in results.values()))
+        self.assertBefore('a', 'b')
+        self.assertBefore('a', 'c')
+        self.assertBefore('b', 'd')
+        self.assertBefore('c', 'd')
+        # b and c only depend on a and use no common component.
+        self.assertOverlap('b', 'c')
+
+    def test_invalid_graph(self):
+        scheduler = SequenceScheduler()
+        scheduler.add(self.make_sequence('a'), depends_on=['b'])
+        scheduler.add(self.make_sequence('b'), depends_on=['a'])
+        with self.assertRaises(ValueError):
+            scheduler.check()
+
+        scheduler = SequenceScheduler()
+        scheduler.add(self.make_sequence('a'), depends_on=['missing'])
+        with self.assertRaises(ValueError):
+            scheduler.check()
+
+        with self.assertRaises(ValueError):
+            scheduler.add(self.make_sequence('a'))
+
+    def test_component_locks(self):
+        scheduler = SequenceScheduler()
+        scheduler.add(self.make_sequence('camera1', [('atcamera', None)]))
+        scheduler.add(self.make_sequence('camera2', [('atcamera', None), ('atArchiver', None)]))
+        scheduler.add(self.make_sequence('spectrograph', [('atSpectrograph', None)]))
+        self.run_scheduler(scheduler)
+
+        camera = sorted(['camera1', 'camera2'], key=lambda name: self.runs[name][0])
+        self.assertBefore(*camera)
+        self.assertOverlap('camera1', 'spectrograph')
+
+    def test_device_ids(self):
+        scheduler = SequenceScheduler()
+        scheduler.add(self.make_sequence('device0', [('electrometer', 0)]))
+        scheduler.add(self.make_sequence('device1', [('electrometer', 1)]))
+        self.run_scheduler(scheduler)
+        self.assertOverlap('device0', 'device1')
+
+    def test_sub_sequence_components(self):
+        # The composite drives the camera through its sub-sequence, so it cannot overlap another sequence
+        # using the camera although it does not list the camera itself.
+        composite = self.make_sequence('composite', [('atMonochromator', None)], duration=0.,
+                                       sub_sequences=[self.make_sequence('take', [('atcamera', None)])])
+        self.assertEqual(composite.components(), [('atMonochromator', None), ('atcamera', None)])
+
+        scheduler = SequenceScheduler()
+        scheduler.add(composite)
+        scheduler.add(self.make_sequence('camera', [('atcamera', None)]))
+        self.run_scheduler(scheduler)
+        first, second = sorted(['composite', 'camera'], key=lambda name: self.runs[name][0])
+        self.assertBefore(first, second)
+
+    def test_shared_locks(self):
+        locks = ComponentLocks()
+        first, second = SequenceScheduler(locks=locks), SequenceScheduler(locks=locks)
+        first.add(self.make_sequence('first', [('atcamera', None)]))
+        second.add(self.make_sequence('second', [('atcamera', None)]))
+        self.loop.run_until_complete(asyncio.gather(first.run(), second.run()))
+        self.assertBefore('first', 'second')
+
+    def test_failure_skips_dependents(self):
+        scheduler = SequenceScheduler(fail_fast=False)
+        scheduler.add(self.make_sequence('a', fail=True))
+        scheduler.add(self.make_sequence('b'), depends_on=['a'])
+        scheduler.add(self.make_sequence('c', duration=0.1))
+        results = self.run_scheduler(scheduler)
+
+        self.assertEqual(results['a'].status, 'failed')
+        self.assertIsInstance(results['a'].error, IOError)
+        self.assertEqual(results['b'].status, 'skipped')
+        self.assertEqual(results['c'].status, 'done')
+        self.assertNotIn('b', self.runs)
+
+    def test_fail_fast(self):
+        scheduler = SequenceScheduler(fail_fast=True)
+        scheduler.add(self.make_sequence('a', fail=True))
+        scheduler.add(self.make_sequence('c', duration=5.))
+        results = self.run_scheduler(scheduler)
+
+        self.assertEqual(results['a'].status, 'failed')
+        self.assertEqual(results['c'].status, 'cancelled')
+        self.assertNotIn('c', self.runs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import time
+import unittest
+
+from lsst.ts.sequence import BaseSequence, CommandLatency, ConfigSweep, DryRun, EventStream, \
+    MonochromatorModel, VirtualClock, VirtualTimeLoop, format_dry_run
+from lsst.ts.sequence.atcs import ATTakeImage
+
+
+class WaitSequence(BaseSequence):
+    """Sequence taking an image while sleeping 2 s, then waiting for the electrometer to be ready at 10 s."""
+
+    config_schema = {'expTime': float}
+
+    def __init__(self, **kwargs):
+        super().__init__(component_list=[('atcamera', None), ('electrometer', None)], **kwargs)
+
+    def configure(self, **kwargs):
+        self.config['expTime'] = kwargs.get('expTime', 1.)
+
+    def nominal_run_time(self):
+        return self.config['expTime']
+
+    async def execute_async(self):
+        await asyncio.gather(
+            self.atcamera.run_command_async('takeImages', 60., check=True, expTime=self.config['expTime']),
+            asyncio.sleep(2.))
+        await self.get_event_cache('electrometer').intensity.wait_value_async('ready', True, timeout=60.)
+
+
+class FailingSequence(WaitSequence):
+    """Sequence whose image fails."""
+
+    async def execute_async(self):
+        await self.atcamera.run_command_async('fail', 60., check=True)
+
+
+class SimulationTestCase(unittest.TestCase):
+    """Test dry running sequences on a virtual clock."""
+
+    def make_dry_run(self):
+        latencies = {('atcamera', 'takeImages'): CommandLatency(0.5, 0., lambda kwargs: kwargs['expTime']),
+                     ('atcamera', 'fail'): CommandLatency(complete=5., result=(-302, 1, 'Failed'))}
+        events = {'electrometer': {'intensity': EventStream(1., ready=lambda stamp: stamp >= 10.)}}
+        return DryRun(latencies, events)
+
+    def test_virtual_clock(self):
+        clock = VirtualClock(10.)
+        clock.sleep(5.)
+        clock.advance(-1.)
+        self.assertEqual(clock.time(), 15.)
+
+        async def sleeps():
+            # Sleeps on the loop and on the clock in blocking calls overlap as they would in real time.
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(asyncio.sleep(100.), loop.run_in_executor(None, clock.sleep, 50.),
+                                 loop.run_in_executor(None, clock.sleep, 120.))
+
+        loop = VirtualTimeLoop(clock)
+        try:
+            start = time.time()
+            loop.run_until_complete(sleeps())
+            self.assertEqual(clock.time(), 135.)
+            self.assertLess(time.time() - start, 1.)
+        finally:
+            loop.close()
+
+    def test_dry_run(self):
+        sequence = WaitSequence()
+        sequence.configure(expTime=30.)
+        start = time.time()
+        result = sequence.simulate(self.make_dry_run())
+        self.assertLess(time.time() - start, 1.)
+
+        self.assertIsNone(result.error)
+        # The image takes 30.5 s, and the electrometer is ready at 10 s, so it is already ready.
+        self.assertAlmostEqual(result.duration, 30.5, delta=0.1)
+        sequence_step, = [step for step in result.steps if step['category'] == 'sequence']
+        self.assertEqual(sequence_step['name'], 'WaitSequence')
+        self.assertAlmostEqual(sequence_step['duration'], result.duration * 1.e3)
+        commands = [step for step in result.steps if step['category'] == 'atcamera']
+        self.assertEqual([step['args']['phase'] for step in commands], ['send', 'complete'])
+        self.assertAlmostEqual(commands[0]['duration'], 500.)
+
+        table = format_dry_run(result)
+        self.assertIn('takeImages', table)
+        self.assertIn('Simulated duration 30.5', table)
+
+    def test_failure(self):
+        result = self.make_dry_run().run(FailingSequence, {})
+        self.assertIsInstance(result.error, Exception)
+        self.assertAlmostEqual(result.duration, 5.)
+        self.assertIn('Failed', format_dry_run(result).splitlines()[-1])
+
+    def test_sweep(self):
+        sweep = ConfigSweep({}, zipped={'expTime': [1., 20.]})
+        durations = [result.duration for result in self.make_dry_run().sweep(WaitSequence, sweep)]
+        self.assertAlmostEqual(durations[0], 10., delta=0.1)
+        self.assertAlmostEqual(durations[1], 20.5, delta=0.1)
+        self.assertAlmostEqual(sweep.run_time(WaitSequence(), dry_run=self.make_dry_run()), sum(durations))
+
+    def test_default_components(self):
+        result = DryRun().run(ATTakeImage, {'numImages': 4, 'expTime': 15., 'batch_size': 2,
+                                            'max_outstanding': 2})
+        self.assertIsNone(result.error)
+        # Each image takes its exposure and 2 s of read out.
+        self.assertAlmostEqual(result.duration, 4 * 17., delta=0.1)
+
+    def test_monochromator_model(self):
+        monochromator = MonochromatorModel(grating=1, move_time=5., grating_time=30.)
+        self.assertEqual(monochromator({'gratingType': 1, 'wavelength': 500.}), 5.)
+        self.assertEqual(monochromator({'gratingType': 2, 'wavelength': 500.}), 35.)
+        self.assertEqual(monochromator.grating, 2)
+        self.assertEqual(monochromator({'wavelength': 600.}), 5.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lsst.ts.sequence import Checkpoint, CommandLatency, DDSPool, FakeSAL, RunTimeModel
+from lsst.ts.sequence.atcs import ATTakeImage
+
+
+class ATTakeImageTestCase(unittest.TestCase):
+    """Test the batched and pipelined takeImages commands of `ATTakeImage` on FakeSAL."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'ATTakeImage.jsonl')
+        # Each image takes 0.05 s on the camera, and acknowledging a command takes 0.05 s.
+        latency = CommandLatency(ack=0.05, complete=lambda kwargs: 0.05 * kwargs['numImages'])
+        self.pool = DDSPool(FakeSAL(latencies={'atcamera': latency}))
+        self.run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def make_sequence(self, **config):
+        sequence = ATTakeImage(pool=self.pool, run_time_model=self.run_time_model)
+        sequence.configure(read_out_time=0., **config)
+        sequence.image_root_name = 'AT-O-{index:05}'
+        sequence.enable_checkpoint(self.filename)
+        return sequence
+
+    def commands_sent(self):
+        return [kwargs for cmd, kwargs in self.pool.get_remote('atcamera').sender.commands_sent
+                if cmd == 'takeImages']
+
+    def test_batches(self):
+        sequence = self.make_sequence(numImages=5, batch_size=2)
+        with self.assertLogs('ATTakeImage', 'DEBUG') as logs:
+            self.loop.run_until_complete(sequence.run_async())
+
+        sent = self.commands_sent()
+        self.assertEqual([kwargs['numImages'] for kwargs in sent], [2, 2, 1])
+        self.assertEqual([kwargs['imageSequenceName'] for kwargs in sent],
+                         ['AT-O-00001', 'AT-O-00002', 'AT-O-00003'])
+        self.assertEqual(sequence.image_counter, 3)
+        # Every image is reported.
+        self.assertEqual(len([line for line in logs.output if 'of 5 complete' in line]), 5)
+
+        state = Checkpoint(self.filename).load()
+        self.assertEqual((state.step, state.done), (5, True))
+        self.assertEqual(len(state.cmd_ids), 3)
+
+    def test_pipelined(self):
+        # The next command is sent while the camera takes the images of the previous one, so the ack
+        # latency is hidden.
+        sequence = self.make_sequence(numImages=6, max_outstanding=3)
+        start = time.time()
+        self.loop.run_until_complete(sequence.run_async())
+        self.assertLess(time.time() - start, 6 * 0.1)
+        self.assertEqual(len(self.commands_sent()), 6)
+
+        serial = self.make_sequence(numImages=6)
+        start = time.time()
+        self.loop.run_until_complete(serial.run_async())
+        self.assertGreaterEqual(time.time() - start, 6 * 0.1)
+
+    def test_resume(self):
+        config = self.make_sequence(numImages=5, batch_size=2).config
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.start('ATTakeImage', config)
+        checkpoint.step(2, [1], {'image_root_name': 'AT-O-{index:05}', 'image_counter': 1})
+
+        sequence = ATTakeImage(pool=self.pool, run_time_model=self.run_time_model)
+        sequence.resume(self.filename)
+        self.loop.run_until_complete(sequence.run_async())
+
+        sent = self.commands_sent()
+        self.assertEqual([kwargs['numImages'] for kwargs in sent], [2, 1])
+        self.assertEqual([kwargs['imageSequenceName'] for kwargs in sent], ['AT-O-00002', 'AT-O-00003'])
+        state = Checkpoint(self.filename).load()
+        self.assertEqual((state.step, state.done), (5, True))
+        self.assertEqual(state.state['image_counter'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
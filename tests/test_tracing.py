@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from lsst.ts.sequence import CommandLatency, DDSPool, FakeSAL, Tracer
+
+
+class TracerTestCase(unittest.TestCase):
+    """Test recording spans with `Tracer` and exporting them as a Chrome trace."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.time = 0.
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def clock(self):
+        return self.time
+
+    def test_spans(self):
+        tracer = Tracer(enabled=True, clock=self.clock)
+        with tracer.span('takeImages', 'atcamera', cmd_id=1) as span:
+            self.time = 2.
+            span.args['images'] = 3
+        with self.assertRaises(IOError):
+            with tracer.span('fail', 'atcamera'):
+                raise IOError('failed')
+        tracer.add_span('wait', 'events', 3., 4.5, tid=1)
+
+        tid = threading.get_ident()
+        self.assertEqual(list(tracer.spans),
+                         [('takeImages', 'atcamera', 0., 2., {'cmd_id': 1, 'images': 3}, tid),
+                          ('fail', 'atcamera', 2., 2., {'error': "OSError('failed')"}, tid),
+                          ('wait', 'events', 3., 4.5, {}, 1)])
+
+    def test_disabled(self):
+        tracer = Tracer(clock=self.clock)
+        with tracer.span('takeImages', 'atcamera') as span:
+            span.args['cmd_id'] = 1
+        tracer.add_span('wait', 'events', 0., 1.)
+        self.assertEqual(len(tracer.spans), 0)
+
+    def test_max_spans(self):
+        tracer = Tracer(enabled=True, clock=self.clock, max_spans=10)
+        for i in range(25):
+            tracer.add_span('span{}'.format(i), 'test', float(i), i + 1.)
+        self.assertEqual(len(tracer.spans), 10)
+        self.assertEqual(tracer.dropped, 15)
+        self.assertEqual(tracer.spans[0][0], 'span15')
+        self.assertEqual(tracer.to_chrome_trace()['otherData'], {'dropped_spans': 15})
+
+        tracer.clear()
+        self.assertEqual((len(tracer.spans), tracer.dropped), (0, 0))
+
+    def test_chrome_trace(self):
+        tracer = Tracer(enabled=True, clock=self.clock)
+        tracer.add_span('takeImages', 'atcamera', 1., 1.5, {'cmd_id': 2}, tid=7)
+        filename = os.path.join(self.directory, 'trace.json')
+        tracer.write(filename)
+        with open(filename) as trace_file:
+            trace = json.load(trace_file)
+        self.assertEqual(trace['displayTimeUnit'], 'ms')
+        self.assertEqual(trace['traceEvents'],
+                         [{'name': 'takeImages', 'cat': 'atcamera', 'ph': 'X', 'ts': 1.e6, 'dur': 0.5e6,
+                           'pid': os.getpid(), 'tid': 7, 'args': {'cmd_id': 2}}])
+
+    def test_commands(self):
+        tracer = Tracer(enabled=True)
+        pool = DDSPool(FakeSAL(default_latency=CommandLatency(complete=0.05)), tracer=tracer)
+        remote = pool.get_remote('atcamera')
+        cmd_id = remote.send_Command('takeImages', wait_command=False)[0]
+        remote.waitForInProgress(cmd_id, 5.)
+        remote.waitForCompletion(cmd_id, 5.)
+
+        spans = list(tracer.spans)
+        phases = ('send', 'in_progress', 'complete')
+        self.assertEqual([(name, category, args['phase'], args['cmd_id'])
+                          for name, category, _, _, args, _ in spans],
+                         [('takeImages', 'atcamera', phase, cmd_id) for phase in phases])
+        self.assertGreaterEqual(spans[2][3] - spans[2][2], 0.04)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from lsst.ts.sequence import Checkpoint, CommandLatency, DDSPool, EventStream, FakeSAL, Metrics, \
+    RunTimeModel, Tracer
+from lsst.ts.sequence.atcs import WavelengthCalibrationSequence, plan_exposure_times
+from lsst.ts.sequence.simulation import DryRun, VirtualClock, VirtualTimeLoop, default_components
+
+
+class WavelengthCalibrationTestCase(unittest.TestCase):
+    """Test the wavelength scans of `WavelengthCalibrationSequence` on simulated components."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = VirtualClock()
+        self.latencies, self.events = default_components()
+        self.tracer = Tracer(enabled=True, clock=self.clock.time)
+        sal = FakeSAL(self.latencies, self.events, clock=self.clock)
+        self.pool = DDSPool(sal, clock=self.clock, tracer=self.tracer, metrics=Metrics(self.clock.time))
+        self.loop = VirtualTimeLoop(self.clock)
+        self.run_time_model = RunTimeModel(os.path.join(self.directory, 'run_time.json'))
+        self.checkpoint = os.path.join(self.directory, 'checkpoint.jsonl')
+
+    def tearDown(self):
+        self.loop.close()
+        self.pool.shutdown()
+        shutil.rmtree(self.directory)
+
+    def make_sequence(self, **config):
+        sequence = WavelengthCalibrationSequence(pool=self.pool, run_time_model=self.run_time_model)
+        sequence.configure(data_dir=os.path.join(self.directory, 'data'), **config)
+        sequence.enable_checkpoint(self.checkpoint)
+        return sequence
+
+    def commands_sent(self, component, cmd, device_id=None):
+        sender = self.pool.get_remote(component, device_id).sender
+        return [kwargs for sent, kwargs in sender.commands_sent if sent == cmd]
+
+    def test_plan_exposure_times(self):
+        np.testing.assert_array_equal(plan_exposure_times(1000., [100., 500., 0., 1.], 60.),
+                                      [10., 2., 60., 60.])
+
+    def test_nominal_run_time(self):
+        # The estimate only depends on the configuration, not on the components.
+        sequence = WavelengthCalibrationSequence(pool=DDSPool(FakeSAL()), run_time_model=self.run_time_model)
+        sequence.configure(max_exptime=10.)
+        self.assertEqual(sequence.nominal_run_time(), 13.)
+        sequence.configure(max_exptime=10., gratingType=2)
+        self.assertEqual(sequence.nominal_run_time(), 43.)
+        sequence.configure(max_exptime=10., wavelength=[400., 500., 600.], move_time=2.)
+        self.assertEqual(sequence.nominal_run_time(), 3 * (3. + 2. + 10.))
+        self.assertEqual(len(self.tracer.spans), 0)
+
+    def test_scan(self):
+        # The electrometer reads a flux of 1000 per second, so 5000 takes 5 s.
+        sequence = self.make_sequence(wavelength=[400., 500., 600.], intensity=5000., max_exptime=120.)
+        self.loop.run_until_complete(sequence.run_async())
+
+        np.testing.assert_array_equal(sequence.exposure_times, [5., 5., 5.])
+        moves = self.commands_sent('atMonochromator', 'updateMonochromatorSetup')
+        self.assertEqual([kwargs['wavelength'] for kwargs in moves], [400., 500., 600.])
+        spectra = self.commands_sent('sedSpectrometer', 'captureSpectImage')
+        self.assertEqual([kwargs['integrationTime'] for kwargs in spectra], [5., 5., 5.])
+        scans = self.commands_sent('calibrationElectrometer', 'startScanDt', 1)
+        self.assertEqual([kwargs['time'] for kwargs in scans], [7., 7., 7.])
+        # The scan takes less than its nominal estimate, as the exposure times are shorter than max_exptime.
+        self.assertLess(self.clock.time(), sequence.nominal_run_time())
+
+        points = np.load([product for product in sequence.products if product.endswith('_points.npy')][0])
+        np.testing.assert_array_equal(points['point'], [0, 1, 2])
+        np.testing.assert_array_equal(points['wavelength'], [400., 500., 600.])
+        np.testing.assert_allclose(points['flux'], 1000.)
+
+        state = Checkpoint(self.checkpoint).load()
+        self.assertEqual((state.step, state.done, len(state.cmd_ids)), (3, True, 6))
+
+    def make_real_time_sequence(self, spectrum, latencies=None):
+        # Without a simulated clock, topics are followed by the polling thread of the event caches, so the
+        # spectra are recorded as they are published.
+        sequence_latencies = {('atMonochromator', 'updateMonochromatorSetup'): CommandLatency(complete=0.02),
+                              ('calibrationElectrometer', 'startScanDt'): CommandLatency(complete=0.2),
+                              ('sedSpectrometer', 'captureSpectImage'): CommandLatency(complete=0.15)}
+        sequence_latencies.update(latencies if latencies is not None else {})
+        events = {'calibrationElectrometer': {'intensity': EventStream(0.01, intensity=1000),
+                                              'integrationTime': EventStream(1., intTime=1.)},
+                  'sedSpectrometer': {'spectrum': spectrum}}
+        pool = DDSPool(FakeSAL(sequence_latencies, events))
+        self.addCleanup(pool.shutdown)
+        sequence = WavelengthCalibrationSequence(pool=pool, run_time_model=self.run_time_model)
+        sequence.configure(data_dir=os.path.join(self.directory, 'data'), intensity=100.,
+                           stability_timeout=0.2, spectrum_topic='spectrum', move_time=0.)
+        return sequence
+
+    def test_capture(self):
+        # Spectra with strings of varying length, and integer intensities, are all captured.
+        spectrum = EventStream(0.02, name=lambda stamp: 'sed' * (1 + int(stamp * 50.) % 3),
+                               counts=lambda stamp: np.full(4, int(stamp * 50.)))
+        sequence = self.make_real_time_sequence(spectrum)
+        asyncio.run(sequence.run_async())
+
+        products = {os.path.basename(product).split('_')[-1]: product for product in sequence.products}
+        electrometer = np.load(products['electrometer.npy'])
+        self.assertEqual(electrometer.dtype['intensity'], np.float64)
+        np.testing.assert_array_equal(electrometer['intensity'], 1000.)
+        spectra = np.load(products['spectra.npy'])
+        self.assertEqual(spectra.dtype.names[0], 'point')
+        self.assertEqual(spectra.dtype['counts'].shape, (4, ))
+        self.assertEqual(set(spectra['name']), {'sed', 'sedsed', 'sedsedsed'})
+        points = np.load(products['points.npy'])
+        np.testing.assert_allclose(points['exptime'], [0.1])
+
+    def test_capture_error(self):
+        # A spectrum changing shape cannot be captured.
+        spectrum = EventStream(0.02, counts=lambda stamp: np.zeros(3 + int(stamp * 50.) % 2))
+        sequence = self.make_real_time_sequence(spectrum)
+        with self.assertRaises(IOError):
+            asyncio.run(sequence.run_async())
+
+        # When the sequence fails, the capture error is logged and the sequence error raised.
+        failed = CommandLatency(complete=0.15, result=(-302, 1, 'Spectrometer failed'))
+        sequence = self.make_real_time_sequence(spectrum, {('sedSpectrometer', 'captureSpectImage'): failed})
+        with self.assertLogs('WavelengthCalibrationSequence', 'ERROR') as logs:
+            with self.assertRaisesRegex(Exception, 'Spectrometer failed'):
+                asyncio.run(sequence.run_async())
+        self.assertTrue(any('Failed to write the data' in line for line in logs.output))
+        self.assertIsNone(sequence.capture)
+
+    def test_flux_model(self):
+        # The flux model only plans the points ahead; each point is exposed from its own flux measurement.
+        sequence = self.make_sequence(wavelength=[400., 500.], flux_model=[1., 2.], intensity=5000.,
+                                      max_exptime=120., capture=False)
+        self.loop.run_until_complete(sequence.run_async())
+        np.testing.assert_array_equal(sequence.exposure_times, [5., 5.])
+        self.assertEqual(sequence.products, [])
+
+        with self.assertRaises(ValueError):
+            self.make_sequence(wavelength=[400., 500.], flux_model=[1.]).flux_shape()
+
+    def test_resume(self):
+        config = self.make_sequence(wavelength=[400., 500., 600.], intensity=5000., capture=False).config
+        checkpoint = Checkpoint(self.checkpoint)
+        checkpoint.start('WavelengthCalibrationSequence', config)
+        checkpoint.step(2, [1, 2])
+
+        sequence = WavelengthCalibrationSequence(pool=self.pool, run_time_model=self.run_time_model)
+        sequence.resume(self.checkpoint)
+        self.loop.run_until_complete(sequence.run_async())
+        moves = self.commands_sent('atMonochromator', 'updateMonochromatorSetup')
+        self.assertEqual([kwargs['wavelength'] for kwargs in moves], [600.])
+        self.assertEqual(len(self.commands_sent('sedSpectrometer', 'captureSpectImage')), 1)
+
+    def test_dry_run(self):
+        config = {'wavelength': [400., 500., 600.], 'intensity': 5000., 'gratingType': 2}
+        result = DryRun().run(WavelengthCalibrationSequence, config)
+        self.assertIsNone(result.error)
+        # The grating change takes 30 s on the first move.
+        self.assertGreater(result.duration, 30.)
+        spectra = [step for step in result.steps
+                   if (step['name'], step['args'].get('phase')) == ('captureSpectImage', 'send')]
+        self.assertEqual(len(spectra), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()